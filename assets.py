@@ -0,0 +1,95 @@
+# assets.py
+import os, hashlib, threading, time
+import pygame
+from config import ASSET_CACHE_DIR
+
+class AssetManager:
+    # Sounds are decoded on a background thread while the window opens and chunks stream in.
+    # Decoded PCM is kept on disk keyed by the source file and mixer format, so later
+    # launches skip FLAC decoding entirely.
+    def __init__(self, cache_dir=ASSET_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.sounds = {}
+        self.errors = {}
+        self.total = 0
+        self.cache_hits = 0
+        self.decoded = 0
+        self.started = None
+        self.finished = None
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def load_sounds(self, paths):
+        # paths: {name: file path}; call after pygame.mixer.init()
+        self.total += len(paths)
+        self.started = time.perf_counter()
+        self.finished = None
+        self.thread = threading.Thread(target=self._run, args=(dict(paths),), daemon=True)
+        self.thread.start()
+
+    def _run(self, paths):
+        for name, path in paths.items():
+            try:
+                sound = self._load_sound(path)
+            except (pygame.error, OSError) as e:
+                with self.lock:
+                    self.errors[name] = str(e)
+                continue
+            with self.lock:
+                self.sounds[name] = sound
+        self.finished = time.perf_counter()
+
+    def _cache_path(self, path):
+        with open(path, "rb") as f:
+            digest = hashlib.sha1(f.read())
+        digest.update(repr((os.path.getmtime(path), pygame.mixer.get_init())).encode())
+        return os.path.join(self.cache_dir, digest.hexdigest() + ".pcm")
+
+    def _load_sound(self, path):
+        cache_path = self._cache_path(path)
+        if os.path.exists(cache_path):
+            with open(cache_path, "rb") as f:
+                sound = pygame.mixer.Sound(buffer=f.read())
+            self.cache_hits += 1
+            return sound
+        sound = pygame.mixer.Sound(path)
+        self.decoded += 1
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = cache_path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(sound.get_raw())
+            os.replace(tmp_path, cache_path)
+        except OSError:
+            pass  # caching is best effort; the decoded sound is still usable
+        return sound
+
+    def get(self, name):
+        with self.lock:
+            return self.sounds.get(name)
+
+    def done(self):
+        with self.lock:
+            return len(self.sounds) + len(self.errors) >= self.total
+
+    def progress(self):
+        if self.total == 0:
+            return 1.0
+        with self.lock:
+            return (len(self.sounds) + len(self.errors)) / float(self.total)
+
+    def load_seconds(self):
+        if self.started is None or self.finished is None:
+            return None
+        return self.finished - self.started
+
+    def report(self):
+        seconds = self.load_seconds()
+        kind = "warm" if self.decoded == 0 and self.cache_hits else "cold"
+        text = "sounds: %d loaded (%d from cache, %d decoded) in %.3fs, %s start" % (
+            len(self.sounds), self.cache_hits, self.decoded, seconds or 0.0, kind)
+        if self.errors:
+            text += ", failed: " + ", ".join(sorted(self.errors))
+        return text
+
+asset_manager = AssetManager()
@@ -0,0 +1,132 @@
+# audio.py
+import math
+import pygame
+from config import AUDIO_CHANNELS, AUDIO_LOOP_CHANNELS, AUDIO_MAX_VOICES, AUDIO_SAME_SOUND_PER_FRAME, AUDIO_MAX_DISTANCE
+
+class AudioMixer:
+    # One-shot voices come from a fixed channel pool with a voice cap: when it is full
+    # the quietest voice is stolen, or the new sound is dropped if it would be quieter
+    # still. Looping emitters own reserved channels and are updated together each frame.
+    def __init__(self):
+        self.channels = []
+        self.loop_channels = []
+        self.voices = {}        # channel index: audible score (gain * priority)
+        self.frame_counts = {}  # id(sound): plays this frame
+        self.loops = {}         # key: [sound, channel, position, max_distance]
+        self.listener = (0.0, 0.0, 0.0)
+        self.yaw = 0.0
+        self.stolen = 0
+        self.dropped = 0
+
+    def init(self):
+        # Call after pygame.mixer.init()
+        pygame.mixer.set_num_channels(AUDIO_CHANNELS)
+        pygame.mixer.set_reserved(AUDIO_LOOP_CHANNELS)
+        self.loop_channels = [pygame.mixer.Channel(i) for i in range(AUDIO_LOOP_CHANNELS)]
+        self.channels = [pygame.mixer.Channel(i) for i in range(AUDIO_LOOP_CHANNELS, AUDIO_CHANNELS)]
+
+    def begin_frame(self, x, y, z, yaw):
+        self.listener = (x, y, z)
+        self.yaw = yaw
+        self.frame_counts.clear()
+
+    def stereo_gains(self, position, max_distance, volume=1.0):
+        if position is None:
+            return volume, volume
+        lx, ly, lz = self.listener
+        dx = position[0] - lx
+        dy = position[1] - ly
+        dz = position[2] - lz
+        dist = math.sqrt(dx*dx + dy*dy + dz*dz)
+        if dist >= max_distance:
+            return 0.0, 0.0
+        gain = volume * (1.0 - dist/max_distance)
+        flat = math.sqrt(dx*dx + dz*dz)
+        if flat < 1e-6:
+            return gain, gain
+        # Pan by how far the source sits along the listener's right vector
+        rad = math.radians(self.yaw)
+        pan = (dx*math.cos(rad) + dz*math.sin(rad)) / flat
+        angle = (pan + 1.0) * math.pi / 4.0
+        left = gain * min(1.0, math.cos(angle) * math.sqrt(2.0))
+        right = gain * min(1.0, math.sin(angle) * math.sqrt(2.0))
+        return left, right
+
+    def play(self, sound, position=None, priority=1.0, max_distance=AUDIO_MAX_DISTANCE, volume=1.0):
+        if sound is None or not self.channels:
+            return None
+        key = id(sound)
+        if self.frame_counts.get(key, 0) >= AUDIO_SAME_SOUND_PER_FRAME:
+            self.dropped += 1
+            return None
+        left, right = self.stereo_gains(position, max_distance, volume)
+        score = max(left, right) * priority
+        if score <= 0.0:
+            return None
+
+        index = None
+        busy = 0
+        quietest = None
+        for i, ch in enumerate(self.channels):
+            if ch.get_busy():
+                busy += 1
+                s = self.voices.get(i, 0.0)
+                if quietest is None or s < self.voices.get(quietest, 0.0):
+                    quietest = i
+            elif index is None:
+                index = i
+        if index is None or busy >= AUDIO_MAX_VOICES:
+            if quietest is None or self.voices.get(quietest, 0.0) >= score:
+                self.dropped += 1
+                return None
+            index = quietest
+            self.channels[index].stop()
+            self.stolen += 1
+
+        ch = self.channels[index]
+        ch.play(sound)
+        ch.set_volume(left, right)
+        self.voices[index] = score
+        self.frame_counts[key] = self.frame_counts.get(key, 0) + 1
+        return ch
+
+    def set_loop(self, key, sound, position, max_distance=AUDIO_MAX_DISTANCE):
+        # Keep a looping emitter alive at position; volume is applied in update()
+        loop = self.loops.get(key)
+        if loop is None:
+            if sound is None:
+                return
+            used = set(id(l[1]) for l in self.loops.values())
+            free = [ch for ch in self.loop_channels if id(ch) not in used]
+            if not free:
+                return
+            loop = [sound, free[0], position, max_distance]
+            self.loops[key] = loop
+        loop[2] = position
+        loop[3] = max_distance
+
+    def stop_loop(self, key):
+        loop = self.loops.pop(key, None)
+        if loop is not None:
+            loop[1].stop()
+
+    def update(self):
+        for key, (sound, ch, position, max_distance) in self.loops.items():
+            left, right = self.stereo_gains(position, max_distance)
+            if left <= 0.0 and right <= 0.0:
+                if ch.get_busy():
+                    ch.stop()
+                continue
+            if not ch.get_busy():
+                ch.play(sound, -1)
+            ch.set_volume(left, right)
+
+    def stats(self):
+        return {
+            "voices": sum(1 for ch in self.channels if ch.get_busy()),
+            "loops": len(self.loops),
+            "stolen": self.stolen,
+            "dropped": self.dropped,
+        }
+
+audio_mixer = AudioMixer()
@@ -0,0 +1,187 @@
+# bench.py
+import json, math, random, sys, time
+import numpy as np
+import pygame
+from pygame.locals import *
+from config import MOUSE_SENSITIVITY, PLAYER_EYE_HEIGHT, WEAPONS, BENCH_SEED
+from uploads import upload_scheduler
+from visibility import los_cache
+from director import director
+from audio import audio_mixer
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# A scenario is a list of (seconds, settings) segments played back to back once the
+# world is playable. Settings: forward/strafe (-1..1), sprint, turn (degrees of yaw per
+# second), pitch (degrees), weapon id, fire (seconds between shots) and aim="drones"
+# to track the nearest live drone instead of turning.
+SCENARIOS = {
+    "sprint": [
+        (12.0, {"forward": 1, "sprint": True}),
+        (1.0, {"turn": 90.0}),
+        (12.0, {"forward": 1, "sprint": True}),
+        (1.0, {"turn": 90.0}),
+        (12.0, {"forward": 1, "sprint": True}),
+    ],
+    "circle": [
+        (24.0, {"forward": 1, "turn": 30.0}),
+        (12.0, {"forward": 1, "sprint": True, "turn": -45.0}),
+    ],
+    "shotgun": [
+        (20.0, {"weapon": "shotgun", "fire": 0.6, "strafe": 1, "turn": 24.0, "pitch": -5.0}),
+        (10.0, {"weapon": "shotgun", "fire": 0.6, "forward": 1, "turn": -36.0, "pitch": -15.0}),
+    ],
+    "rockets": [
+        (12.0, {"weapon": "rocket", "fire": 1.1, "turn": 20.0, "pitch": -25.0}),
+        (12.0, {"weapon": "rocket", "fire": 1.1, "forward": 1, "pitch": -10.0, "aim": "drones"}),
+        (8.0, {"weapon": "rocket", "fire": 1.1, "sprint": True, "forward": 1, "turn": -30.0, "pitch": -30.0}),
+    ],
+}
+
+class ScriptedKeys(dict):
+    # Stands in for pygame.key.get_pressed(); unlisted keys are up
+    def __missing__(self, key):
+        return 0
+
+def percentiles(values):
+    if not values:
+        return None
+    a = np.asarray(values, dtype=np.float64)
+    p50, p95, p99 = np.percentile(a, (50, 95, 99))
+    return {"count": len(values), "mean": float(a.mean()), "p50": float(p50), "p95": float(p95),
+            "p99": float(p99), "max": float(a.max())}
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024.0 * 1024.0) if sys.platform == "darwin" else peak / 1024.0
+
+class BenchRun:
+    # Drives the main loop from a scenario instead of the mouse and keyboard.
+    # The script follows wall-clock time, like the game's own cooldowns and AI timers.
+    def __init__(self, name, out_path=None):
+        if name not in SCENARIOS:
+            raise ValueError("unknown bench scenario %r, expected one of: %s" % (name, ", ".join(sorted(SCENARIOS))))
+        self.name = name
+        self.out_path = out_path
+        self.segments = SCENARIOS[name]
+        self.duration = sum(seconds for seconds, _ in self.segments)
+        self.started = None
+        self.startup_s = None
+        self.last_frame = None
+        self.last_update = None
+        self.last_shot = None
+        self.weapon = None
+        self.yaw = None
+        self.frame_ms = []
+        self.finished = False
+
+    def prepare(self, inventory):
+        random.seed(BENCH_SEED)
+        for item in inventory.values():
+            item["ammo"] = 9999
+
+    def begin(self, startup_s):
+        self.startup_s = startup_s
+        self.started = time.perf_counter()
+        self.last_update = self.started
+        upload_scheduler.load_latency_ms.clear()
+
+    def segment(self, t):
+        for seconds, settings in self.segments:
+            if t < seconds:
+                return settings
+            t -= seconds
+        return None
+
+    def inputs(self, live_events, px, py, pz, rx, ry, enemies):
+        # Returns (keys, events) for this frame. Live input is dropped except QUIT.
+        events = [e for e in live_events if e.type == QUIT]
+        keys = ScriptedKeys()
+        if self.started is None or px is None:
+            return keys, events
+        now = time.perf_counter()
+        if self.last_frame is not None:
+            self.frame_ms.append((now - self.last_frame) * 1000.0)
+        self.last_frame = now
+        dt = now - self.last_update
+        self.last_update = now
+        t = now - self.started
+        settings = self.segment(t)
+        if settings is None:
+            self.finished = True
+            return keys, events
+
+        forward = settings.get("forward", 0)
+        strafe = settings.get("strafe", 0)
+        keys[K_w] = forward > 0
+        keys[K_s] = forward < 0
+        keys[K_d] = strafe > 0
+        keys[K_a] = strafe < 0
+        keys[K_LSHIFT] = bool(settings.get("sprint"))
+
+        if self.yaw is None:
+            self.yaw = ry
+        target_pitch = settings.get("pitch", 0.0)
+        target = self.nearest_drone(px, py, pz, enemies) if settings.get("aim") == "drones" else None
+        if target is not None:
+            dx = target.x - px
+            dy = target.y - (py + PLAYER_EYE_HEIGHT)
+            dz = target.z - pz
+            self.yaw = ry + (math.degrees(math.atan2(dx, -dz)) - ry + 180.0) % 360.0 - 180.0
+            target_pitch = math.degrees(math.atan2(dy, math.sqrt(dx*dx + dz*dz)))
+        else:
+            self.yaw += settings.get("turn", 0.0) * dt
+        rel = ((self.yaw - ry) / MOUSE_SENSITIVITY, -(target_pitch - rx) / MOUSE_SENSITIVITY)
+        if rel != (0.0, 0.0):
+            events.append(pygame.event.Event(MOUSEMOTION, rel=rel, pos=(0, 0), buttons=(0, 0, 0)))
+
+        weapon = settings.get("weapon")
+        if weapon is not None and weapon != self.weapon:
+            index = [w["id"] for w in WEAPONS].index(weapon)
+            events.append(pygame.event.Event(KEYDOWN, key=K_1 + index, mod=0, unicode="", scancode=0))
+            self.weapon = weapon
+        fire = settings.get("fire")
+        if fire is not None and (self.last_shot is None or now - self.last_shot >= fire):
+            events.append(pygame.event.Event(MOUSEBUTTONDOWN, button=1, pos=(0, 0)))
+            self.last_shot = now
+        return keys, events
+
+    def nearest_drone(self, px, py, pz, enemies):
+        best = None
+        best_dist = None
+        for e in enemies:
+            if type(e).__name__ != "RoboDrone" or e.health <= 0:
+                continue
+            dist = (e.x - px)**2 + (e.y - py)**2 + (e.z - pz)**2
+            if best_dist is None or dist < best_dist:
+                best = e
+                best_dist = dist
+        return best
+
+    def report(self, renderer=None):
+        result = {
+            "scenario": self.name,
+            "seed": BENCH_SEED,
+            "renderer": renderer,
+            "startup_s": self.startup_s,
+            "seconds": self.duration,
+            "frames": len(self.frame_ms),
+            "frame_ms": percentiles(self.frame_ms),
+            "chunk_load_ms": percentiles(list(upload_scheduler.load_latency_ms)),
+            "peak_rss_mb": peak_rss_mb(),
+            "line_of_sight": los_cache.stats(),
+            "director": director.stats(),
+            "uploads": upload_scheduler.stats(),
+            "audio": audio_mixer.stats(),
+        }
+        text = json.dumps(result, indent=2)
+        print(text)
+        if self.out_path:
+            with open(self.out_path, "w") as f:
+                f.write(text + "\n")
+        return result
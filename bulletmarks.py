@@ -1,18 +1,210 @@
 # bulletmarks.py
-bullet_marks_by_block = {}  # (bx,by,bz): [ (ix, iy, iz, nx, ny, nz), ... ]
+import math
+from collections import deque
+import numpy as np
+from OpenGL.GL import *
+from config import MAX_BULLET_MARKS, BULLET_MARKS_PER_CHUNK, BULLET_MARK_SIZE, chunk_coords_from_world
+from shaders import get_program, create_vao, VertexFormat
+from resources import resource_ledger
+
+POSITION_ONLY = VertexFormat([(0, 3)])
+MARK_FLOATS = 6 * 3  # two triangles of positions
+
+def mark_quad(hx, hy, hz, nx, ny, nz, size=BULLET_MARK_SIZE):
+    # Tangent frame is built once when the mark is made, not every frame
+    offset = 0.001
+    hx += nx*offset
+    hy += ny*offset
+    hz += nz*offset
+    ux, uy, uz = (1,0,0) if abs(ny) > 0.9 else (0,1,0)
+    t1x = uy*nz - uz*ny
+    t1y = uz*nx - ux*nz
+    t1z = ux*ny - uy*nx
+    t1len = math.sqrt(t1x*t1x + t1y*t1y + t1z*t1z)
+    if t1len > 1e-9:
+        t1x/=t1len; t1y/=t1len; t1z/=t1len
+    t2x = ny*t1z - nz*t1y
+    t2y = nz*t1x - nx*t1z
+    t2z = nx*t1y - ny*t1x
+    t2len = math.sqrt(t2x*t2x + t2y*t2y + t2z*t2z)
+    if t2len > 1e-9:
+        t2x/=t2len; t2y/=t2len; t2z/=t2len
+    corners = []
+    for (a, b) in ((1,1), (1,-1), (-1,-1), (-1,1)):
+        corners.append((hx + (a*t1x + b*t2x)*size, hy + (a*t1y + b*t2y)*size, hz + (a*t1z + b*t2z)*size))
+    q = [corners[0], corners[1], corners[2], corners[0], corners[2], corners[3]]
+    return [c for v in q for c in v]
+
+class ChunkDecals:
+    # Fixed-size ring of marks for one chunk; a free or evicted slot is a degenerate quad
+    def __init__(self, capacity=BULLET_MARKS_PER_CHUNK):
+        self.capacity = capacity
+        self.vertices = np.zeros((capacity, MARK_FLOATS), dtype=np.float32)
+        self.blocks = [None] * capacity
+        self.serials = [0] * capacity
+        self.head = 0
+        self.filled = 0
+        self.live = 0
+        self.dirty_lo = capacity
+        self.dirty_hi = 0
+        self.buffer = None
+        self.vao = None
+
+    def _touch(self, slot):
+        self.dirty_lo = min(self.dirty_lo, slot)
+        self.dirty_hi = max(self.dirty_hi, slot + 1)
+
+    def put(self, block, quad, serial):
+        slot = self.head
+        evicted = self.blocks[slot]
+        self.vertices[slot] = quad
+        self.blocks[slot] = block
+        self.serials[slot] = serial
+        self.head = (self.head + 1) % self.capacity
+        self.filled = max(self.filled, slot + 1)
+        if evicted is None:
+            self.live += 1
+        self._touch(slot)
+        return slot, evicted
+
+    def clear_slot(self, slot):
+        if self.blocks[slot] is None:
+            return None
+        block = self.blocks[slot]
+        self.vertices[slot] = 0.0
+        self.blocks[slot] = None
+        self.live -= 1
+        self._touch(slot)
+        return block
+
+    def draw(self):
+        if self.buffer is None:
+            self.buffer = glGenBuffers(1)
+            glBindBuffer(GL_ARRAY_BUFFER, self.buffer)
+            glBufferData(GL_ARRAY_BUFFER, self.vertices.nbytes, None, GL_DYNAMIC_DRAW)
+            resource_ledger.gl_created("buffer", self.buffer, self.vertices.nbytes)
+            glBindBuffer(GL_ARRAY_BUFFER, 0)
+            self.vao = create_vao(self.buffer, POSITION_ONLY)
+        if self.dirty_lo < self.dirty_hi:
+            part = self.vertices[self.dirty_lo:self.dirty_hi]
+            glBindBuffer(GL_ARRAY_BUFFER, self.buffer)
+            glBufferSubData(GL_ARRAY_BUFFER, self.dirty_lo * MARK_FLOATS * 4, part.nbytes, part)
+            glBindBuffer(GL_ARRAY_BUFFER, 0)
+            self.dirty_lo = self.capacity
+            self.dirty_hi = 0
+        glBindVertexArray(self.vao)
+        glDrawArrays(GL_TRIANGLES, 0, self.filled * 6)
+        glBindVertexArray(0)
+
+    def release(self):
+        if self.buffer is not None:
+            glDeleteVertexArrays(1, [self.vao])
+            glDeleteBuffers(1, [self.buffer])
+            resource_ledger.gl_deleted("vao", self.vao)
+            resource_ledger.gl_deleted("buffer", self.buffer)
+            self.buffer = None
+            self.vao = None
+
+class DecalStore:
+    def __init__(self, max_marks=MAX_BULLET_MARKS):
+        self.max_marks = max_marks
+        self.chunks = {}          # (cx, cz): ChunkDecals
+        self.by_block = {}        # (bx, by, bz): set of (chunk_key, slot)
+        self.order = deque()      # (chunk_key, slot, serial), oldest first, may hold stale entries
+        self.serial = 0
+        self.live = 0
+
+    def _unlink(self, key, slot, block):
+        slots = self.by_block.get(block)
+        if slots is not None:
+            slots.discard((key, slot))
+            if not slots:
+                del self.by_block[block]
+        self.live -= 1
+
+    def add(self, bx, by, bz, ix, iy, iz, nx, ny, nz):
+        block = (bx, by, bz)
+        key = chunk_coords_from_world(bx, bz)
+        chunk = self.chunks.get(key)
+        if chunk is None:
+            chunk = ChunkDecals()
+            self.chunks[key] = chunk
+        self.serial += 1
+        slot, evicted = chunk.put(block, mark_quad(ix, iy, iz, nx, ny, nz), self.serial)
+        if evicted is not None:
+            self._unlink(key, slot, evicted)
+        self.live += 1
+        self.by_block.setdefault(block, set()).add((key, slot))
+        self.order.append((key, slot, self.serial))
+        while self.live > self.max_marks:
+            self._evict_oldest()
+        # Stale queue entries pile up when chunk rings overwrite themselves
+        if len(self.order) > 2 * self.max_marks:
+            self.order = deque(e for e in self.order if self._is_current(*e))
+
+    def _is_current(self, key, slot, serial):
+        chunk = self.chunks.get(key)
+        return chunk is not None and chunk.blocks[slot] is not None and chunk.serials[slot] == serial
+
+    def _evict_oldest(self):
+        while self.order:
+            key, slot, serial = self.order.popleft()
+            if self._is_current(key, slot, serial):
+                block = self.chunks[key].clear_slot(slot)
+                self._unlink(key, slot, block)
+                return
+
+    def remove_block(self, block):
+        for (key, slot) in self.by_block.pop(block, ()):
+            chunk = self.chunks[key]
+            chunk.clear_slot(slot)
+            self.live -= 1
+
+    def drop_chunk(self, cx, cz):
+        chunk = self.chunks.pop((cx, cz), None)
+        if chunk is None:
+            return
+        for slot, block in enumerate(chunk.blocks):
+            if block is not None:
+                self._unlink((cx, cz), slot, block)
+        chunk.release()
+
+    def clear(self):
+        for chunk in self.chunks.values():
+            chunk.release()
+        self.chunks.clear()
+        self.by_block.clear()
+        self.order.clear()
+        self.live = 0
+
+    def draw(self, view_proj):
+        if not self.live:
+            return
+        prog = get_program("lines")
+        prog.use()
+        prog.set_matrix("u_view_proj", view_proj)
+        prog.set_vec4("u_color", 0.0, 0.0, 0.0, 1.0)
+        glEnable(GL_POLYGON_OFFSET_FILL)
+        glPolygonOffset(-1.0,-1.0)
+        for chunk in self.chunks.values():
+            if chunk.live:
+                chunk.draw()
+        glDisable(GL_POLYGON_OFFSET_FILL)
+        glUseProgram(0)
+
+decal_store = DecalStore()
 
 def add_bullet_mark(bx, by, bz, ix, iy, iz, nx, ny, nz):
-    block_coords = (bx,by,bz)
-    if block_coords not in bullet_marks_by_block:
-        bullet_marks_by_block[block_coords] = []
-    bullet_marks_by_block[block_coords].append((ix, iy, iz, nx, ny, nz))
+    decal_store.add(bx, by, bz, ix, iy, iz, nx, ny, nz)
 
 def remove_bullet_marks_for_block(block_coords):
-    if block_coords in bullet_marks_by_block:
-        del bullet_marks_by_block[block_coords]
+    decal_store.remove_block(block_coords)
 
-def get_all_bullet_marks():
-    return bullet_marks_by_block
+def drop_chunk_bullet_marks(cx, cz):
+    decal_store.drop_chunk(cx, cz)
 
 def clear_all_bullet_marks():
-    bullet_marks_by_block.clear()
+    decal_store.clear()
+
+def draw_bullet_marks(view_proj):
+    decal_store.draw(view_proj)
@@ -0,0 +1,64 @@
+# camera.py
+import math
+import numpy as np
+from config import FOV, PLAYER_EYE_HEIGHT
+from frustum import Frustum, perspective_matrix, look_at_matrix
+
+NEAR_PLANE = 0.1
+FAR_PLANE = 1000.0
+
+def look_direction(rx, ry):
+    rad_x = math.radians(rx)
+    rad_y = math.radians(ry)
+    return (math.sin(rad_y)*math.cos(rad_x), math.sin(rad_x), -math.cos(rad_y)*math.cos(rad_x))
+
+class Camera:
+    # Owns the frame's matrices on the CPU so nothing has to be read back from GL
+    def __init__(self, fov=FOV):
+        self.fov = fov
+        self.width = 0
+        self.height = 0
+        self.projection = None
+        self.view = np.identity(4)
+        self.view_proj = None
+        self.eye = (0.0, 0.0, 0.0)
+        self.forward = (0.0, 0.0, -1.0)
+        self._frustum = None
+
+    def set_viewport(self, width, height):
+        if (width, height) != (self.width, self.height):
+            self.width = width
+            self.height = height
+            self.projection = perspective_matrix(self.fov, width/float(height), NEAR_PLANE, FAR_PLANE)
+
+    def update(self, px, py, pz, rx, ry, width, height):
+        self.set_viewport(width, height)
+        dx, dy, dz = look_direction(rx, ry)
+        ex, ey, ez = px, py + PLAYER_EYE_HEIGHT, pz
+        self.eye = (ex, ey, ez)
+        self.forward = (dx, dy, dz)
+        self.view = look_at_matrix(ex, ey, ez, ex+dx, ey+dy, ez+dz, 0,1,0)
+        self.view_proj = self.projection @ self.view
+        self._frustum = None
+
+    @property
+    def frustum(self):
+        if self._frustum is None:
+            self._frustum = Frustum(self.view_proj)
+        return self._frustum
+
+    def project(self, points):
+        # points: (N,3) world positions -> (N,2) window coordinates with y down, and a mask
+        # of the points that are in front of the camera, inside the depth range and on screen
+        points = np.asarray(points, dtype=float).reshape(-1, 3)
+        clip = points @ self.view_proj[:, :3].T + self.view_proj[:, 3]
+        w = clip[:, 3]
+        in_front = w > 1e-6
+        ndc = clip[:, :3] / np.where(in_front, w, 1.0)[:, None]
+        visible = in_front & np.all(np.abs(ndc) <= 1.0, axis=1)
+        screen = np.empty((len(points), 2))
+        screen[:, 0] = (ndc[:, 0] + 1.0) * 0.5 * self.width
+        screen[:, 1] = (1.0 - ndc[:, 1]) * 0.5 * self.height
+        return screen, visible
+
+camera = Camera()
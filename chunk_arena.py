@@ -0,0 +1,227 @@
+# chunk_arena.py
+import bisect
+from OpenGL.GL import *
+from shaders import get_program, create_vao, POSITION_COLOR
+from resources import resource_ledger
+from config import CHUNK_ARENA_INITIAL_VERTICES, LOD_ARENA_INITIAL_VERTICES, ARENA_ALLOC_GRANULARITY, ARENA_DEFRAG_THRESHOLD, ARENA_DEFRAG_MOVES_PER_FRAME
+
+VERTEX_FLOATS = 6
+VERTEX_STRIDE = VERTEX_FLOATS * 4
+
+class FreeListAllocator:
+    def __init__(self, capacity, granularity=1):
+        self.capacity = capacity
+        self.granularity = granularity
+        self.free_blocks = [(0, capacity)] if capacity > 0 else []  # sorted (offset, size)
+        self.used_blocks = {}  # offset: size
+
+    def _round(self, size):
+        g = self.granularity
+        return ((max(size, 1) + g - 1) // g) * g
+
+    def _take(self, i, size):
+        off, bsize = self.free_blocks[i]
+        if bsize == size:
+            del self.free_blocks[i]
+        else:
+            self.free_blocks[i] = (off + size, bsize - size)
+        self.used_blocks[off] = size
+        return off
+
+    def allocate(self, size):
+        size = self._round(size)
+        for i, (off, bsize) in enumerate(self.free_blocks):
+            if bsize >= size:
+                return self._take(i, size)
+        return None
+
+    def allocate_below(self, size, limit):
+        size = self._round(size)
+        for i, (off, bsize) in enumerate(self.free_blocks):
+            if off >= limit:
+                break
+            if bsize >= size:
+                return self._take(i, size)
+        return None
+
+    def release(self, offset):
+        size = self.used_blocks.pop(offset)
+        fb = self.free_blocks
+        i = bisect.bisect_left(fb, (offset, 0))
+        if i < len(fb) and offset + size == fb[i][0]:
+            size += fb[i][1]
+            del fb[i]
+        if i > 0 and fb[i-1][0] + fb[i-1][1] == offset:
+            offset = fb[i-1][0]
+            size += fb[i-1][1]
+            del fb[i-1]
+            i -= 1
+        fb.insert(i, (offset, size))
+
+    def grow(self, new_capacity):
+        extra = new_capacity - self.capacity
+        fb = self.free_blocks
+        if fb and fb[-1][0] + fb[-1][1] == self.capacity:
+            fb[-1] = (fb[-1][0], fb[-1][1] + extra)
+        else:
+            fb.append((self.capacity, extra))
+        self.capacity = new_capacity
+
+    def used_total(self):
+        return sum(self.used_blocks.values())
+
+    def high_water(self):
+        if not self.used_blocks:
+            return 0
+        last = max(self.used_blocks)
+        return last + self.used_blocks[last]
+
+    def fragmentation(self):
+        # Share of the occupied span [0, high water) that is lost to holes
+        span = self.high_water()
+        if span == 0:
+            return 0.0
+        return 1.0 - self.used_total() / float(span)
+
+class ChunkGeometryArena:
+    def __init__(self, initial_vertices=CHUNK_ARENA_INITIAL_VERTICES):
+        self.buffer = None
+        self.vao = None
+        self.allocator = FreeListAllocator(initial_vertices, ARENA_ALLOC_GRANULARITY)
+        self.regions = {}         # key: (first_vertex, vertex_count)
+        self.sections = {}        # key: [(sy, offset, vertex_count)] relative to first_vertex
+        self._keys_by_first = {}
+        self.grows = 0
+        self.moves = 0
+
+    def _ensure_buffer(self):
+        if self.buffer is None:
+            self.buffer = glGenBuffers(1)
+            glBindBuffer(GL_ARRAY_BUFFER, self.buffer)
+            glBufferData(GL_ARRAY_BUFFER, self.allocator.capacity * VERTEX_STRIDE, None, GL_DYNAMIC_DRAW)
+            resource_ledger.gl_created("buffer", self.buffer, self.allocator.capacity * VERTEX_STRIDE)
+            glBindBuffer(GL_ARRAY_BUFFER, 0)
+            self.vao = create_vao(self.buffer, POSITION_COLOR)
+
+    def _grow(self, min_free):
+        old_capacity = self.allocator.capacity
+        new_capacity = max(old_capacity, ARENA_ALLOC_GRANULARITY) * 2
+        while new_capacity - old_capacity < min_free + ARENA_ALLOC_GRANULARITY:
+            new_capacity *= 2
+        new_buffer = glGenBuffers(1)
+        glBindBuffer(GL_COPY_WRITE_BUFFER, new_buffer)
+        glBufferData(GL_COPY_WRITE_BUFFER, new_capacity * VERTEX_STRIDE, None, GL_DYNAMIC_DRAW)
+        resource_ledger.gl_created("buffer", new_buffer, new_capacity * VERTEX_STRIDE)
+        glBindBuffer(GL_COPY_READ_BUFFER, self.buffer)
+        glCopyBufferSubData(GL_COPY_READ_BUFFER, GL_COPY_WRITE_BUFFER, 0, 0, old_capacity * VERTEX_STRIDE)
+        glBindBuffer(GL_COPY_READ_BUFFER, 0)
+        glBindBuffer(GL_COPY_WRITE_BUFFER, 0)
+        glDeleteBuffers(1, [self.buffer])
+        glDeleteVertexArrays(1, [self.vao])
+        resource_ledger.gl_deleted("buffer", self.buffer)
+        resource_ledger.gl_deleted("vao", self.vao)
+        self.buffer = new_buffer
+        self.vao = create_vao(self.buffer, POSITION_COLOR)
+        self.allocator.grow(new_capacity)
+        self.grows += 1
+
+    def store(self, key, data, sections=None):
+        self._ensure_buffer()
+        self.release(key)
+        count = len(data) // VERTEX_FLOATS
+        first = self.allocator.allocate(count)
+        if first is None:
+            self._grow(count)
+            first = self.allocator.allocate(count)
+        if count:
+            glBindBuffer(GL_ARRAY_BUFFER, self.buffer)
+            glBufferSubData(GL_ARRAY_BUFFER, first * VERTEX_STRIDE, len(data) * 4, data)
+            glBindBuffer(GL_ARRAY_BUFFER, 0)
+        self.regions[key] = (first, count)
+        self._keys_by_first[first] = key
+        if sections is not None:
+            ranges = []
+            offset = 0
+            for (sy, n) in sections:
+                ranges.append((sy, offset, n))
+                offset += n
+            self.sections[key] = ranges
+        return self.regions[key]
+
+    def release(self, key):
+        region = self.regions.pop(key, None)
+        if region is None:
+            return
+        self.allocator.release(region[0])
+        del self._keys_by_first[region[0]]
+        self.sections.pop(key, None)
+
+    def defragment_step(self, max_moves=ARENA_DEFRAG_MOVES_PER_FRAME):
+        # Incremental compaction: move the highest allocation down into the first hole that fits
+        for _ in range(max_moves):
+            if self.buffer is None or self.allocator.fragmentation() < ARENA_DEFRAG_THRESHOLD:
+                return
+            last = max(self.allocator.used_blocks)
+            size = self.allocator.used_blocks[last]
+            target = self.allocator.allocate_below(size, last)
+            if target is None:
+                return
+            glBindBuffer(GL_COPY_READ_BUFFER, self.buffer)
+            glBindBuffer(GL_COPY_WRITE_BUFFER, self.buffer)
+            glCopyBufferSubData(GL_COPY_READ_BUFFER, GL_COPY_WRITE_BUFFER,
+                                last * VERTEX_STRIDE, target * VERTEX_STRIDE, size * VERTEX_STRIDE)
+            glBindBuffer(GL_COPY_READ_BUFFER, 0)
+            glBindBuffer(GL_COPY_WRITE_BUFFER, 0)
+            self.allocator.release(last)
+            key = self._keys_by_first.pop(last)
+            self.regions[key] = (target, self.regions[key][1])
+            self._keys_by_first[target] = key
+            self.moves += 1
+
+    def draw(self, keys, view_proj, visible_sections=None, outlines=False):
+        firsts = []
+        counts = []
+        for key in keys:
+            first, count = self.regions[key]
+            ranges = self.sections.get(key) if visible_sections is not None else None
+            if ranges is None:
+                if count:
+                    firsts.append(first)
+                    counts.append(count)
+                continue
+            cx, cz = key
+            for (sy, offset, n) in ranges:
+                if n and (cx, sy, cz) in visible_sections:
+                    firsts.append(first + offset)
+                    counts.append(n)
+        if not counts:
+            return
+
+        prog = get_program("terrain")
+        prog.use()
+        prog.set_matrix("u_view_proj", view_proj)
+        prog.set_float("u_outline", 1.0 if outlines else 0.0)
+        glBindVertexArray(self.vao)
+        n = len(counts)
+        glMultiDrawArrays(GL_TRIANGLES, (GLint * n)(*firsts), (GLsizei * n)(*counts), n)
+        glBindVertexArray(0)
+        glUseProgram(0)
+
+    def stats(self):
+        alloc = self.allocator
+        used = alloc.used_total()
+        largest_free = max((size for _, size in alloc.free_blocks), default=0)
+        return {
+            "capacity_bytes": alloc.capacity * VERTEX_STRIDE,
+            "used_bytes": used * VERTEX_STRIDE,
+            "occupancy": used / float(alloc.capacity) if alloc.capacity else 0.0,
+            "fragmentation": alloc.fragmentation(),
+            "free_blocks": len(alloc.free_blocks),
+            "largest_free_bytes": largest_free * VERTEX_STRIDE,
+            "allocations": len(alloc.used_blocks),
+            "grows": self.grows,
+            "moves": self.moves,
+        }
+
+chunk_arena = ChunkGeometryArena()
+lod_arena = ChunkGeometryArena(LOD_ARENA_INITIAL_VERTICES)
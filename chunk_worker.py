@@ -1,15 +1,22 @@
 # chunk_worker.py
 import threading, queue, math, random, time
-from config import CHUNK_SIZE, GROUND_LEVEL, chunk_coords_from_world
-from render import build_chunk_vertex_data
+from config import CHUNK_SIZE, GROUND_LEVEL, WORLD_SEED, chunk_coords_from_world
+from render import build_chunk_vertex_data, build_chunk_lod_vertex_data, chunk_bounds_from_data
 from entities import AmmoPickup, RobotDog, RoboDrone
+from occlusion import chunk_connectivity
+from tracer import tracer
 
 generation_queue = queue.Queue()
 generated_chunks_queue = queue.Queue()
+generated_lod_queue = queue.Queue()
+world_seed = WORLD_SEED  # recorded sessions store it; set before the worker generates anything
 
-def generate_chunk_data(cx, cz):
-    seed_val = cx * 99999 + cz
-    random.seed(seed_val)
+def chunk_rng(cx, cz):
+    # A private generator per chunk: this runs on the worker thread and must not
+    # reseed or draw from the main thread's random stream
+    return random.Random(cx * 99999 + cz + world_seed)
+
+def generate_chunk_terrain(cx, cz, rng):
     base_x = cx * CHUNK_SIZE
     base_z = cz * CHUNK_SIZE
     chunk_data = {}
@@ -17,11 +24,11 @@ def generate_chunk_data(cx, cz):
         for z in range(CHUNK_SIZE):
             chunk_data[(base_x+x, GROUND_LEVEL, base_z+z)] = True
 
-    obstacle_count = random.randint(0,3)
+    obstacle_count = rng.randint(0,3)
     for _ in range(obstacle_count):
-        ox = base_x + random.randint(0, CHUNK_SIZE-1)
-        oz = base_z + random.randint(0, CHUNK_SIZE-1)
-        height = random.randint(2,5)
+        ox = base_x + rng.randint(0, CHUNK_SIZE-1)
+        oz = base_z + rng.randint(0, CHUNK_SIZE-1)
+        height = rng.randint(2,5)
         for y in range(1, height+1):
             chunk_data[(ox, y, oz)] = True
         leaf_y = height+1
@@ -32,49 +39,74 @@ def generate_chunk_data(cx, cz):
                           (ox, leaf_y, oz-1)]
         for lx, ly, lz in leaf_positions:
             chunk_data[(lx, ly, lz)] = "leaf"
+    return chunk_data
+
+def generate_chunk_data(cx, cz):
+    rng = chunk_rng(cx, cz)
+    chunk_data = generate_chunk_terrain(cx, cz, rng)
+    base_x = cx * CHUNK_SIZE
+    base_z = cz * CHUNK_SIZE
 
     pickups = []
     pickup_types = ["pistol", "shotgun", "rocket"]
-    num_pickups = random.randint(0,2)
+    num_pickups = rng.randint(0,2)
     for _ in range(num_pickups):
-        px = base_x + random.randint(0, CHUNK_SIZE-1) + 0.5
-        pz = base_z + random.randint(0, CHUNK_SIZE-1) + 0.5
+        px = base_x + rng.randint(0, CHUNK_SIZE-1) + 0.5
+        pz = base_z + rng.randint(0, CHUNK_SIZE-1) + 0.5
         py = GROUND_LEVEL + 1.5
-        ammo_type = random.choice(pickup_types)
+        ammo_type = rng.choice(pickup_types)
         p = AmmoPickup(px, py, pz, ammo_type, (cx, cz))
         pickups.append(p)
 
     enemies = []
     # 25% spawn chance for RobotDog
-    if random.random() < 0.25:
-        ex = base_x + random.randint(0, CHUNK_SIZE-1) + 0.5
-        ez = base_z + random.randint(0, CHUNK_SIZE-1) + 0.5
+    if rng.random() < 0.25:
+        ex = base_x + rng.randint(0, CHUNK_SIZE-1) + 0.5
+        ez = base_z + rng.randint(0, CHUNK_SIZE-1) + 0.5
         ey = GROUND_LEVEL + 1.0
-        e = RobotDog(ex, ey, ez, (cx, cz))
+        e = RobotDog(ex, ey, ez, (cx, cz), rng)
         enemies.append(e)
 
     # 20% spawn chance for RoboDrone
-    if random.random() < 0.20:
-        ex = base_x + random.randint(0, CHUNK_SIZE-1) + 0.5
-        ez = base_z + random.randint(0, CHUNK_SIZE-1) + 0.5
+    if rng.random() < 0.20:
+        ex = base_x + rng.randint(0, CHUNK_SIZE-1) + 0.5
+        ez = base_z + rng.randint(0, CHUNK_SIZE-1) + 0.5
         ey = GROUND_LEVEL + 10.0
-        e = RoboDrone(ex, ey, ez, (cx, cz))
+        e = RoboDrone(ex, ey, ez, (cx, cz), rng)
         enemies.append(e)
 
     return chunk_data, pickups, enemies
 
 def chunk_generation_worker():
     while True:
+        idle = tracer.now()
         task = generation_queue.get()
+        tracer.complete("idle", idle)
         if task is None:
             break
+        tracer.dequeue(task)
         action, cx, cz = task
         if action == "loadgen":
+            start = tracer.now()
             chunk_data, pickups, enemies = generate_chunk_data(cx, cz)
+            tracer.complete("generate", start)
+            start = tracer.now()
             vertex_data = build_chunk_vertex_data(chunk_data, cx, cz)
-            generated_chunks_queue.put((cx, cz, chunk_data, vertex_data, pickups, enemies))
+            lod_data = build_chunk_lod_vertex_data(chunk_data, cx, cz)
+            section_masks = chunk_connectivity(chunk_data, cx, cz)
+            tracer.complete("mesh", start)
+            generated_chunks_queue.put((cx, cz, chunk_data, vertex_data, lod_data, section_masks, pickups, enemies))
+        elif action == "lodgen":
+            start = tracer.now()
+            # Distant chunks only need the blocks, not their pickups and enemies
+            chunk_data = generate_chunk_terrain(cx, cz, chunk_rng(cx, cz))
+            tracer.complete("generate", start)
+            start = tracer.now()
+            lod_data = build_chunk_lod_vertex_data(chunk_data, cx, cz)
+            tracer.complete("mesh", start, {"lod": True})
+            generated_lod_queue.put((cx, cz, lod_data, chunk_bounds_from_data(chunk_data, cx, cz)))
 
 def start_chunk_worker():
-    t = threading.Thread(target=chunk_generation_worker, daemon=True)
+    t = threading.Thread(target=chunk_generation_worker, name="chunk_generation_worker", daemon=True)
     t.start()
     return t
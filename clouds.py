@@ -0,0 +1,91 @@
+# clouds.py
+import random
+import numpy as np
+from OpenGL.GL import *
+from config import CHUNK_SIZE, RENDER_DISTANCE, CLOUD_WIND, chunk_coords_from_world
+from shaders import get_program, create_vao, VertexFormat
+from resources import resource_ledger
+
+CLOUD_FORMAT = VertexFormat([(0, 3), (2, 2)])  # corner position, cloud centre xz
+
+def chunk_cloud(cx, cz):
+    # Same per-chunk seeding as before, so every chunk keeps its cloud
+    cloud_rand = random.Random((cx * 374761393 + cz * 668265263) ^ 0x12345678)
+    cloud_x = cloud_rand.uniform(cx*CHUNK_SIZE, cx*CHUNK_SIZE+CHUNK_SIZE)
+    cloud_z = cloud_rand.uniform(cz*CHUNK_SIZE, cz*CHUNK_SIZE+CHUNK_SIZE)
+    cloud_y = cloud_rand.uniform(15,20)
+    size = cloud_rand.uniform(5,10)
+    return (cloud_x, cloud_y, cloud_z, size)
+
+class CloudLayer:
+    def __init__(self, radius=RENDER_DISTANCE):
+        self.radius = radius
+        self.clouds = {}  # (cx, cz): (x, y, z, size)
+        self.center_chunk = None
+        self.vertex_count = 0
+        self.buffer = None
+        self.vao = None
+        self.dirty = False
+        self.start_time = None
+
+    def update(self, px, pz):
+        center = chunk_coords_from_world(px, pz)
+        if center == self.center_chunk:
+            return
+        self.center_chunk = center
+        pcx, pcz = center
+        r = self.radius
+        wanted = set((cx, cz) for cx in range(pcx - r, pcx + r + 1) for cz in range(pcz - r, pcz + r + 1))
+        for key in list(self.clouds):
+            if key not in wanted:
+                del self.clouds[key]
+        for key in wanted:
+            if key not in self.clouds:
+                self.clouds[key] = chunk_cloud(*key)
+        self.dirty = True
+
+    def _upload(self):
+        data = np.empty((len(self.clouds), 6, 5), dtype=np.float32)
+        for i, (x, y, z, size) in enumerate(self.clouds.values()):
+            corners = ((x-size, z-size), (x+size, z-size), (x+size, z+size), (x-size, z+size))
+            for j, k in enumerate((0, 1, 2, 0, 2, 3)):
+                data[i, j] = (corners[k][0], y, corners[k][1], x, z)
+        if self.buffer is None:
+            self.buffer = glGenBuffers(1)
+            resource_ledger.gl_created("buffer", self.buffer)
+            self.vao = create_vao(self.buffer, CLOUD_FORMAT)
+        glBindBuffer(GL_ARRAY_BUFFER, self.buffer)
+        glBufferData(GL_ARRAY_BUFFER, data.nbytes, data, GL_STATIC_DRAW)
+        resource_ledger.gl_resized("buffer", self.buffer, data.nbytes)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        self.vertex_count = len(self.clouds) * 6
+        self.dirty = False
+
+    def draw(self, view_proj, px, py, pz, now):
+        if self.dirty:
+            self._upload()
+        if not self.vertex_count:
+            return
+        if self.start_time is None:
+            self.start_time = now
+        elapsed = now - self.start_time
+        pcx, pcz = self.center_chunk
+        span = (2*self.radius + 1) * CHUNK_SIZE
+        prog = get_program("clouds")
+        prog.use()
+        prog.set_matrix("u_view_proj", view_proj)
+        prog.set_vec2("u_wind_offset", CLOUD_WIND[0]*elapsed, CLOUD_WIND[1]*elapsed)
+        prog.set_vec2("u_origin", (pcx - self.radius)*CHUNK_SIZE, (pcz - self.radius)*CHUNK_SIZE)
+        prog.set_float("u_span", span)
+        prog.set_vec3("u_eye", px, py, pz)
+        prog.set_float("u_radius", CHUNK_SIZE*(self.radius+1))
+        prog.set_vec4("u_color", 1.0, 1.0, 1.0, 0.8)
+        glEnable(GL_BLEND)
+        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        glBindVertexArray(self.vao)
+        glDrawArrays(GL_TRIANGLES, 0, self.vertex_count)
+        glBindVertexArray(0)
+        glDisable(GL_BLEND)
+        glUseProgram(0)
+
+cloud_layer = CloudLayer()
@@ -1,9 +1,11 @@
 # config.py
 import math
+from registry import EntityRegistry
 
 WIN_WIDTH = 1280
 WIN_HEIGHT = 720
 FOV = 70.0
+BLOCK_OUTLINES = True
 
 MOVE_SPEED = 6.0
 MOUSE_SENSITIVITY = 0.2
@@ -14,9 +16,61 @@ PLAYER_COLLISION_RADIUS = 0.3
 PLAYER_HEIGHT = 1.7
 
 CHUNK_SIZE = 16
+SECTION_HEIGHT = 16
+WORLD_MIN_SECTION = 0
+WORLD_MAX_SECTION = 1
 RENDER_DISTANCE = 4
+LOD_RENDER_DISTANCE = 10
+LOD_DETAIL_RADIUS = 2.0
+LOD_HYSTERESIS = 0.35
+CLOUD_WIND = (0.0, 0.0)  # blocks per second along x and z
 GROUND_LEVEL = 0
-LOADS_PER_FRAME = 1
+UPLOAD_BUDGET_MS = 4.0
+UPLOAD_LOADING_BUDGET_MS = 50.0
+UPLOAD_COMBAT_BUDGET_MS = 1.5
+
+CHUNK_ARENA_INITIAL_VERTICES = 1 << 19
+LOD_ARENA_INITIAL_VERTICES = 1 << 17
+ARENA_ALLOC_GRANULARITY = 64
+ARENA_DEFRAG_THRESHOLD = 0.25
+ARENA_DEFRAG_MOVES_PER_FRAME = 1
+
+MAX_BULLET_MARKS = 2048
+BULLET_MARKS_PER_CHUNK = 256
+BULLET_MARK_SIZE = 0.02
+
+ASSET_CACHE_DIR = ".cache/sounds"
+AUDIO_CHANNELS = 32
+AUDIO_LOOP_CHANNELS = 4
+AUDIO_MAX_VOICES = 16
+AUDIO_SAME_SOUND_PER_FRAME = 2
+AUDIO_MAX_DISTANCE = 32.0
+PROFILER_HISTORY = 600  # frames kept for the rolling percentiles
+PROFILER_OVERLAY_INTERVAL = 0.25  # seconds between overlay refreshes
+TRACE_BUFFER_EVENTS = 200000  # newest events kept per thread by --trace
+RESOURCE_SAMPLE_INTERVAL = 10.0  # seconds between resource ledger samples
+RESOURCE_SAMPLE_HISTORY = 4320  # samples kept, 12 hours at the default interval
+RESOURCE_WARMUP = 60.0  # seconds of play before the leak baseline is taken
+BENCH_SEED = 1234
+WORLD_SEED = 0  # offsets every chunk's generator seed; 0 is the original world
+FIXED_TICK_RATE = 60  # ticks per second when recording or replaying input
+MAX_FRAME_STEP = 0.05  # seconds; longer frames advance the simulation by this much
+REPLAY_HASH_INTERVAL = 120  # ticks between state-hash checks in recordings
+
+LOS_REFRESH_INTERVAL = 0.25
+LOS_POSITION_TOLERANCE = 1.0  # blocks either end of a cached ray may move before it is re-cast
+FLOW_FIELD_RADIUS = 24
+FLOW_FIELD_NODES_PER_FRAME = 1500
+FLOW_FIELD_RETARGET = 2  # cells the player can move before the field is rebuilt around them
+
+MAX_ENEMIES = 24
+MAX_ENEMIES_PER_TYPE = {"RobotDog": 16, "RoboDrone": 10}
+MAX_ENEMIES_PER_AREA = 4
+SPAWN_AREA_CHUNKS = 3
+ENEMY_SIM_BUDGET_MS = 4.0
+SPAWNS_PER_FRAME = 1
+SPAWN_CHECKS_PER_FRAME = 8
+DESPAWN_DISTANCE = 48.0
 
 WEAPONS = [
     {"name":"Pistol", "color":(0.5,0.5,0.5), "id":"pistol"},
@@ -24,11 +78,12 @@ WEAPONS = [
     {"name":"Rocket Launcher", "color":(0.8,0.0,0.0), "id":"rocket"}
 ]
 
-all_pickups = []
-all_enemies = []
 chunk_update_queue = []
 
 def chunk_coords_from_world(x, z):
     cx = math.floor(x / CHUNK_SIZE)
     cz = math.floor(z / CHUNK_SIZE)
     return cx, cz
+
+all_pickups = EntityRegistry(chunk_coords_from_world)
+all_enemies = EntityRegistry(chunk_coords_from_world)
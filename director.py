@@ -0,0 +1,116 @@
+# director.py
+import math
+from collections import deque
+from config import (MAX_ENEMIES, MAX_ENEMIES_PER_TYPE, MAX_ENEMIES_PER_AREA, SPAWN_AREA_CHUNKS,
+                    ENEMY_SIM_BUDGET_MS, SPAWNS_PER_FRAME, SPAWN_CHECKS_PER_FRAME, DESPAWN_DISTANCE,
+                    all_enemies)
+from visibility import los_cache
+
+class SpawnDirector:
+    def __init__(self):
+        self.queue = deque()     # candidate enemies offered by generated chunks, not yet live
+        self.live_by_type = {}
+        self.sim_cost_ms = 0.0   # smoothed enemy simulation cost per frame
+        self.spawned = 0
+        self.despawned = 0
+        self.throttled_frames = 0
+        self.throttled = False   # this frame's decision, kept by input recordings
+        self.forced_throttle = None  # replays impose the recorded decision instead of timing it
+
+    def offer(self, enemies):
+        self.queue.extend(enemies)
+
+    def drop_chunk(self, cx, cz):
+        if self.queue:
+            self.queue = deque(e for e in self.queue if e.chunk_coords != (cx, cz))
+
+    def record_sim_cost(self, ms):
+        self.sim_cost_ms += (ms - self.sim_cost_ms) * 0.1
+
+    def _count_live(self):
+        counts = {}
+        for e in all_enemies:
+            name = type(e).__name__
+            counts[name] = counts.get(name, 0) + 1
+        self.live_by_type = counts
+
+    def _area_count(self, cx, cz):
+        r = SPAWN_AREA_CHUNKS // 2
+        area = [(x, z) for x in range(cx - r, cx + r + 1) for z in range(cz - r, cz + r + 1)]
+        return sum(1 for _ in all_enemies.in_chunks(area))
+
+    def _despawn_far_idle(self, px, pz, kind=None, beyond=DESPAWN_DISTANCE):
+        farthest = None
+        farthest_dist = beyond
+        for e in all_enemies:
+            if kind is not None and type(e).__name__ != kind:
+                continue
+            if not e.is_idle():
+                continue
+            dist = math.sqrt((e.x - px)**2 + (e.z - pz)**2)
+            if dist > farthest_dist:
+                farthest = e
+                farthest_dist = dist
+        if farthest is None:
+            return False
+        all_enemies.remove(farthest)
+        los_cache.forget(farthest)
+        name = type(farthest).__name__
+        self.live_by_type[name] = self.live_by_type.get(name, 1) - 1
+        self.despawned += 1
+        return True
+
+    def _has_room(self, e, px, pz):
+        cx, cz = e.chunk_coords
+        if self._area_count(cx, cz) >= MAX_ENEMIES_PER_AREA:
+            return False
+        name = type(e).__name__
+        dist = math.sqrt((e.x - px)**2 + (e.z - pz)**2)
+        if self.live_by_type.get(name, 0) >= MAX_ENEMIES_PER_TYPE.get(name, MAX_ENEMIES):
+            # Make room only by trading a farther idle enemy for this nearer one
+            if not self._despawn_far_idle(px, pz, kind=name, beyond=max(dist, DESPAWN_DISTANCE)):
+                return False
+        if len(all_enemies) >= MAX_ENEMIES:
+            if not self._despawn_far_idle(px, pz, beyond=max(dist, DESPAWN_DISTANCE)):
+                return False
+        return True
+
+    def update(self, px, pz, loaded_chunks):
+        self._count_live()
+        if self.forced_throttle is None:
+            self.throttled = self.sim_cost_ms > ENEMY_SIM_BUDGET_MS
+        else:
+            self.throttled = self.forced_throttle
+        if self.throttled:
+            # Over budget: hold spawns and shed the farthest idle enemy
+            self.throttled_frames += 1
+            self._despawn_far_idle(px, pz)
+            return
+        spawns = 0
+        checks = min(SPAWN_CHECKS_PER_FRAME, len(self.queue))
+        while checks > 0 and spawns < SPAWNS_PER_FRAME:
+            checks -= 1
+            e = self.queue.popleft()
+            if e.chunk_coords not in loaded_chunks:
+                continue
+            if not self._has_room(e, px, pz):
+                self.queue.append(e)
+                continue
+            all_enemies.add(e)
+            name = type(e).__name__
+            self.live_by_type[name] = self.live_by_type.get(name, 0) + 1
+            self.spawned += 1
+            spawns += 1
+
+    def stats(self):
+        return {
+            "live": len(all_enemies),
+            "live_by_type": dict(self.live_by_type),
+            "queued": len(self.queue),
+            "spawned": self.spawned,
+            "despawned": self.despawned,
+            "sim_cost_ms": self.sim_cost_ms,
+            "throttled_frames": self.throttled_frames,
+        }
+
+director = SpawnDirector()
@@ -1,12 +1,20 @@
 # entities.py
 
 import math, random, time
+import numpy as np
 from OpenGL.GL import *
 from OpenGL.GLU import *
 from config import PLAYER_EYE_HEIGHT, chunk_update_queue, chunk_coords_from_world, all_enemies
-from render import draw_box
+from visibility import line_block_intersect_3d, los_cache
+from pathfinding import flow_field
+from occlusion import section_graph
+from shaders import get_program, StreamBuffer, POSITION_RGBA
+from models import MeshBuilder, InstancedMesh, model_matrices, rotation_x_matrices, pack_instances
+from config import SECTION_HEIGHT
 import bulletmarks
 import pygame
+from audio import audio_mixer
+from simclock import sim_clock
 
 enemy_pistol_sound = None
 robodrone_sound = None
@@ -122,24 +130,6 @@ def get_block_below(x, y, z, world):
     bz = int(math.floor(z))
     return (bx, below_y, bz) in world
 
-def line_block_intersect_3d(x1,y1,z1,x2,y2,z2,world):
-    steps = int(max(abs(x2-x1), abs(y2-y1), abs(z2-z1))*2)
-    if steps < 1:
-        steps = 1
-    dx = (x2-x1)/steps
-    dy = (y2-y1)/steps
-    dz = (z2-z1)/steps
-    for i in range(steps+1):
-        cx = x1+dx*i
-        cy = y1+dy*i
-        cz = z1+dz*i
-        bx = int(math.floor(cx))
-        by = int(math.floor(cy))
-        bz = int(math.floor(cz))
-        if (bx,by,bz) in world and not (i==steps):
-            return True
-    return None
-
 class Bullet:
     def __init__(self, x, y, z, dx, dy, dz, radius=0.2, speed=30.0, max_dist=20.0, owner=None):
         self.x = x
@@ -181,13 +171,6 @@ class Bullet:
         self.last_x, self.last_y, self.last_z = self.x, self.y, self.z
         return True
 
-    def draw(self, sphere_quad):
-        glPushMatrix()
-        glTranslatef(self.x, self.y, self.z)
-        glColor3f(0.0,0.0,0.0)
-        gluSphere(sphere_quad,self.radius,16,16)
-        glPopMatrix()
-
 class Rocket:
     def __init__(self, x, y, z, dx, dy, dz):
         self.x = x
@@ -247,7 +230,7 @@ class Rocket:
                     if dist <= radius and (X,Y,Z) in world:
                         to_remove.append((X,Y,Z))
 
-        for e in all_enemies:
+        for e in all_enemies.near(self.x, self.z, radius + 1):
             dist = math.sqrt((e.x - self.x)**2 + ((e.y+0.5)-self.y)**2 + (e.z - self.z)**2)
             if dist <= radius:
                 e.take_damage(100)
@@ -260,8 +243,10 @@ class Rocket:
         for (X,Y,Z) in to_remove:
             cx, cz = chunk_coords_from_world(X,Z)
             updated_chunks.add((cx,cz))
+            section_graph.mark_dirty(cx, cz, Y // SECTION_HEIGHT)
         for (cx,cz) in updated_chunks:
             chunk_update_queue.append(("load", cx, cz))
+        los_cache.invalidate_chunks(updated_chunks)
 
         explosions.append(Explosion(self.x,self.y,self.z))
 
@@ -342,14 +327,9 @@ class Explosion:
             self.alive=False
         return self.alive
 
-    def draw(self, px, py, pz, sphere_quad):
+    def draw(self, sphere_quad):
         if not self.alive:
             return
-        dx = self.x - px
-        dy = self.y - py
-        dz = self.z - pz
-        dist = math.sqrt(dx*dx+dy*dy+dz*dz)
-        point_size = max(1.0, 50.0/(dist+1.0))
         fireball_radius = 1.5 * self.fireball_life
         if fireball_radius > 0:
             glPushMatrix()
@@ -358,13 +338,27 @@ class Explosion:
             gluSphere(sphere_quad, fireball_radius,16,16)
             glPopMatrix()
 
-        glPointSize(point_size)
-        glBegin(GL_POINTS)
-        for p in self.particles:
+particle_stream = StreamBuffer(POSITION_RGBA)
+
+def draw_explosion_particles(explosions, view_proj, px, py, pz):
+    # All live sparks of all explosions in one draw; the shader sizes points by distance
+    data = []
+    for e in explosions:
+        if not e.alive:
+            continue
+        for p in e.particles:
             if p["life"]>0:
-                glColor4f(1.0,0.5,0.0,p["life"])
-                glVertex3f(p["x"],p["y"],p["z"])
-        glEnd()
+                data.extend((p["x"],p["y"],p["z"],1.0,0.5,0.0,p["life"]))
+    if not data:
+        return
+    prog = get_program("particles")
+    prog.use()
+    prog.set_matrix("u_view_proj", view_proj)
+    prog.set_vec3("u_eye", px, py, pz)
+    glEnable(GL_PROGRAM_POINT_SIZE)
+    particle_stream.draw(GL_POINTS, data)
+    glDisable(GL_PROGRAM_POINT_SIZE)
+    glUseProgram(0)
 
 class AmmoPickup:
     ammo_info = {
@@ -386,39 +380,6 @@ class AmmoPickup:
     def update(self, dt_s):
         pass
 
-    def draw(self):
-        elapsed = time.time() - self.spawn_time
-        bob = math.sin(elapsed*4.0)*0.25
-        c = self.ammo_info[self.ammo_type]["color"]
-        px, py, pz = self.x, self.y+bob, self.z
-        hw = 0.2
-        hh = 0.1
-        hl = 0.2
-        glColor3f(*c)
-        glBegin(GL_QUADS)
-        v = [
-            (px - hw, py - hh, pz - hl),
-            (px + hw, py - hh, pz - hl),
-            (px + hw, py + hh, pz - hl),
-            (px - hw, py + hh, pz - hl),
-            (px - hw, py - hh, pz + hl),
-            (px - hw, py + hh, pz + hl),
-            (px + hw, py + hh, pz + hl),
-            (px + hw, py - hh, pz + hl),
-        ]
-        faces = [(0,1,2,3),(4,5,6,7),(0,3,5,4),(1,7,6,2),(3,2,6,5),(0,4,7,1)]
-        for f in faces:
-            for idx in f:
-                glVertex3f(*v[idx])
-        glEnd()
-        glColor3f(0,0,0)
-        edges = [(0,1),(1,2),(2,3),(3,0),(4,5),(5,6),(6,7),(7,4),(0,4),(1,7),(2,6),(3,5)]
-        glBegin(GL_LINES)
-        for (a,b) in edges:
-            glVertex3f(*v[a])
-            glVertex3f(*v[b])
-        glEnd()
-
     def distance_to(self, px, py, pz):
         dx = self.x - px
         dy = self.y - py
@@ -426,7 +387,7 @@ class AmmoPickup:
         return math.sqrt(dx*dx + dy*dy + dz*dz)
 
 class RobotDog:
-    def __init__(self, x, y, z, chunk_coords):
+    def __init__(self, x, y, z, chunk_coords, rng=random):
         self.x = x
         self.y = y
         self.z = z
@@ -434,20 +395,25 @@ class RobotDog:
         self.health = 50
         self.max_health = 50
         self.speed = 6.0
-        self.yaw = random.uniform(0,360)
+        self.yaw = rng.uniform(0,360)
         self.target_yaw = self.yaw
         self.turn_speed = 30.0
         self.walk_timer = 0.0
         self.walk_time = 0.0
-        self.change_dir_interval = random.uniform(3,6)
+        self.change_dir_interval = rng.uniform(3,6)
         self.time_since_last_change = 0.0
         self.vy = 0.0
-        self._pick_new_direction(force_move=True)
+        self._pick_new_direction(force_move=True, rng=rng)
 
         self.last_shot_time = 0.0
         self.fire_delay = 5.0
         self.shoot_range = 30.0
 
+        self.pursuing = False
+        self.pursuit_range = 40.0
+        self.stop_distance = 6.0
+        self.pursuit_turn_speed = 240.0
+
         self.gun_yaw = 0.0
         self.gun_pitch = 0.0
 
@@ -463,21 +429,21 @@ class RobotDog:
                 return attempt_yaw
         return random.uniform(0,360)
 
-    def _pick_new_direction(self, force_move=False, world=None):
+    def _pick_new_direction(self, force_move=False, world=None, rng=random):
         if world is not None:
             self.target_yaw = self._try_new_direction(world)
         else:
-            self.target_yaw = random.uniform(0,360)
+            self.target_yaw = rng.uniform(0,360)
         if force_move:
-            self.walk_time = random.uniform(2,4)
+            self.walk_time = rng.uniform(2,4)
         else:
-            if random.random() < 0.2:
+            if rng.random() < 0.2:
                 self.walk_time = 0.0
             else:
-                self.walk_time = random.uniform(2,4)
+                self.walk_time = rng.uniform(2,4)
         self.walk_timer = 0.0
         self.time_since_last_change = 0.0
-        self.change_dir_interval = random.uniform(3,6)
+        self.change_dir_interval = rng.uniform(3,6)
 
     def update(self, dt_s, player_pos, world, bullets, explosions):
         if self.health <= 0:
@@ -495,11 +461,22 @@ class RobotDog:
             if self.vy < 0:
                 self.vy = 0.0
 
+        # Pursue the player along the shared flow field, otherwise wander
+        px, py, pz = player_pos
+        player_dist = math.sqrt((px - self.x)**2 + (pz - self.z)**2)
+        self.pursuing = False
+        if self.stop_distance < player_dist < self.pursuit_range:
+            flow_yaw = flow_field.direction_at(self.x, self.z)
+            if flow_yaw is not None:
+                self.pursuing = True
+                self.target_yaw = flow_yaw
+
         # Turn towards target_yaw
         yaw_diff = (self.target_yaw - self.yaw) % 360
         if yaw_diff > 180:
             yaw_diff -= 360
-        turn_amount = self.turn_speed * dt_s
+        turn_speed = self.pursuit_turn_speed if self.pursuing else self.turn_speed
+        turn_amount = turn_speed * dt_s
         if abs(yaw_diff) < turn_amount:
             self.yaw = self.target_yaw
         else:
@@ -509,8 +486,18 @@ class RobotDog:
                 self.yaw -= turn_amount
         self.yaw %= 360
 
+        if self.pursuing:
+            yaw_rad = math.radians(self.yaw)
+            proposed_x = self.x - math.sin(yaw_rad) * self.speed * dt_s
+            proposed_z = self.z + math.cos(yaw_rad) * self.speed * dt_s
+            if not dog_collides_with_world(proposed_x, self.y, proposed_z, world):
+                self.x = proposed_x
+                self.z = proposed_z
+            else:
+                # Still mid-turn around an obstacle; face the field direction outright
+                self.yaw = self.target_yaw
         # Move if walk_time > 0
-        if self.walk_time > 0:
+        elif self.walk_time > 0:
             yaw_rad = math.radians(self.yaw)
             forward_x = -math.sin(yaw_rad)
             forward_z = math.cos(yaw_rad)
@@ -526,12 +513,12 @@ class RobotDog:
                 self._pick_new_direction(force_move=True, world=world)
 
         # Occasionally pick new direction
-        self.time_since_last_change += dt_s
-        if self.time_since_last_change >= self.change_dir_interval:
-            self._pick_new_direction(world=world)
+        if not self.pursuing:
+            self.time_since_last_change += dt_s
+            if self.time_since_last_change >= self.change_dir_interval:
+                self._pick_new_direction(world=world)
 
         # Aim at player:
-        px, py, pz = player_pos
         dx = px - self.x
         dz = pz - self.z
         rad_yaw = math.radians(self.yaw)
@@ -545,98 +532,33 @@ class RobotDog:
 
         dy = (py+PLAYER_EYE_HEIGHT) - (self.y+1.05)
         dist = math.sqrt(dx*dx + dz*dz)
-        if dist < self.shoot_range:
-            res = line_block_intersect_3d(self.x, self.y+0.5, self.z, px, py+PLAYER_EYE_HEIGHT, pz, world)
-            if res is None:
-                current_time = time.time()
-                if (current_time - self.last_shot_time) > self.fire_delay:
-                    mag = math.sqrt(dx*dx+dy*dy+dz*dz)
-                    if mag>1e-9:
-                        dx/=mag
-                        dy/=mag
-                        dz/=mag
-                    start_x = self.x + dx * 0.6
-                    start_y = self.y + 0.8 + dy * 0.6
-                    start_z = self.z + dz * 0.6
-                    b = Bullet(start_x, start_y, start_z, dx, dy, dz, radius=0.05, owner=self)
-                    bullets.append(b)
-                    if enemy_pistol_sound is not None:
-                        edist = math.sqrt((self.x - px)**2 + (self.y - py)**2 + (self.z - pz)**2)
-                        vol = 0.0
-                        if edist < 32.0:
-                            vol = 1.0 - (edist/32.0)
-                        enemy_pistol_sound.set_volume(vol)
-                        if vol>0.0:
-                            enemy_pistol_sound.play()
-                    self.last_shot_time = current_time
+        current_time = sim_clock.now()
+        if dist < self.shoot_range and (current_time - self.last_shot_time) > self.fire_delay:
+            # LOS is only worth a ray once the gun is ready to fire
+            if los_cache.has_line_of_sight(self, self.x, self.y+0.5, self.z, px, py+PLAYER_EYE_HEIGHT, pz, world):
+                mag = math.sqrt(dx*dx+dy*dy+dz*dz)
+                if mag>1e-9:
+                    dx/=mag
+                    dy/=mag
+                    dz/=mag
+                start_x = self.x + dx * 0.6
+                start_y = self.y + 0.8 + dy * 0.6
+                start_z = self.z + dz * 0.6
+                b = Bullet(start_x, start_y, start_z, dx, dy, dz, radius=0.05, owner=self)
+                bullets.append(b)
+                audio_mixer.play(enemy_pistol_sound, (self.x, self.y, self.z))
+                self.last_shot_time = current_time
 
         return True
 
     def take_damage(self, amount):
         self.health -= amount
 
-    def draw(self):
-        glPushMatrix()
-        glTranslatef(self.x, self.y, self.z)
-        glRotatef(-self.yaw, 0,1,0)
-
-        # Body:
-        body_hw = 0.25
-        body_hh = 0.12
-        body_hl = 0.5
-        glColor3f(1.0,0.85,0.0)
-        draw_box(0,0.72,0,body_hw,body_hh,body_hl)
-
-        # Head:
-        glColor3f(0.0,0.0,0.0)
-        head_hw = 0.12
-        head_hh = 0.12
-        head_hl = 0.12
-        draw_box(0,0.9,body_hl+head_hl, head_hw, head_hh, head_hl)
-
-        # Legs:
-        leg_hw = 0.05
-        leg_hh = 0.3
-        leg_hl = 0.05
-        draw_box(-body_hw+leg_hw,0.3, body_hl-leg_hl, leg_hw, leg_hh, leg_hl)
-        draw_box(body_hw-leg_hw,0.3, body_hl-leg_hl, leg_hw, leg_hh, leg_hl)
-        draw_box(-body_hw+leg_hw,0.3,-body_hl+leg_hl, leg_hw, leg_hh, leg_hl)
-        draw_box(body_hw-leg_hw,0.3,-body_hl+leg_hl, leg_hw, leg_hh, leg_hl)
-
-        # Pistol:
-        glPushMatrix()
-        glTranslatef(0, 1.05, 0)
-        glScalef(1.5,1.5,1.5)
-        glRotatef(self.gun_yaw, 0,1,0)
-        glRotatef(-self.gun_pitch, 1,0,0)
-
-        def draw_pistol_for_dog():
-            glColor3f(0.8,0.8,0.8)
-            slide_half_w = 0.03
-            slide_half_h = 0.03
-            slide_half_l = 0.15
-            slide_center_z = 0.075
-            draw_box(0,0,slide_center_z, slide_half_w, slide_half_h, slide_half_l)
-
-            handle_half_w = 0.02
-            handle_half_h = 0.05
-            handle_half_l = 0.05
-            handle_center_z = 0.05
-            handle_center_y = -0.03 - handle_half_h
-            draw_box(0, handle_center_y, handle_center_z, handle_half_w, handle_half_h, handle_half_l)
-
-            barrel_half_w = 0.01
-            barrel_half_h = 0.01
-            barrel_half_l = 0.05
-            barrel_center_z = 0.175
-            draw_box(0,0,barrel_center_z, barrel_half_w, barrel_half_h, barrel_half_l)
-        draw_pistol_for_dog()
-        glPopMatrix()
-
-        glPopMatrix()
+    def is_idle(self):
+        return not self.pursuing
 
 class RoboDrone:
-    def __init__(self, x, y, z, chunk_coords):
+    def __init__(self, x, y, z, chunk_coords, rng=random):
         self.x = x
         self.y = y
         self.z = z
@@ -646,11 +568,11 @@ class RoboDrone:
         self.patrol_speed = 6.0
         self.attack_speed = 10.0
         self.current_speed = self.patrol_speed
-        self.yaw = random.uniform(0,360)
+        self.yaw = rng.uniform(0,360)
         self.target_yaw = self.yaw
         self.turn_speed = 30.0
         self.time_since_last_change = 0.0
-        self.change_dir_interval = random.uniform(3,6)
+        self.change_dir_interval = rng.uniform(3,6)
 
         # State: "patrol" or "attack"
         self.state = "patrol"
@@ -666,10 +588,12 @@ class RoboDrone:
     def take_damage(self, amount):
         self.health -= amount
 
+    def is_idle(self):
+        return self.state == "patrol"
+
     def explode(self, world, explosions):
         # Play explosion sound for drone
-        if robodrone_explosion_sound is not None:
-            robodrone_explosion_sound.play()
+        audio_mixer.play(robodrone_explosion_sound, (self.x, self.y, self.z), priority=3.0, max_distance=64.0)
 
         from config import all_enemies, chunk_update_queue, chunk_coords_from_world
         ex, ey, ez = int(math.floor(self.x)), int(math.floor(self.y)), int(math.floor(self.z))
@@ -682,7 +606,7 @@ class RoboDrone:
                     if dist <= radius and (X,Y,Z) in world:
                         to_remove.append((X,Y,Z))
 
-        for e in all_enemies:
+        for e in all_enemies.near(self.x, self.z, radius + 1):
             dist = math.sqrt((e.x - self.x)**2 + ((e.y+0.5)-self.y)**2 + (e.z - self.z)**2)
             if dist <= radius:
                 e.take_damage(100)
@@ -695,8 +619,10 @@ class RoboDrone:
         for (X,Y,Z) in to_remove:
             cx, cz = chunk_coords_from_world(X,Z)
             updated_chunks.add((cx,cz))
+            section_graph.mark_dirty(cx, cz, Y // SECTION_HEIGHT)
         for (cx,cz) in updated_chunks:
             chunk_update_queue.append(("load", cx, cz))
+        los_cache.invalidate_chunks(updated_chunks)
 
         explosions.append(Explosion(self.x,self.y,self.z))
 
@@ -782,42 +708,91 @@ class RoboDrone:
 
         return True
 
-    def draw(self):
-        glPushMatrix()
-        glTranslatef(self.x, self.y, self.z)
-        glRotatef(-self.yaw, 0,1,0)
-
-        body_hw = 0.15
-        body_hh = 0.1
-        body_hl = 0.4
-        glColor3f(1.0, 0.85, 0.0)
-        draw_box(0,0,0, body_hw, body_hh, body_hl)
-
-        # Propellers with a bit of height:
-        # 1/4 the height of the body = body height is 2*body_hh = 0.2, 1/4 = 0.05
-        prop_radius = 0.3
-        prop_height = 0.05
-        glColor3f(0.2,0.2,0.2)
-        prop_positions = [
-            ( body_hw,  body_hh+0.05,  body_hl),
-            (-body_hw,  body_hh+0.05,  body_hl),
-            ( body_hw,  body_hh+0.05, -body_hl),
-            (-body_hw,  body_hh+0.05, -body_hl),
-        ]
-
-        quadric = gluNewQuadric()
-        for (px, py, pz) in prop_positions:
-            glPushMatrix()
-            glTranslatef(px, py, pz)
-            # Rotate so disk normal is along y-axis (horizontal rotor)
-            glRotatef(-90, 1,0,0)
-            # Bottom disk
-            gluDisk(quadric, 0, prop_radius, 32, 1)
-            # Cylinder
-            gluCylinder(quadric, prop_radius, prop_radius, prop_height, 32, 1)
-            # Move up and top disk
-            glTranslatef(0, prop_height, 0)
-            gluDisk(quadric, 0, prop_radius, 32, 1)
-            glPopMatrix()
-
-        glPopMatrix()
\ No newline at end of file
+def build_dog_mesh():
+    mb = MeshBuilder()
+    body_hw, body_hh, body_hl = 0.25, 0.12, 0.5
+    mb.box(0,0.72,0, body_hw,body_hh,body_hl, (1.0,0.85,0.0))
+    head_hw = head_hh = head_hl = 0.12
+    mb.box(0,0.9,body_hl+head_hl, head_hw,head_hh,head_hl, (0.0,0.0,0.0))
+    leg_hw, leg_hh, leg_hl = 0.05, 0.3, 0.05
+    for (lx, lz) in ((-body_hw+leg_hw, body_hl-leg_hl), (body_hw-leg_hw, body_hl-leg_hl),
+                     (-body_hw+leg_hw, -body_hl+leg_hl), (body_hw-leg_hw, -body_hl+leg_hl)):
+        mb.box(lx,0.3,lz, leg_hw,leg_hh,leg_hl, (0.0,0.0,0.0))
+    # Pistol, posed per instance through the part matrix
+    gun = (0.8,0.8,0.8)
+    mb.box(0,0,0.075, 0.03,0.03,0.15, gun, part=1)
+    mb.box(0,-0.03-0.05,0.05, 0.02,0.05,0.05, gun, part=1)
+    mb.box(0,0,0.175, 0.01,0.01,0.05, gun, part=1)
+    return InstancedMesh(mb)
+
+def build_drone_mesh():
+    mb = MeshBuilder()
+    body_hw, body_hh, body_hl = 0.15, 0.1, 0.4
+    mb.box(0,0,0, body_hw,body_hh,body_hl, (1.0,0.85,0.0))
+    prop_radius = 0.3
+    prop_height = 0.05
+    prop = (0.2,0.2,0.2)
+    for (px, pz) in ((body_hw, body_hl), (-body_hw, body_hl), (body_hw, -body_hl), (-body_hw, -body_hl)):
+        py = body_hh+0.05
+        mb.disk(px,py,pz, prop_radius, 32, prop)
+        mb.cylinder(px,py,pz, prop_radius, prop_height, 32, prop)
+        mb.disk(px,py+prop_height,pz, prop_radius, 32, prop)
+    return InstancedMesh(mb)
+
+def build_pickup_mesh():
+    # White so the per-instance tint gives the ammo color; the outline stays black
+    mb = MeshBuilder()
+    mb.box(0,0,0, 0.2,0.1,0.2, (1.0,1.0,1.0))
+    return InstancedMesh(mb)
+
+def build_bullet_mesh():
+    mb = MeshBuilder()
+    mb.sphere(1.0, 16, 16, (0.0,0.0,0.0))
+    return InstancedMesh(mb)
+
+entity_meshes = {}  # built on first draw rather than at import
+
+def get_entity_meshes():
+    if not entity_meshes:
+        entity_meshes["dog"] = build_dog_mesh()
+        entity_meshes["drone"] = build_drone_mesh()
+        entity_meshes["pickup"] = build_pickup_mesh()
+        entity_meshes["bullet"] = build_bullet_mesh()
+    return entity_meshes
+
+def draw_entity_instances(view_proj, bullets, pickups, enemies):
+    meshes = get_entity_meshes()
+    dogs = []
+    drones = []
+    for en in enemies:
+        if isinstance(en, RobotDog):
+            dogs.append(en)
+        elif isinstance(en, RoboDrone):
+            drones.append(en)
+
+    if dogs:
+        body = model_matrices([d.x for d in dogs], [d.y for d in dogs], [d.z for d in dogs],
+                              [-d.yaw for d in dogs])
+        gun = model_matrices(np.zeros(len(dogs)), np.full(len(dogs), 1.05), np.zeros(len(dogs)),
+                             [d.gun_yaw for d in dogs], np.full(len(dogs), 1.5))
+        gun = body @ gun @ rotation_x_matrices(np.array([-d.gun_pitch for d in dogs], dtype=float))
+        meshes["dog"].draw(view_proj, pack_instances(body, gun))
+
+    if drones:
+        m = model_matrices([d.x for d in drones], [d.y for d in drones], [d.z for d in drones],
+                           [-d.yaw for d in drones])
+        meshes["drone"].draw(view_proj, pack_instances(m))
+
+    if pickups:
+        now = time.time()
+        pickups = list(pickups)
+        m = model_matrices([p.x for p in pickups],
+                           [p.y + math.sin((now - p.spawn_time)*4.0)*0.25 for p in pickups],
+                           [p.z for p in pickups])
+        tints = [AmmoPickup.ammo_info[p.ammo_type]["color"] + (1.0,) for p in pickups]
+        meshes["pickup"].draw(view_proj, pack_instances(m, tints=tints))
+
+    if bullets:
+        m = model_matrices([b.x for b in bullets], [b.y for b in bullets], [b.z for b in bullets],
+                           scale=[b.radius for b in bullets])
+        meshes["bullet"].draw(view_proj, pack_instances(m))
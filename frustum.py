@@ -0,0 +1,68 @@
+# frustum.py
+import math
+import numpy as np
+
+# 4x4 matrices are row-major NumPy arrays acting on column vectors (clip = P @ V @ p),
+# the same matrices gluPerspective/gluLookAt/glOrtho would build. Transpose before
+# handing them to GL, which expects column-major.
+
+def perspective_matrix(fov_y, aspect, near, far):
+    f = 1.0 / math.tan(math.radians(fov_y) / 2.0)
+    return np.array([
+        [f/aspect, 0.0, 0.0, 0.0],
+        [0.0, f, 0.0, 0.0],
+        [0.0, 0.0, (far+near)/(near-far), 2.0*far*near/(near-far)],
+        [0.0, 0.0, -1.0, 0.0],
+    ])
+
+def ortho_matrix(left, right, bottom, top, near, far):
+    return np.array([
+        [2.0/(right-left), 0.0, 0.0, -(right+left)/(right-left)],
+        [0.0, 2.0/(top-bottom), 0.0, -(top+bottom)/(top-bottom)],
+        [0.0, 0.0, -2.0/(far-near), -(far+near)/(far-near)],
+        [0.0, 0.0, 0.0, 1.0],
+    ])
+
+def look_at_matrix(ex, ey, ez, tx, ty, tz, ux, uy, uz):
+    eye = np.array([ex, ey, ez], dtype=float)
+    f = np.array([tx, ty, tz], dtype=float) - eye
+    f /= np.linalg.norm(f)
+    s = np.cross(f, (ux, uy, uz))
+    s /= np.linalg.norm(s)
+    u = np.cross(s, f)
+    m = np.identity(4)
+    m[0, :3] = s
+    m[1, :3] = u
+    m[2, :3] = -f
+    m[:3, 3] = -m[:3, :3] @ eye
+    return m
+
+def gl_matrix(m):
+    # Column-major float32 copy for glLoadMatrixf/glUniformMatrix4fv
+    return np.ascontiguousarray(m.T, dtype=np.float32)
+
+class Frustum:
+    def __init__(self, clip):
+        clip = np.asarray(clip, dtype=float)
+        planes = []
+        for row, sign in ((0, 1), (0, -1), (1, 1), (1, -1), (2, 1), (2, -1)):
+            p = clip[3] + sign * clip[row]
+            p = p / np.linalg.norm(p[:3])
+            planes.append(tuple(float(v) for v in p))
+        self.planes = planes
+
+    @classmethod
+    def from_camera(cls, fov_y, aspect, near, far, eye, target, up=(0,1,0)):
+        proj = perspective_matrix(fov_y, aspect, near, far)
+        view = look_at_matrix(eye[0], eye[1], eye[2], target[0], target[1], target[2], up[0], up[1], up[2])
+        return cls(proj @ view)
+
+    def aabb_visible(self, min_x, min_y, min_z, max_x, max_y, max_z):
+        for (a, b, c, d) in self.planes:
+            # Corner farthest along the plane normal; if even that is behind, the box is outside
+            x = max_x if a >= 0 else min_x
+            y = max_y if b >= 0 else min_y
+            z = max_z if c >= 0 else min_z
+            if a*x + b*y + c*z + d < 0:
+                return False
+        return True
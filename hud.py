@@ -0,0 +1,81 @@
+# hud.py
+import numpy as np
+from OpenGL.GL import *
+from shaders import get_program, StreamBuffer, POSITION2_UV_RGBA
+from text import get_atlas
+
+class HudBatch:
+    # Quads, lines and text for the whole HUD collected per frame and drawn with one
+    # triangle and one line call. Solid shapes sample the atlas's white texels.
+    def __init__(self):
+        self.atlas = None
+        self.tris = []
+        self.lines = []
+        self.static_key = None
+        self.static_tris = np.empty(0, dtype=np.float32)
+        self.static_lines = np.empty(0, dtype=np.float32)
+        self.tri_stream = StreamBuffer(POSITION2_UV_RGBA)
+        self.line_stream = StreamBuffer(POSITION2_UV_RGBA)
+
+    def begin(self, font):
+        self.atlas = get_atlas(font)
+        self.tris = []
+        self.lines = []
+
+    def rect(self, x0, y0, x1, y1, color):
+        u, v = self.atlas.white_uv
+        r, g, b = color[:3]
+        a = color[3] if len(color) > 3 else 1.0
+        self.tris.extend((x0,y0,u,v,r,g,b,a, x1,y0,u,v,r,g,b,a, x1,y1,u,v,r,g,b,a,
+                          x0,y0,u,v,r,g,b,a, x1,y1,u,v,r,g,b,a, x0,y1,u,v,r,g,b,a))
+
+    def line(self, x0, y0, x1, y1, color):
+        u, v = self.atlas.white_uv
+        r, g, b = color[:3]
+        a = color[3] if len(color) > 3 else 1.0
+        self.lines.extend((x0,y0,u,v,r,g,b,a, x1,y1,u,v,r,g,b,a))
+
+    def rect_outline(self, x0, y0, x1, y1, color):
+        self.line(x0, y0, x1, y0, color)
+        self.line(x1, y0, x1, y1, color)
+        self.line(x1, y1, x0, y1, color)
+        self.line(x0, y1, x0, y0, color)
+
+    def text(self, text, x, y, color=(1.0,1.0,1.0,1.0)):
+        return self.atlas.layout(text, x, y, color, self.tris)
+
+    def cached(self, key, build):
+        # Geometry that only changes with key (screen size, layout) is built once and
+        # drawn underneath this frame's dynamic shapes
+        if key != self.static_key:
+            tris, lines = self.tris, self.lines
+            self.tris, self.lines = [], []
+            build(self)
+            self.static_tris = np.array(self.tris, dtype=np.float32)
+            self.static_lines = np.array(self.lines, dtype=np.float32)
+            self.tris, self.lines = tris, lines
+            self.static_key = key
+
+    def flush(self, projection):
+        tris = np.concatenate((self.static_tris, np.array(self.tris, dtype=np.float32)))
+        lines = np.concatenate((self.static_lines, np.array(self.lines, dtype=np.float32)))
+        self.tris = []
+        self.lines = []
+        if not tris.size and not lines.size:
+            return
+        self.atlas.ensure_texture()
+        prog = get_program("text")
+        prog.use()
+        prog.set_matrix("u_projection", projection)
+        prog.set_int("u_atlas", 0)
+        glEnable(GL_BLEND)
+        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        glActiveTexture(GL_TEXTURE0)
+        glBindTexture(GL_TEXTURE_2D, self.atlas.texture)
+        self.tri_stream.draw(GL_TRIANGLES, tris)
+        self.line_stream.draw(GL_LINES, lines)
+        glBindTexture(GL_TEXTURE_2D, 0)
+        glDisable(GL_BLEND)
+        glUseProgram(0)
+
+hud_batch = HudBatch()
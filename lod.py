@@ -0,0 +1,68 @@
+# lod.py
+import math
+from config import CHUNK_SIZE, RENDER_DISTANCE, LOD_RENDER_DISTANCE, LOD_DETAIL_RADIUS, LOD_HYSTERESIS, chunk_coords_from_world
+from chunk_worker import generation_queue
+from tracer import tracer
+from chunk_arena import lod_arena
+
+lod_bounds = {}        # (cx,cz): AABB of the chunk's LOD mesh
+lod_ring = set()       # chunks past RENDER_DISTANCE that only ever get a LOD mesh
+lod_requested = set()  # ring chunks queued on the worker
+full_detail = {}       # (cx,cz): True while the chunk is drawn with its full mesh
+center_chunk = None
+
+def in_lod_range(cx, cz):
+    if center_chunk is None:
+        return False
+    reach = max(LOD_RENDER_DISTANCE, RENDER_DISTANCE)
+    return max(abs(cx - center_chunk[0]), abs(cz - center_chunk[1])) <= reach
+
+def store_lod_mesh(cx, cz, lod_data, bounds):
+    lod_arena.store((cx, cz), lod_data)
+    lod_bounds[(cx, cz)] = bounds
+
+def release_lod_mesh(cx, cz):
+    lod_arena.release((cx, cz))
+    lod_bounds.pop((cx, cz), None)
+    full_detail.pop((cx, cz), None)
+
+def receive_lod_chunk(cx, cz, lod_data, bounds):
+    lod_requested.discard((cx, cz))
+    if in_lod_range(cx, cz):
+        store_lod_mesh(cx, cz, lod_data, bounds)
+
+def update_lod_ring(px, pz):
+    global center_chunk
+    center = chunk_coords_from_world(px, pz)
+    if center == center_chunk:
+        return
+    center_chunk = center
+    pcx, pcz = center
+    ring = set()
+    for cx in range(pcx - LOD_RENDER_DISTANCE, pcx + LOD_RENDER_DISTANCE + 1):
+        for cz in range(pcz - LOD_RENDER_DISTANCE, pcz + LOD_RENDER_DISTANCE + 1):
+            if max(abs(cx - pcx), abs(cz - pcz)) > RENDER_DISTANCE:
+                ring.add((cx, cz))
+    for key in list(lod_arena.regions):
+        if not in_lod_range(*key):
+            release_lod_mesh(*key)
+    for key in ring:
+        if key not in lod_arena.regions and key not in lod_requested:
+            task = ("lodgen", key[0], key[1])
+            tracer.enqueue(task)
+            generation_queue.put(task)
+            lod_requested.add(key)
+    lod_ring.clear()
+    lod_ring.update(ring)
+
+def use_full_detail(cx, cz, px, pz):
+    # Distance in chunks from the player to the chunk centre, with a hysteresis band so
+    # chunks on the boundary don't flip every frame
+    d = math.sqrt(((cx + 0.5) * CHUNK_SIZE - px)**2 + ((cz + 0.5) * CHUNK_SIZE - pz)**2) / CHUNK_SIZE
+    full = full_detail.get((cx, cz), True)
+    if full and d > LOD_DETAIL_RADIUS + LOD_HYSTERESIS:
+        full = False
+    elif not full and d < LOD_DETAIL_RADIUS - LOD_HYSTERESIS:
+        full = True
+    full_detail[(cx, cz)] = full
+    return full or (cx, cz) not in lod_arena.regions
@@ -1,5 +1,12 @@
 # main.py
-import sys, math, time, random
+import sys, os, math, time, random
+# --headless renders offscreen through EGL (Mesa's llvmpipe is enough), so benchmarks
+# run on machines without a display. It has to be set before pygame and PyOpenGL load.
+if "--headless" in sys.argv[1:]:
+    os.environ.setdefault("SDL_VIDEODRIVER", "offscreen")
+    os.environ.setdefault("PYOPENGL_PLATFORM", "egl")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+import numpy as np
 import pygame
 from pygame.locals import *
 from OpenGL.GL import *
@@ -7,14 +14,35 @@ from OpenGL.GLU import *
 
 from config import *
 from config import chunk_coords_from_world
-from render import set_display_mode, draw_text_2d_cached, render_chunk_vbo, text_cache, build_chunk_vertex_data, create_vbo_from_vertex_data, draw_box
+from render import set_display_mode, render_stats, build_chunk_vertex_data, draw_box
+from chunk_arena import chunk_arena, lod_arena
+import lod
+from occlusion import section_graph
 from world import (create_initial_world, process_chunk_updates, all_initial_chunks_loaded,
-                   update_loaded_chunks, chunk_update_queue, remove_block)
+                   update_loaded_chunks, chunk_update_queue, remove_block, chunk_bounds)
+from frustum import perspective_matrix, ortho_matrix, gl_matrix
+from camera import camera, look_direction
 from player import move_player, apply_gravity, player_pickup
-from entities import Bullet, Rocket, Explosion, robodrone_sound, enemy_pistol_sound, robodrone_explosion_sound
+from entities import Bullet, Rocket, Explosion, draw_explosion_particles, draw_entity_instances, robodrone_sound, enemy_pistol_sound, robodrone_explosion_sound
 from chunk_worker import generation_queue, generated_chunks_queue, start_chunk_worker
+import chunk_worker
 import bulletmarks
 import entities
+from visibility import los_cache
+from pathfinding import flow_field
+from director import director
+from uploads import upload_scheduler
+from clouds import cloud_layer
+from hud import hud_batch
+from assets import asset_manager
+from audio import audio_mixer
+from profiler import profiler
+from tracer import tracer
+from resources import resource_ledger
+from pathfinding import walk_grid
+from bench import BenchRun
+from replay import InputRecorder, InputReplay, state_hash
+from simclock import sim_clock
 
 player_health = 100
 PLAYER_MAX_HEALTH = 100
@@ -139,161 +167,51 @@ def draw_rocket_launcher():
     sight_cy = 0.07
     draw_box(0,sight_cy,sight_cz,sight_hw,sight_hh,sight_hl)
 
-def draw_pistol_2d(x, y, size):
-    glColor3f(0.8,0.8,0.8)
+def draw_pistol_2d(hud, x, y, size):
+    c = (0.8,0.8,0.8)
     # main body
-    glBegin(GL_QUADS)
-    glVertex2f(x, y)
-    glVertex2f(x+size*0.6, y)
-    glVertex2f(x+size*0.6, y+size*0.4)
-    glVertex2f(x, y+size*0.4)
-    glEnd()
+    hud.rect(x, y, x+size*0.6, y+size*0.4, c)
     # barrel
-    glBegin(GL_QUADS)
-    glVertex2f(x+size*0.6, y+size*0.15)
-    glVertex2f(x+size, y+size*0.15)
-    glVertex2f(x+size, y+size*0.25)
-    glVertex2f(x+size*0.6, y+size*0.25)
-    glEnd()
-
-def draw_shotgun_2d(x, y, size):
-    glColor3f(0.3,0.3,0.3)
+    hud.rect(x+size*0.6, y+size*0.15, x+size, y+size*0.25, c)
+
+def draw_shotgun_2d(hud, x, y, size):
+    c = (0.3,0.3,0.3)
     # Long body
-    glBegin(GL_QUADS)
-    glVertex2f(x, y+size*0.2)
-    glVertex2f(x+size, y+size*0.2)
-    glVertex2f(x+size, y+size*0.3)
-    glVertex2f(x, y+size*0.3)
-    glEnd()
+    hud.rect(x, y+size*0.2, x+size, y+size*0.3, c)
     # Handle
-    glBegin(GL_QUADS)
-    glVertex2f(x+size*0.2, y)
-    glVertex2f(x+size*0.3, y)
-    glVertex2f(x+size*0.3, y+size*0.2)
-    glVertex2f(x+size*0.2, y+size*0.2)
-    glEnd()
-
-def draw_rocket_launcher_2d(x, y, size):
-    glColor3f(0.8,0.4,0.0)
+    hud.rect(x+size*0.2, y, x+size*0.3, y+size*0.2, c)
+
+def draw_rocket_launcher_2d(hud, x, y, size):
+    c = (0.8,0.4,0.0)
     # Main tube
-    glBegin(GL_QUADS)
-    glVertex2f(x, y+size*0.4)
-    glVertex2f(x+size, y+size*0.4)
-    glVertex2f(x+size, y+size*0.5)
-    glVertex2f(x, y+size*0.5)
-    glEnd()
+    hud.rect(x, y+size*0.4, x+size, y+size*0.5, c)
     # Handle
-    glBegin(GL_QUADS)
-    glVertex2f(x+size*0.4, y)
-    glVertex2f(x+size*0.5, y)
-    glVertex2f(x+size*0.5, y+size*0.4)
-    glVertex2f(x+size*0.4, y+size*0.4)
-    glEnd()
-
-def draw_weapon_icon_2d(wid, x, y, size):
+    hud.rect(x+size*0.4, y, x+size*0.5, y+size*0.4, c)
+
+def draw_weapon_icon_2d(hud, wid, x, y, size):
     if wid == "pistol":
-        draw_pistol_2d(x, y, size)
+        draw_pistol_2d(hud, x, y, size)
     elif wid == "shotgun":
-        draw_shotgun_2d(x, y, size)
+        draw_shotgun_2d(hud, x, y, size)
     elif wid == "rocket":
-        draw_rocket_launcher_2d(x, y, size)
+        draw_rocket_launcher_2d(hud, x, y, size)
     else:
-        c = get_weapon_color(wid)
-        glColor3f(*c)
-        glBegin(GL_QUADS)
-        glVertex2f(x, y)
-        glVertex2f(x+size, y)
-        glVertex2f(x+size, y+size)
-        glVertex2f(x, y+size)
-        glEnd()
-
-def procedural_clouds(px, pz, radius=RENDER_DISTANCE):
-    from config import chunk_coords_from_world
-    pcx, pcz = chunk_coords_from_world(px, pz)
-    clouds = []
-    cloud_rand = random.Random() 
-    for cx in range(pcx - radius, pcx + radius + 1):
-        for cz in range(pcz - radius, pcz + radius + 1):
-            seed_val = (cx * 374761393 + cz * 668265263) ^ 0x12345678
-            cloud_rand.seed(seed_val)
-            cloud_x = cloud_rand.uniform(cx*CHUNK_SIZE, cx*CHUNK_SIZE+CHUNK_SIZE)
-            cloud_z = cloud_rand.uniform(cz*CHUNK_SIZE, cz*CHUNK_SIZE+CHUNK_SIZE)
-            cloud_y = cloud_rand.uniform(15,20)
-            size = cloud_rand.uniform(5,10)
-            clouds.append((cloud_x, cloud_y, cloud_z, size))
-    return clouds
-
-def draw_clouds(px, py, pz, rx, ry):
-    clouds = procedural_clouds(px, pz)
-    glEnable(GL_BLEND)
-    glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
-    glColor4f(1.0,1.0,1.0,0.8)
-    for (cx,cy,cz,size) in clouds:
-        dist = math.sqrt((cx - px)**2 + (cz - pz)**2)
-        if dist < CHUNK_SIZE*(RENDER_DISTANCE+1):
-            glBegin(GL_QUADS)
-            glVertex3f(cx - size, cy, cz - size)
-            glVertex3f(cx + size, cy, cz - size)
-            glVertex3f(cx + size, cy, cz + size)
-            glVertex3f(cx - size, cy, cz + size)
-            glEnd()
-    glDisable(GL_BLEND)
-
-def draw_bullet_marks():
-    from bulletmarks import get_all_bullet_marks
-    marks_dict = get_all_bullet_marks()
-    size = 0.02
-    glEnable(GL_POLYGON_OFFSET_FILL)
-    glPolygonOffset(-1.0,-1.0)
-    glColor3f(0,0,0)
-    glBegin(GL_QUADS)
-    for (bx,by,bz), marks in marks_dict.items():
-        for (hx, hy, hz, nx, ny, nz) in marks:
-            offset = 0.001
-            hx2 = hx + nx*offset
-            hy2 = hy + ny*offset
-            hz2 = hz + nz*offset
-            up = (0,1,0)
-            if abs(ny)>0.9:
-                up = (1,0,0)
-            ux,uy,uz = up
-            nxn, nyn, nzn = nx, ny, nz
-            t1x = uy*nzn - uz*nyn
-            t1y = uz*nxn - ux*nzn
-            t1z = ux*nyn - uy*nxn
-            t1len = math.sqrt(t1x*t1x + t1y*t1y + t1z*t1z)
-            if t1len > 1e-9:
-                t1x/=t1len; t1y/=t1len; t1z/=t1len
-
-            t2x = nyn*t1z - nzn*t1y
-            t2y = nzn*t1x - nxn*t1z
-            t2z = nxn*t1y - nyn*t1x
-            t2len = math.sqrt(t2x*t2x + t2y*t2y + t2z*t2z)
-            if t2len > 1e-9:
-                t2x/=t2len; t2y/=t2len; t2z/=t2len
-
-            ox1 = t1x*size + t2x*size
-            oy1 = t1y*size + t2y*size
-            oz1 = t1z*size + t2z*size
-
-            ox2 = t1x*size - t2x*size
-            oy2 = t1y*size - t2y*size
-            oz2 = t1z*size - t2z*size
-
-            ox3 = -t1x*size - t2x*size
-            oy3 = -t1y*size - t2y*size
-            oz3 = -t1z*size - t2z*size
-
-            ox4 = -t1x*size + t2x*size
-            oy4 = -t1y*size + t2y*size
-            oz4 = -t1z*size + t2z*size
-
-            glVertex3f(hx2+ox1, hy2+oy1, hz2+oz1)
-            glVertex3f(hx2+ox2, hy2+oy2, hz2+oz2)
-            glVertex3f(hx2+ox3, hy2+oy3, hz2+oz3)
-            glVertex3f(hx2+ox4, hy2+oy4, hz2+oz4)
-    glEnd()
-    glDisable(GL_POLYGON_OFFSET_FILL)
+        hud.rect(x, y, x+size, y+size, get_weapon_color(wid))
+
+INVENTORY_SLOTS = ["pistol","shotgun","rocket",None,None,None,None,None]
+SLOT_SIZE = 50
+SLOT_SPACING = 5
+SLOT_X_START = 10
+
+def build_inventory_frame(hud, h):
+    # Slot backgrounds, borders and weapon icons only move when the window does
+    slot_y = h - SLOT_SIZE - 10
+    for i, wid in enumerate(INVENTORY_SLOTS):
+        sx = SLOT_X_START + i*(SLOT_SIZE + SLOT_SPACING)
+        hud.rect(sx, slot_y, sx+SLOT_SIZE, slot_y+SLOT_SIZE, (0.2,0.2,0.2))
+        hud.rect_outline(sx, slot_y, sx+SLOT_SIZE, slot_y+SLOT_SIZE, (0,0,0))
+        if wid is not None:
+            draw_weapon_icon_2d(hud, wid, sx+5, slot_y+5, SLOT_SIZE-10)
 
 def line_block_intersect(x1,y1,z1,x2,y2,z2,bx,by,bz):
     tmin = 0.0
@@ -338,30 +256,64 @@ def line_block_intersect(x1,y1,z1,x2,y2,z2,bx,by,bz):
 
     return (ix,iy,iz, normal[0], normal[1], normal[2])
 
+def register_resource_probes(world, loaded_chunks, bullets, rockets, explosions):
+    # Python-side estimates for the resource ledger: counts plus rough byte sizes where cheap.
+    # main() updates the projectile lists in place, so the probes see the current contents
+    key_bytes = sys.getsizeof((0, 0, 0))
+    def arena(a):
+        stats = a.stats()
+        chunks = len(a.regions)
+        return {"chunks": chunks, "capacity_bytes": stats["capacity_bytes"], "used_bytes": stats["used_bytes"],
+                "bytes_per_chunk": stats["used_bytes"] // chunks if chunks else 0}
+    def sounds():
+        freq, size, channels = pygame.mixer.get_init() or (0, 0, 0)
+        loaded = list(asset_manager.sounds.values())
+        return {"count": len(loaded), "pcm_bytes": int(sum(s.get_length() for s in loaded) * freq * channels * abs(size) // 8)}
+    resource_ledger.probe("world", lambda: {"blocks": len(world), "est_bytes": sys.getsizeof(world) + len(world) * key_bytes,
+                                            "loaded_chunks": len(loaded_chunks), "chunk_bounds": len(chunk_bounds)})
+    resource_ledger.probe("mesh", lambda: arena(chunk_arena))
+    resource_ledger.probe("lod_mesh", lambda: dict(arena(lod_arena), ring=len(lod.lod_ring), bounds=len(lod.lod_bounds)))
+    resource_ledger.probe("entities", lambda: {"enemies": len(all_enemies), "pickups": len(all_pickups), "bullets": len(bullets),
+                                               "rockets": len(rockets), "explosions": len(explosions)})
+    decals = bulletmarks.decal_store
+    resource_ledger.probe("decals", lambda: {"marks": decals.live, "chunks": len(decals.chunks), "blocks": len(decals.by_block),
+                                             "order": len(decals.order), "vertex_bytes": sum(c.vertices.nbytes for c in decals.chunks.values())})
+    resource_ledger.probe("line_of_sight", los_cache.stats)
+    resource_ledger.probe("uploads", upload_scheduler.stats)
+    resource_ledger.probe("audio", audio_mixer.stats)
+    resource_ledger.probe("caches", lambda: {"flow_field": len(flow_field.directions),
+                                             "walk_grid": len(walk_grid.blocked_by_chunk), "sections": len(section_graph.chunks),
+                                             "chunk_updates": len(chunk_update_queue), "uploads": len(upload_scheduler.ready) + len(upload_scheduler.ready_lod),
+                                             "requested": len(upload_scheduler.requested_at), "generation": generation_queue.qsize()})
+    resource_ledger.probe("sounds", sounds)
+    resource_ledger.probe("diagnostics", lambda: {"profiler_rows": len(profiler.rows) if profiler.rows is not None else 0,
+                                                  "trace_enqueued": len(tracer.enqueued)})
+
 def main():
+    startup_start = time.perf_counter()
     pygame.init()
     pygame.font.init()
     pygame.mixer.init()
-    pygame.mixer.set_num_channels(64)
-
-    snd_explosion = pygame.mixer.Sound("assets/explosion.flac")
-    snd_hit = pygame.mixer.Sound("assets/hit.flac")
-    snd_pickup = pygame.mixer.Sound("assets/pickup.flac")
-    snd_pistol = pygame.mixer.Sound("assets/pistol.flac")
-    snd_rocketlauncher = pygame.mixer.Sound("assets/rocketlauncher.flac")
-    snd_shotgun = pygame.mixer.Sound("assets/shotgun.flac")
-    snd_ammo = pygame.mixer.Sound("assets/ammo.flac")
-    snd_robodrone = pygame.mixer.Sound("assets/robodrone.flac")
-
-    # Restore drone sound assignments
-    robodrone_sound = snd_robodrone
-    entities.robodrone_sound = snd_robodrone
-    entities.enemy_pistol_sound = snd_pistol
-    entities.robodrone_explosion_sound = snd_explosion
+    audio_mixer.init()
+
+    # Sounds decode in the background while the window opens and the first chunks stream in
+    asset_manager.load_sounds({
+        "explosion": "assets/explosion.flac",
+        "hit": "assets/hit.flac",
+        "pickup": "assets/pickup.flac",
+        "pistol": "assets/pistol.flac",
+        "rocketlauncher": "assets/rocketlauncher.flac",
+        "shotgun": "assets/shotgun.flac",
+        "ammo": "assets/ammo.flac",
+        "robodrone": "assets/robodrone.flac",
+    })
+    snd_explosion = snd_hit = snd_pistol = snd_rocketlauncher = snd_shotgun = snd_ammo = None
+    robodrone_sound = None
 
     font = pygame.font.SysFont("Arial", 18)
 
     fullscreen = False
+    block_outlines = BLOCK_OUTLINES
     screen = set_display_mode(fullscreen)
 
     pygame.mouse.set_visible(False)
@@ -374,6 +326,8 @@ def main():
     sphere_quad = gluNewQuadric()
     cylinder_quad = gluNewQuadric()
     disk_quad = gluNewQuadric()
+    for quad in (sphere_quad, cylinder_quad, disk_quad):
+        resource_ledger.gl_created("quadric", quad)
 
     worker_thread = start_chunk_worker()
 
@@ -387,11 +341,21 @@ def main():
 
     world = create_initial_world()
     loaded_chunks = set()
-    chunk_vbos = {}
+    chunk_vbos = chunk_arena.regions
 
     clock = pygame.time.Clock()
 
+    def dispatch_generation():
+        # Newly scheduled chunks go to the generation worker; everything else stays queued
+        generation_tasks = [(a,cx,cz) for (a,cx,cz) in chunk_update_queue if a == "loadgen"]
+        chunk_update_queue[:] = [(a,cx,cz) for (a,cx,cz) in chunk_update_queue if a != "loadgen"]
+        for t in generation_tasks:
+            upload_scheduler.request((t[1], t[2]))
+            tracer.enqueue(t)
+            generation_queue.put(t)
+
     update_loaded_chunks(start_px, start_pz, world, loaded_chunks, chunk_vbos)
+    dispatch_generation()
 
     global player_health
     global current_weapon_index
@@ -404,45 +368,114 @@ def main():
 
     running = True
     random.seed()
+    if "--profile" in sys.argv[1:]:
+        i = sys.argv.index("--profile")
+        profiler.record_to(sys.argv[i+1] if i+1 < len(sys.argv) else "profile")
+    if "--trace" in sys.argv[1:]:
+        i = sys.argv.index("--trace")
+        tracer.start(sys.argv[i+1] if i+1 < len(sys.argv) else "trace.json")
+    if "--resources" in sys.argv[1:]:
+        i = sys.argv.index("--resources")
+        resource_ledger.dump_to(sys.argv[i+1] if i+1 < len(sys.argv) else "resources.json")
+    profiler.watch("los", lambda: "los     hit %3.0f%%  %5.0f rays/s  %d entries" % (
+        los_cache.stats()["hit_rate"] * 100.0, los_cache.rays_per_second, len(los_cache.entries)))
+    profiler.watch("director", lambda: "enemies %d live  %d queued  sim %.2f ms  throttled %d" % (
+        len(all_enemies), len(director.queue), director.sim_cost_ms, director.throttled_frames))
+    profiler.watch("uploads", lambda: "uploads %d ready  %d lod  %.2f/%.1f ms  %d ops" % (
+        len(upload_scheduler.ready), len(upload_scheduler.ready_lod), upload_scheduler.last_frame_ms,
+        upload_scheduler.budget_ms(), upload_scheduler.last_frame_ops))
+    profiler.watch("audio", lambda: "audio   %d voices  %d loops  %d stolen  %d dropped" % tuple(
+        audio_mixer.stats()[k] for k in ("voices", "loops", "stolen", "dropped")))
+    register_resource_probes(world, loaded_chunks, bullets, rockets, explosions)
+    bench = None
+    if "--bench" in sys.argv[1:]:
+        i = sys.argv.index("--bench")
+        out_path = None
+        if "--bench-out" in sys.argv[1:]:
+            j = sys.argv.index("--bench-out")
+            out_path = sys.argv[j+1] if j+1 < len(sys.argv) else "bench.json"
+        bench = BenchRun(sys.argv[i+1] if i+1 < len(sys.argv) else "sprint", out_path)
+        bench.prepare(inventory)
+
+    # Recorded and replayed sessions run a fixed-timestep, seeded simulation
+    recorder = None
+    replay = None
+    if "--record" in sys.argv[1:]:
+        recorder = InputRecorder(sys.argv[sys.argv.index("--record") + 1], chunk_worker.world_seed)
+    elif "--replay" in sys.argv[1:]:
+        replay = InputReplay(sys.argv[sys.argv.index("--replay") + 1])
+        chunk_worker.world_seed = replay.world_seed
+    session = recorder or replay
+    if session is not None:
+        random.seed(session.sim_seed)
+        sim_clock.start_fixed(1.0 / session.tick_rate)
 
     from config import all_enemies
 
-    robodrone_channel = None
-
-    def play_sound_with_distance(sound, sx, sy, sz):
-        if px is None:
-            sound.set_volume(1.0)
-            sound.play()
-            return
-        dist = math.sqrt((sx - px)**2 + (sy - py)**2 + (sz - pz)**2)
-        if dist > 32.0:
-            vol = 0.0
-        else:
-            vol = 1.0 - (dist/32.0)
-        sound.set_volume(vol)
-        if vol > 0.0:
-            sound.play()
+    def sim_state():
+        player = (px, py, pz, vy, rx, ry, on_ground, player_health, current_weapon_index)
+        return state_hash(world, player, inventory, bullets, rockets, explosions, all_enemies, all_pickups, director)
 
     while running:
-        dt = clock.tick()
-        dt_s = dt/1000.0
-
-        fps = 1000.0/dt if dt>0 else 0.0
-
-        generation_tasks = [(a,cx,cz) for (a,cx,cz) in chunk_update_queue if a == "loadgen"]
-        chunk_update_queue[:] = [(a,cx,cz) for (a,cx,cz) in chunk_update_queue if a != "loadgen"]
-        for t in generation_tasks:
-            generation_queue.put(t)
-
+        dt = clock.tick(recorder.tick_rate if recorder is not None else 0)
+        # A long frame (the one that finishes loading, a window drag) would otherwise
+        # step gravity far enough to carry the player through the one-block ground
+        dt_s = min(dt/1000.0, MAX_FRAME_STEP)
+        if session is not None:
+            dt_s = 1.0 / session.tick_rate
+        profiler.begin_frame(counted=px is not None)
+
+        if tracer.enabled:
+            tracer.counter("generation_queue", generation_queue.qsize())
+            tracer.counter("generated_chunks_queue", generated_chunks_queue.qsize())
+            tracer.counter("chunk_update_queue", len(chunk_update_queue))
+            tracer.counter("pending_uploads", len(upload_scheduler.ready))
+
+        in_combat = bool(rockets or explosions) or any(not e.is_idle() for e in all_enemies)
+        upload_scheduler.set_mode(loading=px is None, combat=in_combat)
+        if replay is not None:
+            tick = replay.next_tick() if px is not None else None
+            upload_scheduler.forced = tick[3:5] if tick is not None else None
         process_chunk_updates(world, chunk_vbos, generated_chunks_queue)
+        chunk_ops = (upload_scheduler.uploads_this_frame, upload_scheduler.queue_ops_this_frame) if px is not None else (0, 0)
+        chunk_arena.defragment_step()
+        profiler.mark("chunk_updates")
 
-        if px is None and all_initial_chunks_loaded(loaded_chunks, chunk_vbos):
+        if px is None and all_initial_chunks_loaded(loaded_chunks, chunk_vbos) and asset_manager.done():
             px, py, pz = start_px, start_py, start_pz
+            snd_explosion = asset_manager.get("explosion")
+            snd_hit = asset_manager.get("hit")
+            snd_pistol = asset_manager.get("pistol")
+            snd_rocketlauncher = asset_manager.get("rocketlauncher")
+            snd_shotgun = asset_manager.get("shotgun")
+            snd_ammo = asset_manager.get("ammo")
+            robodrone_sound = asset_manager.get("robodrone")
+            entities.robodrone_sound = robodrone_sound
+            entities.enemy_pistol_sound = snd_pistol
+            entities.robodrone_explosion_sound = snd_explosion
+            print("Startup: first playable frame after %.3fs; %s" % (time.perf_counter() - startup_start, asset_manager.report()))
+            resource_ledger.mark_playable()
+            if bench is not None:
+                bench.begin(time.perf_counter() - startup_start)
 
         keys = pygame.key.get_pressed()
-        current_time = time.time()
+        events = pygame.event.get()
+        if bench is not None:
+            keys, events = bench.inputs(events, px, py, pz, rx, ry, all_enemies)
+            if bench.finished:
+                running = False
+        if recorder is not None:
+            keys, events = recorder.inputs(keys, events, px is not None)
+        elif replay is not None:
+            keys, events = replay.inputs(events, px is not None)
+            director.forced_throttle = replay.current[5] if replay.current is not None else None
+            if replay.finished:
+                running = False
+        current_time = sim_clock.now()
+        if px is not None:
+            audio_mixer.begin_frame(px, py + PLAYER_EYE_HEIGHT, pz, ry)
 
-        for event in pygame.event.get():
+        for event in events:
             if event.type == QUIT:
                 running=False
             elif event.type == KEYDOWN:
@@ -464,12 +497,17 @@ def main():
                         screen = pygame.display.set_mode((width, height), DOUBLEBUF|OPENGL)
                     glViewport(0, 0, width, height)
                     glMatrixMode(GL_PROJECTION)
-                    glLoadIdentity()
-                    gluPerspective(FOV, width/float(height), 0.1, 1000.0)
+                    glLoadMatrixf(gl_matrix(perspective_matrix(FOV, width/float(height), 0.1, 1000.0)))
                     glMatrixMode(GL_MODELVIEW)
                     glLoadIdentity()
                     pygame.mouse.set_visible(False)
                     pygame.mouse.set_relative_mode(True)
+                elif event.key == K_b:
+                    block_outlines = not block_outlines
+                elif event.key == K_F3:
+                    profiler.overlay = not profiler.overlay
+                elif event.key == K_F4:
+                    resource_ledger.overlay = not resource_ledger.overlay
                 elif event.key == K_1:
                     current_weapon_index = 0
                 elif event.key == K_2:
@@ -494,32 +532,24 @@ def main():
                             start_x = px
                             start_y = py + PLAYER_EYE_HEIGHT
                             start_z = pz
-                            rad_x = math.radians(rx)
-                            rad_y = math.radians(ry)
-                            dx = math.sin(rad_y)*math.cos(rad_x)
-                            dy = math.sin(rad_x)
-                            dz = -math.cos(rad_y)*math.cos(rad_x)
+                            dx, dy, dz = look_direction(rx, ry)
 
                             if wid=="pistol":
-                                play_sound_with_distance(snd_pistol, px, py, pz)
+                                audio_mixer.play(snd_pistol, priority=2.0)
                                 b = Bullet(start_x, start_y, start_z, dx,dy,dz, radius=0.05)
                                 bullets.append(b)
                                 bullet_last_positions.append((id(b),start_x,start_y,start_z))
                             elif wid=="shotgun":
-                                play_sound_with_distance(snd_shotgun, px, py, pz)
+                                audio_mixer.play(snd_shotgun, priority=2.0)
                                 for i in range(8):
                                     angle_h = random.uniform(-10,10)
                                     angle_v = random.uniform(-2,2)
-                                    rad_y_off = math.radians(ry+angle_h)
-                                    rad_x_off = math.radians(rx+angle_v)
-                                    dx2 = math.sin(rad_y_off)*math.cos(rad_x_off)
-                                    dy2 = math.sin(rad_x_off)
-                                    dz2 = -math.cos(rad_y_off)*math.cos(rad_x_off)
+                                    dx2, dy2, dz2 = look_direction(rx+angle_v, ry+angle_h)
                                     b = Bullet(start_x, start_y, start_z, dx2,dy2,dz2, radius=0.05)
                                     bullets.append(b)
                                     bullet_last_positions.append((id(b),start_x,start_y,start_z))
                             elif wid=="rocket":
-                                play_sound_with_distance(snd_rocketlauncher, px, py, pz)
+                                audio_mixer.play(snd_rocketlauncher, priority=2.0)
                                 r = Rocket(start_x,start_y,start_z, dx,dy,dz)
                                 rockets.append(r)
 
@@ -537,15 +567,24 @@ def main():
                         if inventory[wid]["owned"]:
                             break
 
+        profiler.mark("events")
+
         if px is not None:
             forward = (keys[K_w] - keys[K_s])
             strafe = (keys[K_d] - keys[K_a])
             jump = keys[K_SPACE]
-            px, py, pz, vy, on_ground = move_player(forward, strafe, jump, px, py, pz, vy, on_ground, rx, ry, world, dt_s)
+            sprint = keys[K_LSHIFT] or keys[K_RSHIFT]
+            px, py, pz, vy, on_ground = move_player(forward, strafe, jump, sprint, px, py, pz, vy, on_ground, rx, ry, world, dt_s)
             px, py, pz, vy, on_ground = apply_gravity(px, py, pz, vy, on_ground, world, dt_s)
             player_pickup(px, py, pz, inventory, snd_ammo)
+            profiler.mark("physics")
             update_loaded_chunks(px, pz, world, loaded_chunks, chunk_vbos)
+            lod.update_lod_ring(px, pz)
+            director.update(px, pz, loaded_chunks)
+            dispatch_generation()
+            profiler.mark("chunk_schedule")
 
+            sim_start = time.perf_counter()
             new_bullets = []
             bullet_last_positions_new = []
             for b in bullets:
@@ -560,7 +599,7 @@ def main():
                     by = int(math.floor(b.y))
                     bz = int(math.floor(b.z))
                     if (bx,by,bz) in world:
-                        snd_hit.play()
+                        audio_mixer.play(snd_hit, (b.x, b.y, b.z))
                         if prev_pos is not None:
                             res = line_block_intersect(prev_pos[0],prev_pos[1],prev_pos[2],b.x,b.y,b.z,bx,by,bz)
                             if res:
@@ -570,7 +609,7 @@ def main():
                 new_bullets.append(b)
                 bullet_last_positions_new.append((id(b),b.x,b.y,b.z))
 
-            bullets = new_bullets
+            bullets[:] = new_bullets
             bullet_last_positions = bullet_last_positions_new
 
             new_rockets = []
@@ -578,22 +617,46 @@ def main():
                 was_alive = r.alive
                 still_alive = r.update(world, all_enemies, explosions, dt_s)
                 if was_alive and not r.alive:
-                    snd_explosion.play()
+                    audio_mixer.play(snd_explosion, (r.x, r.y, r.z), priority=3.0, max_distance=64.0)
                 if still_alive:
                     new_rockets.append(r)
-            rockets = new_rockets
+            rockets[:] = new_rockets
+            profiler.mark("projectiles")
 
-            explosions = [e for e in explosions if e.update(dt_s)]
+            explosions[:] = [e for e in explosions if e.update(dt_s)]
+            profiler.mark("explosions")
 
-            new_enemies = []
+            flow_field.update(px, pz)
             player_pos = (px, py, pz)
-            for e in all_enemies:
+            for e in list(all_enemies):
+                old_x, old_z = e.x, e.z
                 alive = e.update(dt_s, player_pos, world, bullets, explosions)
-                if e.health > 0 and alive:
-                    new_enemies.append(e)
-            all_enemies[:] = new_enemies
-
-            # Drone sound logic back as it was
+                if e.health <= 0 or not alive:
+                    all_enemies.remove(e)
+                    los_cache.forget(e)
+                elif all_enemies.relocate(e) not in loaded_chunks:
+                    # Clamp the step to the loaded area per axis, so an enemy heading out
+                    # slides along the edge instead of stopping dead on it
+                    if all_enemies.chunk_of(e.x, old_z) in loaded_chunks:
+                        e.z = old_z
+                    elif all_enemies.chunk_of(old_x, e.z) in loaded_chunks:
+                        e.x = old_x
+                    else:
+                        e.x, e.z = old_x, old_z
+                    all_enemies.relocate(e)
+            director.record_sim_cost((time.perf_counter() - sim_start) * 1000.0)
+            tracer.complete("sim_tick", sim_start)
+            if recorder is not None:
+                recorder.end_tick(chunk_ops[0], chunk_ops[1], director.throttled, sim_state)
+            elif replay is not None and replay.current is not None:
+                replay.end_tick(sim_state)
+                if replay.finished:
+                    running = False
+            if session is not None:
+                sim_clock.advance()
+            profiler.mark("enemy_ai")
+
+            # Nearest live drone drives the hum emitter
             closest_dist = 9999999
             closest_drone = None
             for e in all_enemies:
@@ -607,79 +670,82 @@ def main():
                         closest_drone = e
 
             if closest_drone is not None and closest_dist <= 24.0:
-                volume = max(0.0, 1.0 - (closest_dist / 24.0))
-                if robodrone_sound is not None:
-                    if robodrone_channel is None or not robodrone_channel.get_busy():
-                        robodrone_channel = robodrone_sound.play(-1)
-                    robodrone_channel.set_volume(volume)
+                audio_mixer.set_loop("robodrone", robodrone_sound, (closest_drone.x, closest_drone.y, closest_drone.z), 24.0)
             else:
-                if robodrone_channel is not None and robodrone_channel.get_busy():
-                    robodrone_channel.stop()
-                    robodrone_channel = None
+                audio_mixer.stop_loop("robodrone")
+            audio_mixer.update()
+            profiler.mark("audio")
 
+        draw_start = tracer.now()
         glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
 
         if px is not None:
-            rad_x = math.radians(rx)
-            rad_y = math.radians(ry)
-            dx = math.sin(rad_y)*math.cos(rad_x)
-            dy = math.sin(rad_x)
-            dz = -math.cos(rad_y)*math.cos(rad_x)
-            eye_y = py + PLAYER_EYE_HEIGHT
-
+            w, h = screen.get_size()
+            camera.update(px, py, pz, rx, ry, w, h)
+            eye_y = camera.eye[1]
+            view_proj = camera.view_proj
+            # Immediate-mode draws below still read the fixed-function stacks
+            glMatrixMode(GL_PROJECTION)
+            glLoadMatrixf(gl_matrix(camera.projection))
             glMatrixMode(GL_MODELVIEW)
-            glLoadIdentity()
-            gluLookAt(px, eye_y, pz, px+dx, eye_y+dy, pz+dz, 0,1,0)
+            glLoadMatrixf(gl_matrix(camera.view))
 
-            draw_clouds(px, py, pz, rx, ry)
+            cloud_layer.update(px, pz)
+            cloud_layer.draw(view_proj, px, py, pz, time.time())
 
+            frustum = camera.frustum
+            visible_sections = section_graph.visible_sections(px, eye_y, pz, frustum)
+            full_chunks = []
+            lod_chunks = []
+            chunks_culled = 0
+            chunks_occluded = 0
             for (cx,cz) in loaded_chunks:
                 if (cx,cz) in chunk_vbos:
-                    vbo_id, face_count, edge_count = chunk_vbos[(cx, cz)]
-                    render_chunk_vbo(vbo_id, face_count, edge_count)
-
-            for b in bullets:
-                b.draw(sphere_quad)
+                    bounds = chunk_bounds.get((cx, cz))
+                    if bounds is not None and not frustum.aabb_visible(*bounds):
+                        chunks_culled += 1
+                        continue
+                    if visible_sections is not None and (cx, cz) in chunk_arena.sections:
+                        if not any((cx, r[0], cz) in visible_sections for r in chunk_arena.sections[(cx, cz)]):
+                            chunks_occluded += 1
+                            continue
+                    if lod.use_full_detail(cx, cz, px, pz):
+                        full_chunks.append((cx, cz))
+                    else:
+                        lod_chunks.append((cx, cz))
+            for key in lod.lod_ring:
+                if key in lod_arena.regions:
+                    if not frustum.aabb_visible(*lod.lod_bounds[key]):
+                        chunks_culled += 1
+                        continue
+                    lod_chunks.append(key)
+            chunk_arena.draw(full_chunks, view_proj, visible_sections, block_outlines)
+            lod_arena.draw(lod_chunks, view_proj)
+            render_stats["chunks_drawn"] = len(full_chunks) + len(lod_chunks)
+            render_stats["chunks_culled"] = chunks_culled
+            render_stats["chunks_lod"] = len(lod_chunks)
+            render_stats["chunks_occluded"] = chunks_occluded
+            render_stats["sections_visible"] = section_graph.last_visited if visible_sections is not None else 0
+            render_stats["vertices_full"] = sum(chunk_vbos[k][1] for k in full_chunks)
+            render_stats["vertices_lod"] = sum(lod_arena.regions[k][1] for k in lod_chunks)
+            profiler.mark("chunk_draw")
+
+            draw_entity_instances(view_proj, bullets, all_pickups, all_enemies)
             for r in rockets:
                 r.draw(cylinder_quad)
             for e in explosions:
-                e.draw(px, py, pz, sphere_quad)
+                e.draw(sphere_quad)
+            draw_explosion_particles(explosions, view_proj, px, py, pz)
+            profiler.mark("entity_draw")
 
-            draw_bullet_marks()
-
-            for p in all_pickups:
-                p.draw()
-
-            for en in all_enemies:
-                en.draw()
-
-            enemy_positions_2d = []
-            w, h = screen.get_size()
-            projection = glGetDoublev(GL_PROJECTION_MATRIX)
-            modelview = glGetDoublev(GL_MODELVIEW_MATRIX)
-            viewport = glGetIntegerv(GL_VIEWPORT)
-            for en in all_enemies:
-                dist = math.sqrt((en.x - px)**2 + (en.y - py)**2 + (en.z - pz)**2)
-                if dist <= 20.0 and en.health > 0:
-                    exv = en.x - px
-                    eyv = (en.y+1.2) - eye_y
-                    ezv = en.z - pz
-                    dot = exv*dx + eyv*dy + ezv*dz
-                    if dot < 0:
-                        continue
-                    wx, wy, wz = gluProject(en.x, en.y+1.2, en.z, modelview, projection, viewport)
-                    if wz < 0.0 or wz > 1.0:
-                        continue
-                    if wx < 0 or wx > w or wy < 0 or wy > h:
-                        continue
-                    hp_ratio = en.health / float(en.max_health)
-                    enemy_positions_2d.append((wx, h - wy, hp_ratio, dist))
+            bulletmarks.draw_bullet_marks(view_proj)
+            profiler.mark("decals")
 
         glMatrixMode(GL_PROJECTION)
         glPushMatrix()
-        glLoadIdentity()
         w, h = screen.get_size()
-        gluPerspective(FOV, w/float(h), 0.1, 1000.0)
+        camera.set_viewport(w, h)
+        glLoadMatrixf(gl_matrix(camera.projection))
         glMatrixMode(GL_MODELVIEW)
         glPushMatrix()
         glLoadIdentity()
@@ -704,148 +770,82 @@ def main():
         glMatrixMode(GL_PROJECTION)
         glPopMatrix()
         glMatrixMode(GL_MODELVIEW)
+        profiler.mark("viewmodel")
 
         glDisable(GL_DEPTH_TEST)
-        glMatrixMode(GL_PROJECTION)
-        glPushMatrix()
-        glLoadIdentity()
-        glOrtho(0, w, h, 0, -1, 1)
-        glMatrixMode(GL_MODELVIEW)
-        glPushMatrix()
-        glLoadIdentity()
+        hud_projection = ortho_matrix(0, w, h, 0, -1, 1)
+        hud_batch.begin(font)
 
         # Crosshair
         cx = w//2
         cy = h//2
-        glColor3f(1,1,1)
-        glBegin(GL_LINES)
-        glVertex2f(cx - 10, cy)
-        glVertex2f(cx + 10, cy)
-        glVertex2f(cx, cy - 10)
-        glVertex2f(cx, cy + 10)
-        glEnd()
+        hud_batch.line(cx - 10, cy, cx + 10, cy, (1,1,1))
+        hud_batch.line(cx, cy - 10, cx, cy + 10, (1,1,1))
 
         if px is not None:
-            slot_size = 50
-            slot_x_start = 10
-            slot_y = h - slot_size - 10
-            slot_spacing = 5
-            inventory_width = 8*slot_size + 7*slot_spacing
-
-            weapon_slots = ["pistol","shotgun","rocket"]
-            inventory_slots = []
-            inventory_slots.extend(weapon_slots)
-            while len(inventory_slots) < 8:
-                inventory_slots.append(None)
-
-            for i, wid in enumerate(inventory_slots):
-                sx = slot_x_start + i*(slot_size + slot_spacing)
-                glColor3f(0.2,0.2,0.2)
-                glBegin(GL_QUADS)
-                glVertex2f(sx, slot_y)
-                glVertex2f(sx+slot_size, slot_y)
-                glVertex2f(sx+slot_size, slot_y+slot_size)
-                glVertex2f(sx, slot_y+slot_size)
-                glEnd()
-
-                glColor3f(0,0,0)
-                glBegin(GL_LINE_LOOP)
-                glVertex2f(sx, slot_y)
-                glVertex2f(sx+slot_size, slot_y)
-                glVertex2f(sx+slot_size, slot_y+slot_size)
-                glVertex2f(sx, slot_y+slot_size)
-                glEnd()
-
-                if wid and wid == current_weapon_id():
-                    glColor3f(1,1,1)
-                    glBegin(GL_LINE_LOOP)
-                    glVertex2f(sx, slot_y)
-                    glVertex2f(sx+slot_size, slot_y)
-                    glVertex2f(sx+slot_size, slot_y+slot_size)
-                    glVertex2f(sx, slot_y+slot_size)
-                    glEnd()
-
-                if wid is not None:
-                    # Draw 2D weapon icon
-                    draw_weapon_icon_2d(wid, sx+5, slot_y+5, slot_size-10)
-                    # Ensure ammo counts are white
-                    glColor3f(1,1,1)
-                    ammo_count = inventory[wid]["ammo"] if wid in inventory else 0
-                    draw_text_2d_cached(font, f"{ammo_count}", sx+5, slot_y+slot_size-20)
+            slot_y = h - SLOT_SIZE - 10
+            inventory_width = 8*SLOT_SIZE + 7*SLOT_SPACING
+            hud_batch.cached((w, h), lambda hud: build_inventory_frame(hud, h))
+
+            for i, wid in enumerate(INVENTORY_SLOTS):
+                if wid is None:
+                    continue
+                sx = SLOT_X_START + i*(SLOT_SIZE + SLOT_SPACING)
+                if wid == current_weapon_id():
+                    hud_batch.rect_outline(sx, slot_y, sx+SLOT_SIZE, slot_y+SLOT_SIZE, (1,1,1))
+                ammo_count = inventory[wid]["ammo"] if wid in inventory else 0
+                hud_batch.text(f"{ammo_count}", sx+5, slot_y+SLOT_SIZE-20)
 
             # Life bar extended full width of inventory
-            lb_y = slot_y - 30
             bar_width = inventory_width
             bar_height = 20
-            x = slot_x_start
-            y = lb_y
+            x = SLOT_X_START
+            y = slot_y - 30
             health_ratio = player_health / float(PLAYER_MAX_HEALTH)
-
-            glColor3f(0,0,0)
-            glBegin(GL_QUADS)
-            glVertex2f(x-1, y-1)
-            glVertex2f(x+bar_width+1, y-1)
-            glVertex2f(x+bar_width+1, y+bar_height+1)
-            glVertex2f(x-1, y+bar_height+1)
-            glEnd()
-
-            glColor3f(0.2,0.2,0.2)
-            glBegin(GL_QUADS)
-            glVertex2f(x, y)
-            glVertex2f(x+bar_width, y)
-            glVertex2f(x+bar_width, y+bar_height)
-            glVertex2f(x, y+bar_height)
-            glEnd()
-
-            glColor3f(1.0 - health_ratio,health_ratio,0.0)
-            glBegin(GL_QUADS)
-            glVertex2f(x, y)
-            glVertex2f(x+bar_width*health_ratio, y)
-            glVertex2f(x+bar_width*health_ratio, y+bar_height)
-            glVertex2f(x, y+bar_height)
-            glEnd()
+            hud_batch.rect(x-1, y-1, x+bar_width+1, y+bar_height+1, (0,0,0))
+            hud_batch.rect(x, y, x+bar_width, y+bar_height, (0.2,0.2,0.2))
+            hud_batch.rect(x, y, x+bar_width*health_ratio, y+bar_height, (1.0 - health_ratio,health_ratio,0.0))
 
             # Enemy HP bars
-            for (ex, ey, hp_ratio, dist) in enemy_positions_2d:
-                bar_width_e = 30
-                bar_height_e = 4
+            enemy_positions_2d = []
+            bar_candidates = [en for en in all_enemies
+                              if en.health > 0 and (en.x - px)**2 + (en.y - py)**2 + (en.z - pz)**2 <= 400.0]
+            if bar_candidates:
+                heads = [(en.x, en.y+1.2, en.z) for en in bar_candidates]
+                screen_pos, on_screen = camera.project(heads)
+                for i in np.flatnonzero(on_screen):
+                    en = bar_candidates[i]
+                    enemy_positions_2d.append((screen_pos[i, 0], screen_pos[i, 1], en.health / float(en.max_health)))
+            bar_width_e = 30
+            bar_height_e = 4
+            for (ex, ey, hp_ratio) in enemy_positions_2d:
                 bx = ex - bar_width_e/2
                 by = ey - 2
-
-                glColor3f(0,0,0)
-                glBegin(GL_LINE_LOOP)
-                glVertex2f(bx, by)
-                glVertex2f(bx+bar_width_e, by)
-                glVertex2f(bx+bar_width_e, by+bar_height_e)
-                glVertex2f(bx, by+bar_height_e)
-                glEnd()
-
-                glColor3f(0.2,0.2,0.2)
-                glBegin(GL_QUADS)
-                glVertex2f(bx, by)
-                glVertex2f(bx+bar_width_e, by)
-                glVertex2f(bx+bar_width_e, by+bar_height_e)
-                glVertex2f(bx, by+bar_height_e)
-                glEnd()
-
-                glColor3f(1.0 - hp_ratio, hp_ratio, 0.0)
-                glBegin(GL_QUADS)
-                glVertex2f(bx, by)
-                glVertex2f(bx+bar_width_e*hp_ratio, by)
-                glVertex2f(bx+bar_width_e*hp_ratio, by+bar_height_e)
-                glVertex2f(bx, by+bar_height_e)
-                glEnd()
+                hud_batch.rect(bx, by, bx+bar_width_e, by+bar_height_e, (0.2,0.2,0.2))
+                hud_batch.rect(bx, by, bx+bar_width_e*hp_ratio, by+bar_height_e, (1.0 - hp_ratio, hp_ratio, 0.0))
+                hud_batch.rect_outline(bx, by, bx+bar_width_e, by+bar_height_e, (0,0,0))
         else:
-            draw_text_2d_cached(font, "Loading chunks...", w//2 - 50, h//2)
-
-        glMatrixMode(GL_PROJECTION)
-        glPopMatrix()
-        glMatrixMode(GL_MODELVIEW)
-        glPopMatrix()
+            hud_batch.text("Loading chunks... sounds %d%%" % int(asset_manager.progress() * 100), w//2 - 50, h//2)
+        profiler.draw_overlay(hud_batch)
+        resource_ledger.draw_overlay(hud_batch)
+        hud_batch.flush(hud_projection)
         glEnable(GL_DEPTH_TEST)
+        profiler.mark("hud")
 
         pygame.display.flip()
-
+        profiler.mark("flip")
+        tracer.complete("draw", draw_start)
+        resource_ledger.update()
+
+    if bench is not None:
+        bench.report(glGetString(GL_RENDERER).decode())
+    if recorder is not None:
+        recorder.close()
+    if replay is not None:
+        replay.report()
+    profiler.export()
+    tracer.export()
+    resource_ledger.export()
     pygame.quit()
 
 if __name__ == "__main__":
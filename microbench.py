@@ -0,0 +1,277 @@
+# microbench.py
+import argparse, json, platform, random, statistics, sys, time, tracemalloc
+from config import CHUNK_SIZE, GROUND_LEVEL, BENCH_SEED, chunk_update_queue
+from chunk_worker import generate_chunk_data
+from render import build_chunk_vertex_data, pack_vertex_data
+from visibility import line_block_intersect_3d
+from player import check_collision, slide_movement
+from entities import Rocket, Explosion, bullet_or_rocket_hits_dog
+from world import unload_chunk_now
+
+# Micro-benchmarks for the hot paths on synthetic, seeded worlds. Nothing here needs
+# a GL context. Each benchmark's setup returns (op, reset): op is timed, reset (may be
+# None) runs untimed before every op for benchmarks that consume their input.
+
+BENCHMARKS = {}
+WORLD_SIZES = (1, 2, 4)  # world radius in chunks: 3x3, 5x5 and 9x9 loaded chunks
+
+def benchmark(name, sizes=(None,)):
+    def register(setup):
+        for size in sizes:
+            label = name if size is None else "%s[%d]" % (name, size)
+            BENCHMARKS[label] = (setup, size)
+        return setup
+    return register
+
+def build_world(radius):
+    # Generated chunks in a (2*radius+1)^2 square around the origin chunk
+    world = {}
+    for cx in range(-radius, radius + 1):
+        for cz in range(-radius, radius + 1):
+            chunk_data, _, _ = generate_chunk_data(cx, cz)
+            world.update(chunk_data)
+    return world
+
+def random_points(rng, count, extent, y0, y1):
+    return [(rng.uniform(-extent, extent), rng.uniform(y0, y1), rng.uniform(-extent, extent)) for _ in range(count)]
+
+@benchmark("generate_chunk_data")
+def bench_generate(size):
+    coords = [(cx, cz) for cx in range(-4, 4) for cz in range(-4, 4)]
+    state = {"i": 0}
+    def op():
+        cx, cz = coords[state["i"] % len(coords)]
+        state["i"] += 1
+        generate_chunk_data(cx, cz)
+    return op, None
+
+@benchmark("build_chunk_vertex_data")
+def bench_mesh(size):
+    chunks = [((cx, cz), generate_chunk_data(cx, cz)[0]) for cx in range(-2, 2) for cz in range(-2, 2)]
+    state = {"i": 0}
+    def op():
+        (cx, cz), chunk_data = chunks[state["i"] % len(chunks)]
+        state["i"] += 1
+        build_chunk_vertex_data(chunk_data, cx, cz)
+    return op, None
+
+@benchmark("pack_vertex_data")
+def bench_pack(size):
+    # The list-to-GLfloat copy create_vbo_from_vertex_data used to do before upload
+    face_data = list(build_chunk_vertex_data(generate_chunk_data(0, 0)[0], 0, 0)[0])
+    def op():
+        pack_vertex_data(face_data)
+    return op, None
+
+@benchmark("line_block_intersect_3d", sizes=WORLD_SIZES)
+def bench_line_of_sight(size):
+    world = build_world(size)
+    rng = random.Random(BENCH_SEED)
+    starts = random_points(rng, 256, CHUNK_SIZE, GROUND_LEVEL + 1.5, GROUND_LEVEL + 8.0)
+    ends = random_points(rng, 256, CHUNK_SIZE, GROUND_LEVEL + 1.5, GROUND_LEVEL + 8.0)
+    rays = list(zip(starts, ends))
+    state = {"i": 0}
+    def op():
+        (x1, y1, z1), (x2, y2, z2) = rays[state["i"] % len(rays)]
+        state["i"] += 1
+        line_block_intersect_3d(x1, y1, z1, x2, y2, z2, world)
+    return op, None
+
+@benchmark("check_collision", sizes=WORLD_SIZES)
+def bench_collision(size):
+    world = build_world(size)
+    points = random_points(random.Random(BENCH_SEED), 256, CHUNK_SIZE, GROUND_LEVEL + 0.5, GROUND_LEVEL + 4.0)
+    state = {"i": 0}
+    def op():
+        x, y, z = points[state["i"] % len(points)]
+        state["i"] += 1
+        check_collision(x, y, z, world)
+    return op, None
+
+@benchmark("slide_movement", sizes=WORLD_SIZES)
+def bench_slide(size):
+    world = build_world(size)
+    rng = random.Random(BENCH_SEED)
+    moves = [(p, (rng.uniform(-0.2, 0.2), rng.uniform(-0.2, 0.2)))
+             for p in random_points(rng, 256, CHUNK_SIZE, GROUND_LEVEL + 1.0, GROUND_LEVEL + 3.0)]
+    state = {"i": 0}
+    def op():
+        (x, y, z), (vx, vz) = moves[state["i"] % len(moves)]
+        state["i"] += 1
+        slide_movement(x, y, z, vx, vz, world)
+    return op, None
+
+@benchmark("bullet_or_rocket_hits_dog")
+def bench_hits_dog(size):
+    rng = random.Random(BENCH_SEED)
+    shots = []
+    for _ in range(256):
+        old = (rng.uniform(-3, 3), rng.uniform(0, 2), rng.uniform(-3, 3))
+        new = (old[0] + rng.uniform(-1, 1), old[1] + rng.uniform(-0.5, 0.5), old[2] + rng.uniform(-1, 1))
+        shots.append((old, new, rng.uniform(0, 360)))
+    state = {"i": 0}
+    def op():
+        old, new, yaw = shots[state["i"] % len(shots)]
+        state["i"] += 1
+        bullet_or_rocket_hits_dog(old, new, 0.0, 0.0, 0.0, yaw)
+    return op, None
+
+@benchmark("rocket_explode", sizes=WORLD_SIZES)
+def bench_explode(size):
+    # Block carving on a fresh copy of the world each time
+    base = build_world(size)
+    state = {}
+    def reset():
+        state["world"] = dict(base)
+        state["explosions"] = []
+        del chunk_update_queue[:]
+    def op():
+        rocket = Rocket(5.5, GROUND_LEVEL + 0.5, 5.5, 0.0, -1.0, 0.0)
+        rocket.explode(state["world"], state["explosions"])
+    return op, reset
+
+@benchmark("explosion_update")
+def bench_explosion_update(size):
+    random.seed(BENCH_SEED)
+    state = {}
+    def reset():
+        state["explosion"] = Explosion(0.0, GROUND_LEVEL + 1.0, 0.0)
+    def op():
+        state["explosion"].update(1.0 / 60.0)
+    return op, reset
+
+@benchmark("unload_chunk_now", sizes=WORLD_SIZES)
+def bench_unload(size):
+    base = build_world(size)
+    arena_regions = {}
+    state = {}
+    def reset():
+        state["world"] = dict(base)
+    def op():
+        unload_chunk_now(0, 0, state["world"], arena_regions)
+    return op, reset
+
+def measure(op, reset, min_time, repeats):
+    # Calibrate a batch size once, then keep the median rate of several batches
+    count = 1
+    while True:
+        elapsed = time_batch(op, reset, count)
+        if elapsed >= min_time / repeats or count >= 1 << 20:
+            break
+        count *= 2
+    rates = [count / max(time_batch(op, reset, count), 1e-9) for _ in range(repeats)]
+    return statistics.median(rates), count
+
+def time_batch(op, reset, count):
+    if reset is None:
+        start = time.perf_counter()
+        for _ in range(count):
+            op()
+        return time.perf_counter() - start
+    total = 0.0
+    for _ in range(count):
+        reset()
+        start = time.perf_counter()
+        op()
+        total += time.perf_counter() - start
+    return total
+
+def measure_allocations(op, reset, samples=20):
+    # Peak traced bytes during one op and bytes still held after it, averaged
+    peaks = []
+    retained = []
+    tracemalloc.start()
+    try:
+        for _ in range(samples):
+            if reset is not None:
+                reset()
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            op()
+            after, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+            retained.append(after - before)
+    finally:
+        tracemalloc.stop()
+    return statistics.mean(peaks), statistics.mean(retained)
+
+def run(names, min_time, repeats):
+    results = {}
+    for name in names:
+        setup, size = BENCHMARKS[name]
+        op, reset = setup(size)
+        if reset is not None:
+            reset()
+        op()   # warm caches and lazy imports
+        ops_per_sec, batch = measure(op, reset, min_time, repeats)
+        peak, retained = measure_allocations(op, reset)
+        results[name] = {"ops_per_sec": ops_per_sec, "us_per_op": 1e6 / ops_per_sec, "batch": batch,
+                         "alloc_peak_bytes": peak, "alloc_retained_bytes": retained}
+        print("%-28s %12.1f ops/s %10.2f us/op  peak %9.0f B  retained %8.0f B" % (
+            name, ops_per_sec, 1e6 / ops_per_sec, peak, retained))
+        sys.stdout.flush()
+    return {"seed": BENCH_SEED, "python": platform.python_version(), "machine": platform.machine(),
+            "results": results}
+
+def compare(baseline, current, threshold):
+    # A benchmark regresses when its rate drops by more than threshold (0.1 = 10%)
+    regressions = []
+    for name, base in sorted(baseline["results"].items()):
+        cur = current["results"].get(name)
+        if cur is None:
+            print("%-28s missing from current run" % name)
+            continue
+        change = cur["ops_per_sec"] / base["ops_per_sec"] - 1.0
+        flag = ""
+        if change < -threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        elif change > threshold:
+            flag = "  faster"
+        print("%-28s %12.1f -> %12.1f ops/s %+7.1f%%%s" % (name, base["ops_per_sec"], cur["ops_per_sec"], change * 100.0, flag))
+    return regressions
+
+def select(patterns):
+    if not patterns:
+        return list(BENCHMARKS)
+    return [name for name in BENCHMARKS if any(p in name for p in patterns)]
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for MineFPS hot paths")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run_parser = sub.add_parser("run", help="run benchmarks and optionally save the results")
+    run_parser.add_argument("-k", dest="patterns", action="append", help="only benchmarks whose name contains this")
+    run_parser.add_argument("--out", help="write results as JSON, e.g. a new baseline")
+    run_parser.add_argument("--min-time", type=float, default=1.0, help="seconds of timing per benchmark")
+    run_parser.add_argument("--repeats", type=int, default=5)
+    cmp_parser = sub.add_parser("compare", help="compare against a baseline; exits 1 on regressions")
+    cmp_parser.add_argument("baseline")
+    cmp_parser.add_argument("current", nargs="?", help="saved results; runs the suite when omitted")
+    cmp_parser.add_argument("--threshold", type=float, default=0.10)
+    cmp_parser.add_argument("--min-time", type=float, default=1.0)
+    cmp_parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.command == "run":
+        results = run(select(args.patterns), args.min_time, args.repeats)
+        if args.out:
+            with open(args.out, "w") as f:
+                json.dump(results, f, indent=2)
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if args.current:
+        with open(args.current) as f:
+            current = json.load(f)
+    else:
+        names = [name for name in select(None) if name in baseline["results"]]
+        current = run(names, args.min_time, args.repeats)
+    regressions = compare(baseline, current, args.threshold)
+    if regressions:
+        print("%d regression(s) past %.0f%%: %s" % (len(regressions), args.threshold * 100.0, ", ".join(regressions)))
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
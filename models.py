@@ -0,0 +1,151 @@
+# models.py
+import math
+import numpy as np
+from OpenGL.GL import *
+from shaders import get_program, create_vao, POSITION_COLOR_PART, INSTANCE_TRANSFORM
+from resources import resource_ledger
+
+class MeshBuilder:
+    # Collects triangles and black outline segments; vertices are (x, y, z, r, g, b, part)
+    def __init__(self):
+        self.faces = []
+        self.lines = []
+
+    def box(self, cx, cy, cz, hw, hh, hl, color, part=0, outline=True):
+        v = [
+            (cx - hw, cy - hh, cz - hl),
+            (cx + hw, cy - hh, cz - hl),
+            (cx + hw, cy + hh, cz - hl),
+            (cx - hw, cy + hh, cz - hl),
+            (cx - hw, cy - hh, cz + hl),
+            (cx - hw, cy + hh, cz + hl),
+            (cx + hw, cy + hh, cz + hl),
+            (cx + hw, cy - hh, cz + hl),
+        ]
+        quads = [(0,1,2,3),(4,5,6,7),(0,3,5,4),(1,7,6,2),(3,2,6,5),(0,4,7,1)]
+        for (a,b,c,d) in quads:
+            for idx in (a,b,c,a,c,d):
+                self.faces.append(v[idx] + tuple(color) + (part,))
+        if outline:
+            edges = [(0,1),(1,2),(2,3),(3,0),(4,5),(5,6),(6,7),(7,4),(0,4),(1,7),(2,6),(3,5)]
+            for (a,b) in edges:
+                self.lines.append(v[a] + (0.0,0.0,0.0,part))
+                self.lines.append(v[b] + (0.0,0.0,0.0,part))
+
+    def disk(self, cx, cy, cz, radius, slices, color, part=0):
+        # Horizontal disk facing +y
+        for i in range(slices):
+            a0 = 2.0*math.pi*i/slices
+            a1 = 2.0*math.pi*(i+1)/slices
+            self.faces.append((cx, cy, cz) + tuple(color) + (part,))
+            self.faces.append((cx + radius*math.sin(a0), cy, cz + radius*math.cos(a0)) + tuple(color) + (part,))
+            self.faces.append((cx + radius*math.sin(a1), cy, cz + radius*math.cos(a1)) + tuple(color) + (part,))
+
+    def cylinder(self, cx, cy, cz, radius, height, slices, color, part=0):
+        # Vertical open tube from cy to cy+height
+        for i in range(slices):
+            a0 = 2.0*math.pi*i/slices
+            a1 = 2.0*math.pi*(i+1)/slices
+            x0, z0 = cx + radius*math.sin(a0), cz + radius*math.cos(a0)
+            x1, z1 = cx + radius*math.sin(a1), cz + radius*math.cos(a1)
+            for (x, y, z) in ((x0,cy,z0),(x1,cy,z1),(x1,cy+height,z1),(x0,cy,z0),(x1,cy+height,z1),(x0,cy+height,z0)):
+                self.faces.append((x, y, z) + tuple(color) + (part,))
+
+    def sphere(self, radius, slices, stacks, color, part=0):
+        def point(i, j):
+            theta = math.pi*i/stacks
+            phi = 2.0*math.pi*j/slices
+            return (radius*math.sin(theta)*math.sin(phi), radius*math.cos(theta), radius*math.sin(theta)*math.cos(phi))
+        for i in range(stacks):
+            for j in range(slices):
+                p00, p10 = point(i, j), point(i+1, j)
+                p11, p01 = point(i+1, j+1), point(i, j+1)
+                for p in (p00, p10, p11, p00, p11, p01):
+                    self.faces.append(p + tuple(color) + (part,))
+
+class InstancedMesh:
+    # A model built once into a VBO and drawn for every instance with one call per primitive type
+    def __init__(self, builder):
+        self.face_count = len(builder.faces)
+        self.line_count = len(builder.lines)
+        self.data = np.array(builder.faces + builder.lines, dtype=np.float32).reshape(-1)
+        self.buffer = None
+        self.instance_buffer = None
+        self.vao = None
+
+    def _ensure_buffers(self):
+        if self.vao is not None:
+            return
+        self.buffer = glGenBuffers(1)
+        glBindBuffer(GL_ARRAY_BUFFER, self.buffer)
+        glBufferData(GL_ARRAY_BUFFER, self.data.nbytes, self.data, GL_STATIC_DRAW)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        resource_ledger.gl_created("buffer", self.buffer, self.data.nbytes)
+        self.instance_buffer = glGenBuffers(1)
+        resource_ledger.gl_created("buffer", self.instance_buffer)
+        self.vao = create_vao(self.buffer, POSITION_COLOR_PART, self.instance_buffer, INSTANCE_TRANSFORM)
+
+    def draw(self, view_proj, instances):
+        count = len(instances)
+        if count == 0:
+            return
+        self._ensure_buffers()
+        instances = np.ascontiguousarray(instances, dtype=np.float32)
+        glBindBuffer(GL_ARRAY_BUFFER, self.instance_buffer)
+        glBufferData(GL_ARRAY_BUFFER, instances.nbytes, instances, GL_STREAM_DRAW)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        resource_ledger.gl_resized("buffer", self.instance_buffer, instances.nbytes)
+        prog = get_program("instanced")
+        prog.use()
+        prog.set_matrix("u_view_proj", view_proj)
+        glBindVertexArray(self.vao)
+        glDrawArraysInstanced(GL_TRIANGLES, 0, self.face_count, count)
+        if self.line_count:
+            glDrawArraysInstanced(GL_LINES, self.face_count, self.line_count, count)
+        glBindVertexArray(0)
+        glUseProgram(0)
+
+# Batched transforms: (N,4,4) row-major matrices matching glTranslatef/glRotatef/glScalef
+
+def model_matrices(x, y, z, yaw_deg=None, scale=None):
+    n = len(x)
+    m = np.zeros((n, 4, 4))
+    if yaw_deg is None:
+        m[:, 0, 0] = m[:, 1, 1] = m[:, 2, 2] = 1.0
+    else:
+        a = np.radians(yaw_deg)
+        c, s = np.cos(a), np.sin(a)
+        m[:, 0, 0] = c
+        m[:, 0, 2] = s
+        m[:, 1, 1] = 1.0
+        m[:, 2, 0] = -s
+        m[:, 2, 2] = c
+    if scale is not None:
+        m[:, :3, :3] *= np.asarray(scale, dtype=float).reshape(-1, 1, 1)
+    m[:, 0, 3] = x
+    m[:, 1, 3] = y
+    m[:, 2, 3] = z
+    m[:, 3, 3] = 1.0
+    return m
+
+def rotation_x_matrices(angle_deg):
+    a = np.radians(angle_deg)
+    c, s = np.cos(a), np.sin(a)
+    m = np.zeros((len(a), 4, 4))
+    m[:, 0, 0] = 1.0
+    m[:, 1, 1] = c
+    m[:, 1, 2] = -s
+    m[:, 2, 1] = s
+    m[:, 2, 2] = c
+    m[:, 3, 3] = 1.0
+    return m
+
+def pack_instances(models, part_models=None, tints=None):
+    # GL reads each mat4 attribute as four column vec4s, hence the transposes
+    n = len(models)
+    out = np.empty((n, 36), dtype=np.float32)
+    out[:, 0:16] = models.transpose(0, 2, 1).reshape(n, 16)
+    parts = models if part_models is None else part_models
+    out[:, 16:32] = parts.transpose(0, 2, 1).reshape(n, 16)
+    out[:, 32:36] = 1.0 if tints is None else tints
+    return out
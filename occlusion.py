@@ -0,0 +1,141 @@
+# occlusion.py
+from collections import deque
+from config import CHUNK_SIZE, SECTION_HEIGHT, WORLD_MIN_SECTION, WORLD_MAX_SECTION
+
+# Section faces: -x, +x, -y, +y, -z, +z
+FACE_DIRS = [(-1,0,0), (1,0,0), (0,-1,0), (0,1,0), (0,0,-1), (0,0,1)]
+OPPOSITE = [1, 0, 3, 2, 5, 4]
+ALL_CONNECTED = (1 << 36) - 1
+
+def connected(mask, a, b):
+    return (mask >> (a*6 + b)) & 1
+
+def section_connectivity(chunk_data, cx, sy, cz):
+    # Flood-fill the section's air cells; every pair of faces touched by one air
+    # component can see through each other.
+    base_x = cx * CHUNK_SIZE
+    base_y = sy * SECTION_HEIGHT
+    base_z = cz * CHUNK_SIZE
+    sx, sh, sz = CHUNK_SIZE, SECTION_HEIGHT, CHUNK_SIZE
+    solid = bytearray(sx * sh * sz)
+    solid_count = 0
+    for (bx, by, bz) in chunk_data:
+        # Worker chunk data carries tree leaves that spill over into neighbouring chunks
+        lx = bx - base_x
+        ly = by - base_y
+        lz = bz - base_z
+        if 0 <= lx < sx and 0 <= ly < sh and 0 <= lz < sz:
+            solid[lx + lz*sx + ly*sx*sz] = 1
+            solid_count += 1
+    # Fewer blocks than one full layer can never seal one face off from another
+    if solid_count < min(sx*sz, sx*sh, sz*sh):
+        return ALL_CONNECTED
+
+    mask = 0
+    seen = solid
+    layer = sx * sz
+    for start in range(len(seen)):
+        if seen[start]:
+            continue
+        seen[start] = 1
+        touched = 0
+        stack = [start]
+        while stack:
+            i = stack.pop()
+            x = i % sx
+            z = (i // sx) % sz
+            y = i // layer
+            if x == 0: touched |= 1
+            if x == sx-1: touched |= 2
+            if y == 0: touched |= 4
+            if y == sh-1: touched |= 8
+            if z == 0: touched |= 16
+            if z == sz-1: touched |= 32
+            if x > 0 and not seen[i-1]:
+                seen[i-1] = 1; stack.append(i-1)
+            if x < sx-1 and not seen[i+1]:
+                seen[i+1] = 1; stack.append(i+1)
+            if z > 0 and not seen[i-sx]:
+                seen[i-sx] = 1; stack.append(i-sx)
+            if z < sz-1 and not seen[i+sx]:
+                seen[i+sx] = 1; stack.append(i+sx)
+            if y > 0 and not seen[i-layer]:
+                seen[i-layer] = 1; stack.append(i-layer)
+            if y < sh-1 and not seen[i+layer]:
+                seen[i+layer] = 1; stack.append(i+layer)
+        for a in range(6):
+            if touched & (1 << a):
+                for b in range(6):
+                    if touched & (1 << b):
+                        mask |= 1 << (a*6 + b)
+    return mask
+
+def chunk_connectivity(chunk_data, cx, cz, only_sections=None):
+    section_ys = set(by // SECTION_HEIGHT for (_, by, _) in chunk_data)
+    if only_sections is not None:
+        section_ys &= set(only_sections)
+    return {sy: section_connectivity(chunk_data, cx, sy, cz) for sy in section_ys}
+
+class SectionGraph:
+    def __init__(self):
+        self.chunks = {}   # (cx,cz): {sy: face connectivity mask}; sections not listed are open air
+        self.dirty = {}    # (cx,cz): set of sy whose blocks changed since their mask was computed
+        self.last_visited = 0
+
+    def set_chunk(self, cx, cz, masks):
+        self.chunks[(cx, cz)] = dict(masks)
+        self.dirty.pop((cx, cz), None)
+
+    def remove_chunk(self, cx, cz):
+        self.chunks.pop((cx, cz), None)
+        self.dirty.pop((cx, cz), None)
+
+    def mark_dirty(self, cx, cz, sy):
+        self.dirty.setdefault((cx, cz), set()).add(sy)
+
+    def refresh_chunk(self, cx, cz, chunk_data):
+        # Recompute only the sections that had blocks removed
+        dirty = self.dirty.pop((cx, cz), None)
+        masks = self.chunks.setdefault((cx, cz), {})
+        if dirty is None:
+            masks.clear()
+            masks.update(chunk_connectivity(chunk_data, cx, cz))
+            return
+        for sy in dirty:
+            masks.pop(sy, None)
+        masks.update(chunk_connectivity(chunk_data, cx, cz, only_sections=dirty))
+
+    def visible_sections(self, ex, ey, ez, frustum=None):
+        start = (int(ex // CHUNK_SIZE), int(ey // SECTION_HEIGHT), int(ez // CHUNK_SIZE))
+        start = (start[0], min(max(start[1], WORLD_MIN_SECTION), WORLD_MAX_SECTION), start[2])
+        if (start[0], start[2]) not in self.chunks:
+            return None
+        visible = {start}
+        queue = deque([(start, -1)])
+        while queue:
+            (cx, sy, cz), entry = queue.popleft()
+            mask = self.chunks[(cx, cz)].get(sy, ALL_CONNECTED)
+            offset = (cx - start[0], sy - start[1], cz - start[2])
+            for d, (dx, dy, dz) in enumerate(FACE_DIRS):
+                # Never step back towards the camera
+                if offset[0]*dx < 0 or offset[1]*dy < 0 or offset[2]*dz < 0:
+                    continue
+                if entry != -1 and not connected(mask, entry, d):
+                    continue
+                n = (cx + dx, sy + dy, cz + dz)
+                if n in visible or (n[0], n[2]) not in self.chunks:
+                    continue
+                if not WORLD_MIN_SECTION <= n[1] <= WORLD_MAX_SECTION:
+                    continue
+                if frustum is not None:
+                    x0 = n[0] * CHUNK_SIZE
+                    y0 = n[1] * SECTION_HEIGHT
+                    z0 = n[2] * CHUNK_SIZE
+                    if not frustum.aabb_visible(x0, y0, z0, x0 + CHUNK_SIZE, y0 + SECTION_HEIGHT, z0 + CHUNK_SIZE):
+                        continue
+                visible.add(n)
+                queue.append((n, OPPOSITE[d]))
+        self.last_visited = len(visible)
+        return visible
+
+section_graph = SectionGraph()
@@ -0,0 +1,119 @@
+# pathfinding.py
+import math
+from collections import deque
+from config import CHUNK_SIZE, GROUND_LEVEL, FLOW_FIELD_RADIUS, FLOW_FIELD_NODES_PER_FRAME, FLOW_FIELD_RETARGET
+
+# (dx, dz, diagonal)
+NEIGHBOURS = [(1,0,False),(-1,0,False),(0,1,False),(0,-1,False),
+              (1,1,True),(1,-1,True),(-1,1,True),(-1,-1,True)]
+
+def yaw_towards(dx, dz):
+    # Same convention as the enemies: forward = (-sin(yaw), cos(yaw))
+    return math.degrees(math.atan2(-dx, dz)) % 360
+
+class WalkabilityGrid:
+    def __init__(self):
+        # (cx,cz): set of (x,z) columns a dog can't stand in (obstacle at body height or no ground)
+        self.blocked_by_chunk = {}
+
+    def update_chunk(self, cx, cz, chunk_data):
+        # Returns whether any column's walkability changed
+        base_x = cx * CHUNK_SIZE
+        base_z = cz * CHUNK_SIZE
+        blocked = set()
+        ground = set()
+        for (bx, by, bz) in chunk_data:
+            if by == GROUND_LEVEL:
+                ground.add((bx, bz))
+            elif GROUND_LEVEL < by <= GROUND_LEVEL + 2:
+                blocked.add((bx, bz))
+        for x in range(base_x, base_x + CHUNK_SIZE):
+            for z in range(base_z, base_z + CHUNK_SIZE):
+                if (x, z) not in ground:
+                    blocked.add((x, z))
+        changed = self.blocked_by_chunk.get((cx, cz)) != blocked
+        self.blocked_by_chunk[(cx, cz)] = blocked
+        return changed
+
+    def remove_chunk(self, cx, cz):
+        return self.blocked_by_chunk.pop((cx, cz), None) is not None
+
+    def walkable(self, x, z):
+        blocked = self.blocked_by_chunk.get((x // CHUNK_SIZE, z // CHUNK_SIZE))
+        if blocked is None:
+            return False
+        return (x, z) not in blocked
+
+class FlowField:
+    def __init__(self, grid, radius=FLOW_FIELD_RADIUS, nodes_per_frame=FLOW_FIELD_NODES_PER_FRAME):
+        self.grid = grid
+        self.radius = radius
+        self.nodes_per_frame = nodes_per_frame
+        self.target = None
+        self.directions = {}   # (x,z): yaw towards the target, absent for the target cell itself
+        self.dirty = False
+        self._pending = None   # (target, frontier, visited, directions) of a build in progress
+        self.builds_completed = 0
+
+    def _covers(self, target, cx, cz):
+        if target is None:
+            return False
+        tx, tz = target
+        base_x = cx * CHUNK_SIZE
+        base_z = cz * CHUNK_SIZE
+        return (base_x - self.radius <= tx < base_x + CHUNK_SIZE + self.radius and
+                base_z - self.radius <= tz < base_z + CHUNK_SIZE + self.radius)
+
+    def mark_dirty(self, cx, cz):
+        # Walkability changed in chunk (cx,cz); only a field (or build) reaching into it is stale
+        pending = self._pending[0] if self._pending is not None else None
+        if self._covers(self.target, cx, cz) or self._covers(pending, cx, cz):
+            self.dirty = True
+
+    def update(self, px, pz):
+        # The field is kept while the player stays within FLOW_FIELD_RETARGET cells of its
+        # target; pursuers stop well short of the player, so the old target still leads them
+        cell = (int(math.floor(px)), int(math.floor(pz)))
+        moved = (self.target is None or abs(cell[0] - self.target[0]) > FLOW_FIELD_RETARGET
+                 or abs(cell[1] - self.target[1]) > FLOW_FIELD_RETARGET)
+        if self._pending is None and (moved or self.dirty):
+            self.dirty = False
+            self._pending = (cell, deque([cell]), {cell}, {})
+        if self._pending is not None:
+            self._advance()
+
+    def _advance(self):
+        target, frontier, visited, directions = self._pending
+        tx, tz = target
+        grid = self.grid
+        radius = self.radius
+        budget = self.nodes_per_frame
+        while frontier and budget > 0:
+            x, z = frontier.popleft()
+            budget -= 1
+            for dx, dz, diagonal in NEIGHBOURS:
+                nx = x + dx
+                nz = z + dz
+                if (nx, nz) in visited:
+                    continue
+                if abs(nx - tx) > radius or abs(nz - tz) > radius:
+                    continue
+                if not grid.walkable(nx, nz):
+                    continue
+                # No corner cutting past obstacles
+                if diagonal and not (grid.walkable(x, nz) and grid.walkable(nx, z)):
+                    continue
+                visited.add((nx, nz))
+                directions[(nx, nz)] = yaw_towards(-dx, -dz)
+                frontier.append((nx, nz))
+        if not frontier:
+            self.target = target
+            self.directions = directions
+            self._pending = None
+            self.builds_completed += 1
+
+    def direction_at(self, x, z):
+        return self.directions.get((int(math.floor(x)), int(math.floor(z))))
+
+walk_grid = WalkabilityGrid()
+flow_field = FlowField(walk_grid)
@@ -3,6 +3,7 @@ import math
 import pygame
 from config import PLAYER_COLLISION_RADIUS, PLAYER_HEIGHT, MOVE_SPEED, JUMP_SPEED, GRAVITY, PLAYER_EYE_HEIGHT, MOUSE_SENSITIVITY, all_pickups
 from pygame.locals import *
+from audio import audio_mixer
 
 def check_collision(px, py, pz, world):
     min_x = int(math.floor(px - PLAYER_COLLISION_RADIUS))
@@ -32,15 +33,14 @@ def slide_movement(px, py, pz, vx, vz, world):
         px, pz = new_px, new_pz
     return px, pz
 
-def move_player(forward, strafe, jump, px, py, pz, vy, on_ground, rx, ry, world, dt_s):
+def move_player(forward, strafe, jump, sprint, px, py, pz, vy, on_ground, rx, ry, world, dt_s):
     rad_y = math.radians(ry)
     fdx = math.sin(rad_y)
     fdz = -math.cos(rad_y)
     rdx = math.cos(rad_y)
     rdz = math.sin(rad_y)
 
-    keys = pygame.key.get_pressed()
-    speed_mult = 2.0 if (keys[pygame.K_LSHIFT] or keys[pygame.K_RSHIFT]) else 1.0
+    speed_mult = 2.0 if sprint else 1.0
     speed = MOVE_SPEED * speed_mult * dt_s
 
     vx = (forward * fdx + strafe * rdx)*speed
@@ -67,17 +67,9 @@ def apply_gravity(px, py, pz, vy, on_ground, world, dt_s):
     return px, py, pz, vy, on_ground
 
 def player_pickup(px, py, pz, inventory, snd_ammo):
-    new_list = []
-    picked_any = False
-    for p in all_pickups:
-        dist = p.distance_to(px, py, pz)
-        if dist < 1.0:
-            amt = p.get_amount()
-            wid = p.ammo_type
-            inventory[wid]["ammo"] += amt
-            picked_any = True
-        else:
-            new_list.append(p)
-    all_pickups[:] = new_list
-    if picked_any:
-        snd_ammo.play()
+    picked = [p for p in all_pickups.near(px, pz, 1.0) if p.distance_to(px, py, pz) < 1.0]
+    for p in picked:
+        inventory[p.ammo_type]["ammo"] += p.get_amount()
+        all_pickups.remove(p)
+    if picked:
+        audio_mixer.play(snd_ammo)
@@ -0,0 +1,116 @@
+# profiler.py
+import csv, json, time
+from collections import deque
+import numpy as np
+from config import PROFILER_HISTORY, PROFILER_OVERLAY_INTERVAL
+
+# Loop phases in the order main() runs them. "upload" and "remesh" are the two halves
+# of process_chunk_updates and are reported inside "chunk_updates", not on top of it.
+PHASES = ("chunk_updates", "upload", "remesh", "events", "physics", "chunk_schedule",
+          "projectiles", "explosions", "enemy_ai", "audio", "chunk_draw", "entity_draw",
+          "decals", "viewmodel", "hud", "flip")
+SUB_PHASES = ("upload", "remesh")
+
+class FrameProfiler:
+    # Lap timer: mark(name) charges the time since the previous mark to name, so a
+    # frame costs one perf_counter call per phase. GL calls are asynchronous, so draw
+    # phases measure submission and GPU time shows up under "flip".
+    def __init__(self, history=PROFILER_HISTORY):
+        self.history = {name: deque(maxlen=history) for name in PHASES + ("frame",)}
+        self.current = dict.fromkeys(PHASES, 0.0)
+        self.frame_start = None
+        self.last = None
+        self.counted = False  # loading frames stay out of the rolling stats
+        self.overlay = False
+        self.overlay_lines = []
+        self.overlay_time = 0.0
+        self.rows = None    # every frame, kept only when an export was requested
+        self.watches = {}   # name: callable returning one overlay line of subsystem stats
+        self.export_path = None
+
+    def record_to(self, path):
+        # path without extension; writes path.csv and path.json in export()
+        self.export_path = path
+        self.rows = []
+
+    def watch(self, name, line):
+        self.watches[name] = line
+
+    def begin_frame(self, counted=True):
+        now = time.perf_counter()
+        if self.frame_start is not None:
+            frame_ms = (now - self.frame_start) * 1000.0
+            current = self.current
+            if self.counted:
+                for name in PHASES:
+                    self.history[name].append(current[name])
+                self.history["frame"].append(frame_ms)
+            if self.rows is not None:
+                self.rows.append([frame_ms] + [current[name] for name in PHASES])
+            self.current = dict.fromkeys(PHASES, 0.0)
+        self.frame_start = now
+        self.last = now
+        self.counted = counted
+
+    def mark(self, name):
+        now = time.perf_counter()
+        self.current[name] += (now - self.last) * 1000.0
+        self.last = now
+
+    def add(self, name, ms):
+        # Time measured elsewhere, e.g. inside process_chunk_updates
+        self.current[name] += ms
+
+    def summary(self):
+        result = {}
+        for name, values in self.history.items():
+            if not values:
+                continue
+            a = np.fromiter(values, dtype=np.float64, count=len(values))
+            p50, p95, p99 = np.percentile(a, (50, 95, 99))
+            result[name] = {"mean": float(a.mean()), "p50": float(p50), "p95": float(p95),
+                            "p99": float(p99), "max": float(a.max())}
+        return result
+
+    def draw_overlay(self, hud, x=10, y=10):
+        # Percentiles are recomputed a few times a second; nothing runs while hidden
+        if not self.overlay:
+            return
+        now = time.perf_counter()
+        if now - self.overlay_time >= PROFILER_OVERLAY_INTERVAL:
+            self.overlay_time = now
+            self.overlay_lines = self._overlay_text()
+        hud.rect(x - 4, y - 4, x + 420, y + 20*len(self.overlay_lines) + 4, (0.0, 0.0, 0.0, 0.6))
+        for i, line in enumerate(self.overlay_lines):
+            hud.text(line, x, y + 20*i)
+
+    def _overlay_text(self):
+        stats = self.summary()
+        frame = stats.get("frame")
+        if frame is None:
+            return ["profiler: waiting for frames"]
+        fps = 1000.0 / frame["p50"] if frame["p50"] > 0 else 0.0
+        lines = ["%.0f fps  frame p50 %.1f  p95 %.1f  p99 %.1f ms" % (fps, frame["p50"], frame["p95"], frame["p99"])]
+        for name in PHASES:
+            s = stats.get(name)
+            if s is None:
+                continue
+            label = "  " + name if name in SUB_PHASES else name
+            lines.append("%-15s %5.2f %5.2f %5.2f" % (label, s["p50"], s["p95"], s["p99"]))
+        for line in self.watches.values():
+            lines.append(line())
+        return lines
+
+    def export(self):
+        if self.export_path is None:
+            return
+        with open(self.export_path + ".csv", "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(("frame_ms",) + PHASES)
+            for row in self.rows:
+                writer.writerow(["%.4f" % v for v in row])
+        with open(self.export_path + ".json", "w") as f:
+            json.dump({"frames": len(self.rows), "window": len(self.history["frame"]),
+                       "phases": self.summary()}, f, indent=2)
+
+profiler = FrameProfiler()
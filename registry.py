@@ -0,0 +1,70 @@
+# registry.py
+
+class EntityRegistry:
+    def __init__(self, chunk_of):
+        self.chunk_of = chunk_of
+        self.by_chunk = {}   # (cx,cz): {entity: None}, a dict keeps insertion order
+        self.count = 0
+
+    def add(self, e):
+        key = self.chunk_of(e.x, e.z)
+        e.chunk_coords = key
+        bucket = self.by_chunk.setdefault(key, {})
+        if e not in bucket:
+            bucket[e] = None
+            self.count += 1
+
+    def remove(self, e):
+        bucket = self.by_chunk.get(e.chunk_coords)
+        if bucket is None or e not in bucket:
+            return False
+        del bucket[e]
+        self.count -= 1
+        if not bucket:
+            del self.by_chunk[e.chunk_coords]
+        return True
+
+    def relocate(self, e):
+        key = self.chunk_of(e.x, e.z)
+        if key != e.chunk_coords and self.remove(e):
+            e.chunk_coords = key
+            self.by_chunk.setdefault(key, {})[e] = None
+            self.count += 1
+        return key
+
+    def unload_chunk(self, cx, cz):
+        bucket = self.by_chunk.pop((cx, cz), None)
+        if bucket is None:
+            return []
+        self.count -= len(bucket)
+        return list(bucket)
+
+    def in_chunks(self, chunks):
+        for key in chunks:
+            bucket = self.by_chunk.get(key)
+            if bucket:
+                yield from bucket
+
+    def near(self, x, z, radius):
+        cx1, cz1 = self.chunk_of(x - radius, z - radius)
+        cx2, cz2 = self.chunk_of(x + radius, z + radius)
+        for cx in range(cx1, cx2 + 1):
+            for cz in range(cz1, cz2 + 1):
+                bucket = self.by_chunk.get((cx, cz))
+                if bucket:
+                    yield from bucket
+
+    def clear(self):
+        self.by_chunk.clear()
+        self.count = 0
+
+    def __contains__(self, e):
+        bucket = self.by_chunk.get(getattr(e, "chunk_coords", None))
+        return bucket is not None and e in bucket
+
+    def __iter__(self):
+        for bucket in self.by_chunk.values():
+            yield from bucket
+
+    def __len__(self):
+        return self.count
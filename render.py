@@ -3,46 +3,11 @@ import pygame
 from pygame.locals import *
 import math
 from OpenGL.GL import *
-from OpenGL.GLU import *
+from frustum import perspective_matrix, gl_matrix
 from config import *
 
-text_cache = {}
-
-def create_text_texture(text_surface):
-    text_data = pygame.image.tostring(text_surface, "RGBA", True)
-    w, h = text_surface.get_size()
-    tex_id = glGenTextures(1)
-    glBindTexture(GL_TEXTURE_2D, tex_id)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
-    glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, w, h, 0, GL_RGBA, GL_UNSIGNED_BYTE, text_data)
-    return tex_id, w, h
-
-def draw_text_2d_cached(font, text, x, y):
-    key = (text, font.get_height(), font.get_bold(), font.get_italic())
-    if key not in text_cache:
-        text_surface = font.render(text, True, (255,255,255,255))
-        tex_id, w, h = create_text_texture(text_surface)
-        text_cache[key] = (tex_id, w, h, text)
-    else:
-        tex_id, w, h, old_text = text_cache[key]
-        if old_text != text:
-            glDeleteTextures([tex_id])
-            text_surface = font.render(text, True, (255,255,255,255))
-            tex_id, w, h = create_text_texture(text_surface)
-            text_cache[key] = (tex_id, w, h, text)
-    glEnable(GL_BLEND)
-    glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
-    glEnable(GL_TEXTURE_2D)
-    glBindTexture(GL_TEXTURE_2D, text_cache[key][0])
-    glBegin(GL_QUADS)
-    glTexCoord2f(0,1); glVertex2f(x, y)
-    glTexCoord2f(1,1); glVertex2f(x+w, y)
-    glTexCoord2f(1,0); glVertex2f(x+w, y+h)
-    glTexCoord2f(0,0); glVertex2f(x, y+h)
-    glEnd()
-    glDisable(GL_TEXTURE_2D)
-    glDisable(GL_BLEND)
+render_stats = {"chunks_drawn": 0, "chunks_culled": 0, "chunks_lod": 0, "vertices_full": 0, "vertices_lod": 0,
+                "chunks_occluded": 0, "sections_visible": 0}
 
 def draw_box(cx, cy, cz, hw, hh, hl):
     v = [
@@ -97,8 +62,7 @@ def set_display_mode(fullscreen):
     width, height = screen.get_size()
     glViewport(0, 0, width, height)
     glMatrixMode(GL_PROJECTION)
-    glLoadIdentity()
-    gluPerspective(FOV, width/float(height), 0.1, 1000.0)
+    glLoadMatrixf(gl_matrix(perspective_matrix(FOV, width/float(height), 0.1, 1000.0)))
     glMatrixMode(GL_MODELVIEW)
     glLoadIdentity()
 
@@ -127,142 +91,179 @@ def build_chunk_vertex_data(chunk_data, cx, cz):
         return (bx,by,bz) in chunk_data
 
     face_data = []
-    edge_data = []
     size = 1.0
 
-    def add_face_edges(ex,ey,ez, direction):
-        directions = {
-            "top":[(ex,ey+size,ez),(ex+size,ey+size,ez),(ex+size,ey+size,ez+size),(ex,ey+size,ez+size)],
-            "bottom":[(ex,ey,ez),(ex+size,ey,ez),(ex+size,ey,ez+size),(ex,ey,ez+size)],
-            "north":[(ex,ey,ez),(ex+size,ey,ez),(ex+size,ey+size,ez),(ex,ey+size,ez)],
-            "south":[(ex,ey,ez+size),(ex+size,ey,ez+size),(ex+size,ey+size,ez+size),(ex,ey+size,ez+size)],
-            "west":[(ex,ey,ez),(ex,ey,ez+size),(ex,ey+size,ez+size),(ex,ey+size,ez)],
-            "east":[(ex+size,ey,ez),(ex+size,ey,ez+size),(ex+size,ey+size,ez+size),(ex+size,ey+size,ez)]
-        }
-        quads = directions[direction]
-        for i in range(len(quads)):
-            x1,y1,z1 = quads[i]
-            x2,y2,z2 = quads[(i+1)%len(quads)]
-            edge_data.extend([x1,y1,z1,0,0,0,x2,y2,z2,0,0,0])
-
+    # Faces are emitted section by section so each section is a contiguous vertex range
+    by_section = {}
     for (bx,by,bz), val in chunk_data.items():
-        c = block_colors(val)
-        # top
-        if not block_exists(bx, by+1, bz):
-            tc = c["top"]
-            face_data += [
-                bx,by+size,bz,tc[0],tc[1],tc[2],
-                bx+size,by+size,bz,tc[0],tc[1],tc[2],
-                bx+size,by+size,bz+size,tc[0],tc[1],tc[2],
-
-                bx,by+size,bz,tc[0],tc[1],tc[2],
-                bx+size,by+size,bz+size,tc[0],tc[1],tc[2],
-                bx,by+size,bz+size,tc[0],tc[1],tc[2],
-            ]
-            add_face_edges(bx,by,bz,"top")
-
-        # bottom
-        if not block_exists(bx, by-1, bz):
-            bc = c["bottom"]
-            face_data += [
-                bx,by,bz,bc[0],bc[1],bc[2],
-                bx+size,by,bz+size,bc[0],bc[1],bc[2],
-                bx+size,by,bz,bc[0],bc[1],bc[2],
-
-                bx,by,bz,bc[0],bc[1],bc[2],
-                bx,by,bz+size,bc[0],bc[1],bc[2],
-                bx+size,by,bz+size,bc[0],bc[1],bc[2],
-            ]
-            add_face_edges(bx,by,bz,"bottom")
-
-        # north
-        if not block_exists(bx, by, bz-1):
-            sc = c["side"]
-            face_data += [
-                bx,by,bz,sc[0],sc[1],sc[2],
-                bx+size,by,bz,sc[0],sc[1],sc[2],
-                bx+size,by+size,bz,sc[0],sc[1],sc[2],
-
-                bx,by,bz,sc[0],sc[1],sc[2],
-                bx+size,by+size,bz,sc[0],sc[1],sc[2],
-                bx,by+size,bz,sc[0],sc[1],sc[2],
-            ]
-            add_face_edges(bx,by,bz,"north")
-
-        # south
-        if not block_exists(bx, by, bz+1):
-            sc = c["side"]
-            face_data += [
-                bx,by,bz+size,sc[0],sc[1],sc[2],
-                bx+size,by,bz+size,sc[0],sc[1],sc[2],
-                bx+size,by+size,bz+size,sc[0],sc[1],sc[2],
+        by_section.setdefault(by // SECTION_HEIGHT, []).append((bx,by,bz,val))
+
+    sections = []
+    for sy in sorted(by_section):
+        face_start = len(face_data)
+        for (bx,by,bz,val) in by_section[sy]:
+            c = block_colors(val)
+            # top
+            if not block_exists(bx, by+1, bz):
+                tc = c["top"]
+                face_data += [
+                    bx,by+size,bz,tc[0],tc[1],tc[2],
+                    bx+size,by+size,bz,tc[0],tc[1],tc[2],
+                    bx+size,by+size,bz+size,tc[0],tc[1],tc[2],
+
+                    bx,by+size,bz,tc[0],tc[1],tc[2],
+                    bx+size,by+size,bz+size,tc[0],tc[1],tc[2],
+                    bx,by+size,bz+size,tc[0],tc[1],tc[2],
+                ]
+
+            # bottom
+            if not block_exists(bx, by-1, bz):
+                bc = c["bottom"]
+                face_data += [
+                    bx,by,bz,bc[0],bc[1],bc[2],
+                    bx+size,by,bz+size,bc[0],bc[1],bc[2],
+                    bx+size,by,bz,bc[0],bc[1],bc[2],
+
+                    bx,by,bz,bc[0],bc[1],bc[2],
+                    bx,by,bz+size,bc[0],bc[1],bc[2],
+                    bx+size,by,bz+size,bc[0],bc[1],bc[2],
+                ]
+
+            # north
+            if not block_exists(bx, by, bz-1):
+                sc = c["side"]
+                face_data += [
+                    bx,by,bz,sc[0],sc[1],sc[2],
+                    bx+size,by,bz,sc[0],sc[1],sc[2],
+                    bx+size,by+size,bz,sc[0],sc[1],sc[2],
+
+                    bx,by,bz,sc[0],sc[1],sc[2],
+                    bx+size,by+size,bz,sc[0],sc[1],sc[2],
+                    bx,by+size,bz,sc[0],sc[1],sc[2],
+                ]
+
+            # south
+            if not block_exists(bx, by, bz+1):
+                sc = c["side"]
+                face_data += [
+                    bx,by,bz+size,sc[0],sc[1],sc[2],
+                    bx+size,by,bz+size,sc[0],sc[1],sc[2],
+                    bx+size,by+size,bz+size,sc[0],sc[1],sc[2],
+
+                    bx,by,bz+size,sc[0],sc[1],sc[2],
+                    bx+size,by+size,bz+size,sc[0],sc[1],sc[2],
+                    bx,by+size,bz+size,sc[0],sc[1],sc[2],
+                ]
+
+            # west
+            if not block_exists(bx-1, by, bz):
+                sc = c["side"]
+                face_data += [
+                    bx,by,bz,sc[0],sc[1],sc[2],
+                    bx,by,bz+size,sc[0],sc[1],sc[2],
+                    bx,by+size,bz+size,sc[0],sc[1],sc[2],
+
+                    bx,by,bz,sc[0],sc[1],sc[2],
+                    bx,by+size,bz+size,sc[0],sc[1],sc[2],
+                    bx,by+size,bz,sc[0],sc[1],sc[2],
+                ]
+
+            # east
+            if not block_exists(bx+1, by, bz):
+                sc = c["side"]
+                face_data += [
+                    bx+size,by,bz,sc[0],sc[1],sc[2],
+                    bx+size,by,bz+size,sc[0],sc[1],sc[2],
+                    bx+size,by+size,bz+size,sc[0],sc[1],sc[2],
+
+                    bx+size,by,bz,sc[0],sc[1],sc[2],
+                    bx+size,by+size,bz+size,sc[0],sc[1],sc[2],
+                    bx+size,by+size,bz,sc[0],sc[1],sc[2],
+                ]
+        sections.append((sy, (len(face_data)-face_start)//6))
+
+    # Block outlines are drawn by the terrain shader, so no separate edge geometry
+    return (pack_vertex_data(face_data), sections)
+
+def pack_vertex_data(face_data):
+    # Flat float list to the GLfloat array the arenas upload
+    return (GLfloat * len(face_data))(*face_data)
+
+def chunk_bounds_from_data(chunk_data, cx, cz):
+    base_x = cx * CHUNK_SIZE
+    base_z = cz * CHUNK_SIZE
+    if chunk_data:
+        min_y = min(by for (_, by, _) in chunk_data)
+        max_y = max(by for (_, by, _) in chunk_data) + 1
+    else:
+        min_y = max_y = GROUND_LEVEL
+    return (base_x, min_y, base_z, base_x + CHUNK_SIZE, max_y, base_z + CHUNK_SIZE)
+
+def build_chunk_lod_vertex_data(chunk_data, cx, cz):
+    # Low-detail shell for distant chunks: greedy-merged column tops plus the
+    # walls where a column stands above its neighbour, no edges, no hidden faces.
+    base_x = cx * CHUNK_SIZE
+    base_z = cz * CHUNK_SIZE
+    tops = {}
+    for (bx, by, bz), val in chunk_data.items():
+        # Leaves that overhang into a neighbour belong to that neighbour's shell
+        if not (base_x <= bx < base_x + CHUNK_SIZE and base_z <= bz < base_z + CHUNK_SIZE):
+            continue
+        top = tops.get((bx, bz))
+        if top is None or by > top[0]:
+            tops[(bx, bz)] = (by, val)
+
+    def top_color(val):
+        return (0.0, 0.8, 0.0) if val == "leaf" else (0.0, 1.0, 0.0)
+
+    def side_color(val):
+        return (0.0, 0.6, 0.0) if val == "leaf" else (0.5, 0.3, 0.1)
 
-                bx,by,bz+size,sc[0],sc[1],sc[2],
-                bx+size,by+size,bz+size,sc[0],sc[1],sc[2],
-                bx,by+size,bz+size,sc[0],sc[1],sc[2],
-            ]
-            add_face_edges(bx,by,bz,"south")
+    face_data = []
 
-        # west
-        if not block_exists(bx-1, by, bz):
-            sc = c["side"]
+    # Greedy rectangles of equal height and colour over the top layer
+    done = set()
+    for z in range(base_z, base_z + CHUNK_SIZE):
+        for x in range(base_x, base_x + CHUNK_SIZE):
+            if (x, z) in done or (x, z) not in tops:
+                continue
+            y, val = tops[(x, z)]
+            key = (y, top_color(val))
+            def same(ix, iz):
+                t = tops.get((ix, iz))
+                return t is not None and (ix, iz) not in done and (t[0], top_color(t[1])) == key
+            x2 = x + 1
+            while x2 < base_x + CHUNK_SIZE and same(x2, z):
+                x2 += 1
+            z2 = z + 1
+            while z2 < base_z + CHUNK_SIZE and all(same(ix, z2) for ix in range(x, x2)):
+                z2 += 1
+            for iz in range(z, z2):
+                for ix in range(x, x2):
+                    done.add((ix, iz))
+            r, g, b = key[1]
+            ty = y + 1.0
             face_data += [
-                bx,by,bz,sc[0],sc[1],sc[2],
-                bx,by,bz+size,sc[0],sc[1],sc[2],
-                bx,by+size,bz+size,sc[0],sc[1],sc[2],
-
-                bx,by,bz,sc[0],sc[1],sc[2],
-                bx,by+size,bz+size,sc[0],sc[1],sc[2],
-                bx,by+size,bz,sc[0],sc[1],sc[2],
+                x,ty,z,r,g,b, x2,ty,z,r,g,b, x2,ty,z2,r,g,b,
+                x,ty,z,r,g,b, x2,ty,z2,r,g,b, x,ty,z2,r,g,b,
             ]
-            add_face_edges(bx,by,bz,"west")
 
-        # east
-        if not block_exists(bx+1, by, bz):
-            sc = c["side"]
+    # Walls down to the neighbouring column (or the ground just outside the chunk)
+    for (x, z), (y, val) in tops.items():
+        r, g, b = side_color(val)
+        top = y + 1.0
+        for nx, nz, x1, z1, x2, z2 in ((x, z-1, x, z, x+1, z), (x, z+1, x, z+1, x+1, z+1),
+                                        (x-1, z, x, z, x, z+1), (x+1, z, x+1, z, x+1, z+1)):
+            if base_x <= nx < base_x + CHUNK_SIZE and base_z <= nz < base_z + CHUNK_SIZE:
+                n = tops.get((nx, nz))
+                bottom = (n[0] + 1.0) if n is not None else float(GROUND_LEVEL)
+            else:
+                bottom = GROUND_LEVEL + 1.0
+            if bottom >= top:
+                continue
             face_data += [
-                bx+size,by,bz,sc[0],sc[1],sc[2],
-                bx+size,by,bz+size,sc[0],sc[1],sc[2],
-                bx+size,by+size,bz+size,sc[0],sc[1],sc[2],
-
-                bx+size,by,bz,sc[0],sc[1],sc[2],
-                bx+size,by+size,bz+size,sc[0],sc[1],sc[2],
-                bx+size,by+size,bz,sc[0],sc[1],sc[2],
+                x1,bottom,z1,r,g,b, x2,bottom,z2,r,g,b, x2,top,z2,r,g,b,
+                x1,bottom,z1,r,g,b, x2,top,z2,r,g,b, x1,top,z1,r,g,b,
             ]
-            add_face_edges(bx,by,bz,"east")
-
-    face_data_gl = (GLfloat * len(face_data))(*face_data)
-    edge_data_gl = (GLfloat * len(edge_data))(*edge_data)
-
-    return (face_data_gl, edge_data_gl)
-
-def create_vbo_from_vertex_data(face_data, edge_data):
-    all_data = list(face_data) + list(edge_data)
-    vertex_data_gl = (GLfloat * len(all_data))(*all_data)
-
-    vbo_id = glGenBuffers(1)
-    glBindBuffer(GL_ARRAY_BUFFER, vbo_id)
-    glBufferData(GL_ARRAY_BUFFER, len(vertex_data_gl)*4, vertex_data_gl, GL_STATIC_DRAW)
-    glBindBuffer(GL_ARRAY_BUFFER, 0)
-
-    face_vertex_count = len(face_data)//6
-    edge_vertex_count = len(edge_data)//6
-
-    return vbo_id, face_vertex_count, edge_vertex_count
-
-def render_chunk_vbo(vbo_id, face_vertex_count, edge_vertex_count):
-    glBindBuffer(GL_ARRAY_BUFFER, vbo_id)
-    glEnableClientState(GL_VERTEX_ARRAY)
-    glEnableClientState(GL_COLOR_ARRAY)
-
-    stride = 6 * 4
-    glVertexPointer(3, GL_FLOAT, stride, None)
-    glColorPointer(3, GL_FLOAT, stride, ctypes.c_void_p(3*4))
-
-    glDrawArrays(GL_TRIANGLES, 0, face_vertex_count)
-    edge_start = face_vertex_count
-    glDrawArrays(GL_LINES, edge_start, edge_vertex_count)
 
-    glDisableClientState(GL_COLOR_ARRAY)
-    glDisableClientState(GL_VERTEX_ARRAY)
-    glBindBuffer(GL_ARRAY_BUFFER, 0)
+    return pack_vertex_data(face_data)
@@ -0,0 +1,182 @@
+# replay.py
+import hashlib, random, struct, time
+import pygame
+from pygame.locals import *
+from bench import ScriptedKeys, percentiles
+from config import FIXED_TICK_RATE, REPLAY_HASH_INTERVAL
+
+# Recording file: a header, then one record per tick. Every REPLAY_HASH_INTERVAL-th
+# record is followed by an 8-byte digest of the simulation state.
+#   header: magic, version, world seed, sim seed, tick rate, hash interval
+#   tick:   held keys bitmask, summed mouse motion, chunk uploads and chunk queue
+#           operations done that tick, flags, action count, then one byte per action
+MAGIC = b"MFPSREC\x00"
+VERSION = 2
+HEADER = struct.Struct("<8sHIIHH")
+TICK = struct.Struct("<HhhHHBB")
+DIGEST_SIZE = 8
+FLAG_THROTTLED = 1
+
+# Held keys the simulation reads, in bit order
+KEY_BITS = (K_w, K_a, K_s, K_d, K_SPACE, K_LSHIFT, K_RSHIFT)
+
+# Discrete inputs the simulation reacts to, as one-byte codes
+ACTION_FIRE = 1
+ACTION_WHEEL_UP = 4
+ACTION_WHEEL_DOWN = 5
+WEAPON_KEYS = {K_1: 11, K_2: 12, K_3: 13}
+KEY_ACTIONS = {code: key for key, code in WEAPON_KEYS.items()}
+
+# Keys that only affect the presentation or the session; passed through live
+LIVE_KEYS = (K_ESCAPE, K_F11, K_b, K_F3, K_F4)
+
+def live_events(events):
+    return [e for e in events if e.type == QUIT or (e.type == KEYDOWN and e.key in LIVE_KEYS)]
+
+def action_events(actions):
+    events = []
+    for code in actions:
+        if code in KEY_ACTIONS:
+            events.append(pygame.event.Event(KEYDOWN, key=KEY_ACTIONS[code], mod=0, unicode="", scancode=0))
+        else:
+            events.append(pygame.event.Event(MOUSEBUTTONDOWN, button=code, pos=(0, 0)))
+    return events
+
+def tick_inputs(mask, dx, dy, actions, passthrough):
+    # The same synthetic keys and events for the recording run and the replay
+    keys = ScriptedKeys()
+    for bit, key in enumerate(KEY_BITS):
+        keys[key] = (mask >> bit) & 1
+    events = list(passthrough)
+    if dx or dy:
+        events.append(pygame.event.Event(MOUSEMOTION, rel=(dx, dy), pos=(0, 0), buttons=(0, 0, 0)))
+    events.extend(action_events(actions))
+    return keys, events
+
+def state_hash(world, player, inventory, bullets, rockets, explosions, enemies, pickups, director):
+    # World, player, projectiles, enemies and the main random stream. Floats go
+    # through repr, so any difference in the last bit shows up.
+    h = hashlib.blake2b(digest_size=DIGEST_SIZE)
+    h.update(repr(player).encode())
+    h.update(repr(sorted((k, v["ammo"]) for k, v in inventory.items())).encode())
+    h.update(repr(list(world.items())).encode())
+    h.update(repr([(type(e).__name__, e.x, e.y, e.z, e.health, e.yaw) for e in enemies]).encode())
+    h.update(repr([(p.x, p.y, p.z, p.ammo_type) for p in pickups]).encode())
+    h.update(repr([(b.x, b.y, b.z) for b in bullets]).encode())
+    h.update(repr([(r.x, r.y, r.z, r.alive) for r in rockets]).encode())
+    h.update(repr([(e.x, e.y, e.z, e.fireball_life) for e in explosions]).encode())
+    h.update(repr((len(director.queue), director.spawned, director.despawned)).encode())
+    h.update(repr(random.getstate()).encode())
+    return h.digest()
+
+class InputRecorder:
+    # Writes the inputs each fixed tick consumed, plus the tick's chunk streaming and
+    # spawn-throttle outcomes, which depend on timing rather than on input
+    def __init__(self, path, world_seed, sim_seed=None):
+        if sim_seed is None:
+            sim_seed = random.SystemRandom().randrange(1 << 32)
+        self.world_seed = world_seed
+        self.sim_seed = sim_seed
+        self.tick_rate = FIXED_TICK_RATE
+        self.hash_interval = REPLAY_HASH_INTERVAL
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(MAGIC, VERSION, world_seed, sim_seed, self.tick_rate, self.hash_interval))
+        self.ticks = 0
+        self.pending = None
+
+    def inputs(self, keys, events, playing):
+        passthrough = live_events(events)
+        if not playing:
+            return ScriptedKeys(), passthrough
+        mask = 0
+        for bit, key in enumerate(KEY_BITS):
+            if keys[key]:
+                mask |= 1 << bit
+        dx = dy = 0
+        actions = []
+        for e in events:
+            if e.type == MOUSEMOTION:
+                dx += int(e.rel[0])
+                dy += int(e.rel[1])
+            elif e.type == MOUSEBUTTONDOWN and e.button in (1, 4, 5):
+                actions.append(e.button)
+            elif e.type == KEYDOWN and e.key in WEAPON_KEYS:
+                actions.append(WEAPON_KEYS[e.key])
+        dx = max(-32768, min(32767, dx))
+        dy = max(-32768, min(32767, dy))
+        self.pending = (mask, dx, dy, actions)
+        return tick_inputs(mask, dx, dy, actions, passthrough)
+
+    def end_tick(self, uploads, queue_ops, throttled, state):
+        mask, dx, dy, actions = self.pending
+        flags = FLAG_THROTTLED if throttled else 0
+        self.file.write(TICK.pack(mask, dx, dy, uploads, queue_ops, flags, len(actions)))
+        self.file.write(bytes(actions))
+        self.ticks += 1
+        if self.ticks % self.hash_interval == 0:
+            self.file.write(state())
+
+    def close(self):
+        self.file.close()
+        print("Recorded %d ticks (world seed %d, sim seed %d)" % (self.ticks, self.world_seed, self.sim_seed))
+
+class InputReplay:
+    # Feeds a recording back one tick per frame and checks the state digests
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.data = f.read()
+        magic, version, self.world_seed, self.sim_seed, self.tick_rate, self.hash_interval = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("%s is not a version %d MineFPS recording" % (path, VERSION))
+        self.offset = HEADER.size
+        self.ticks = 0
+        self.current = None
+        self.checks = 0
+        self.mismatch = None
+        self.finished = False
+        self.frame_ms = []
+        self.last_frame = None
+
+    def next_tick(self):
+        # The record for the tick about to run, or None at the end of the file
+        if self.current is None:
+            if self.offset + TICK.size > len(self.data):
+                self.finished = True
+                return None
+            mask, dx, dy, uploads, queue_ops, flags, count = TICK.unpack_from(self.data, self.offset)
+            self.offset += TICK.size
+            actions = list(self.data[self.offset:self.offset + count])
+            self.offset += count
+            self.current = (mask, dx, dy, uploads, queue_ops, bool(flags & FLAG_THROTTLED), actions)
+        return self.current
+
+    def inputs(self, events, playing):
+        passthrough = live_events(events)
+        if not playing or self.next_tick() is None:
+            return ScriptedKeys(), passthrough
+        now = time.perf_counter()
+        if self.last_frame is not None:
+            self.frame_ms.append((now - self.last_frame) * 1000.0)
+        self.last_frame = now
+        mask, dx, dy, _, _, _, actions = self.current
+        return tick_inputs(mask, dx, dy, actions, passthrough)
+
+    def end_tick(self, state):
+        self.current = None
+        self.ticks += 1
+        if self.ticks % self.hash_interval == 0:
+            expected = self.data[self.offset:self.offset + DIGEST_SIZE]
+            self.offset += DIGEST_SIZE
+            self.checks += 1
+            if state() != expected:
+                self.mismatch = self.ticks
+                self.finished = True
+
+    def report(self):
+        if self.mismatch is not None:
+            print("Replay diverged: state hash mismatch at tick %d (%d checks passed)" % (self.mismatch, self.checks - 1))
+        else:
+            print("Replay matched: %d ticks, %d state hash checks passed" % (self.ticks, self.checks))
+        frame = percentiles(self.frame_ms)
+        if frame is not None:
+            print("Replay frame ms: p50 %.2f  p95 %.2f  p99 %.2f  max %.2f" % (frame["p50"], frame["p95"], frame["p99"], frame["max"]))
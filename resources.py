@@ -0,0 +1,203 @@
+# resources.py
+import json, os, sys, time
+from collections import deque
+import numpy as np
+from config import RESOURCE_SAMPLE_INTERVAL, RESOURCE_SAMPLE_HISTORY, RESOURCE_WARMUP, PROFILER_OVERLAY_INTERVAL
+
+GL_KINDS = ("buffer", "vao", "texture", "program", "quadric")
+
+def current_rss_mb():
+    # Resident set size now, not the peak; None where /proc is missing
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE") / (1024.0 * 1024.0)
+
+def handle_key(handle):
+    # GL names are integers; GLU quadrics are pointer objects
+    try:
+        return int(handle)
+    except (TypeError, ValueError):
+        return id(handle)
+
+def creation_site(depth):
+    frame = sys._getframe(depth + 1)
+    return "%s:%d %s" % (os.path.basename(frame.f_code.co_filename), frame.f_lineno, frame.f_code.co_name)
+
+def slope_per_minute(times, values):
+    points = [(t, v) for t, v in zip(times, values) if v is not None]
+    if len(points) < 2 or points[-1][0] - points[0][0] <= 0:
+        return None
+    t, v = np.array(points, dtype=np.float64).T
+    return float(np.polyfit(t / 60.0, v, 1)[0])
+
+class ResourceLedger:
+    # Live GL objects by kind with their byte sizes and the line that created them, plus
+    # per-subsystem Python estimates from registered probes. A sample of both is taken
+    # every RESOURCE_SAMPLE_INTERVAL seconds; growth is measured from the first sample
+    # RESOURCE_WARMUP seconds into play, once streaming and spawning have settled.
+    def __init__(self):
+        self.live = {}      # (kind, handle): [nbytes, site]
+        self.sites = {}     # site: {"kind", "created", "deleted"}
+        self.unknown_deletes = 0
+        self.probes = {}    # name: callable returning {metric: number}
+        self.samples = deque(maxlen=RESOURCE_SAMPLE_HISTORY)
+        self.baseline = None
+        self.started = time.perf_counter()
+        self.playable_at = None
+        self.last_sample = None
+        self.path = None
+        self.overlay = False
+        self.overlay_time = 0.0
+        self.overlay_lines = []
+
+    def dump_to(self, path):
+        self.path = path
+
+    def gl_created(self, kind, handle, nbytes=0, depth=1):
+        site = creation_site(depth)
+        self.live[(kind, handle_key(handle))] = [nbytes, site]
+        entry = self.sites.get(site)
+        if entry is None:
+            entry = {"kind": kind, "created": 0, "deleted": 0}
+            self.sites[site] = entry
+        entry["created"] += 1
+
+    def gl_resized(self, kind, handle, nbytes):
+        record = self.live.get((kind, handle_key(handle)))
+        if record is not None:
+            record[0] = nbytes
+
+    def gl_deleted(self, kind, handle):
+        record = self.live.pop((kind, handle_key(handle)), None)
+        if record is None:
+            self.unknown_deletes += 1
+            return
+        self.sites[record[1]]["deleted"] += 1
+
+    def probe(self, name, fn):
+        self.probes[name] = fn
+
+    def gl_totals(self):
+        totals = {kind: {"count": 0, "bytes": 0} for kind in GL_KINDS}
+        for (kind, _), (nbytes, _) in self.live.items():
+            totals[kind]["count"] += 1
+            totals[kind]["bytes"] += nbytes
+        return totals
+
+    def site_totals(self):
+        live = {}
+        for nbytes, site in self.live.values():
+            count, total = live.get(site, (0, 0))
+            live[site] = (count + 1, total + nbytes)
+        return live
+
+    def snapshot(self):
+        return {
+            "t": time.perf_counter() - self.started,
+            "rss_mb": current_rss_mb(),
+            "gl": self.gl_totals(),
+            "python": {name: fn() for name, fn in self.probes.items()},
+        }
+
+    def mark_playable(self):
+        self.playable_at = time.perf_counter() - self.started
+
+    def update(self):
+        now = time.perf_counter()
+        if self.last_sample is not None and now - self.last_sample < RESOURCE_SAMPLE_INTERVAL:
+            return
+        self.last_sample = now
+        sample = self.snapshot()
+        self.samples.append(sample)
+        if self.baseline is None and self.playable_at is not None and sample["t"] >= self.playable_at + RESOURCE_WARMUP:
+            self.baseline = (sample, {site: count for site, (count, _) in self.site_totals().items()})
+
+    def report(self):
+        # Growth since the baseline, per creation site and per probe metric; a site whose
+        # live count keeps rising is a leak candidate. A run shorter than the warm-up has
+        # no baseline, and fitting across the loading ramp would look like a leak.
+        final = self.snapshot()
+        if self.baseline is not None:
+            base, base_sites = self.baseline
+        else:
+            base, base_sites = None, {}
+        sites = []
+        for site, (count, nbytes) in sorted(self.site_totals().items(), key=lambda item: -item[1][1]):
+            entry = self.sites[site]
+            sites.append({"site": site, "kind": entry["kind"], "live": count, "bytes": nbytes,
+                          "created": entry["created"], "deleted": entry["deleted"],
+                          "growth": count - base_sites.get(site, 0) if base_sites else None})
+        python_growth = {}
+        if base is not None:
+            for name, metrics in final["python"].items():
+                before = base["python"].get(name, {})
+                python_growth[name] = {k: v - before[k] for k, v in metrics.items() if k in before and v != before[k]}
+        samples = list(self.samples)
+        times = [s["t"] for s in samples if base is not None and s["t"] >= base["t"]]
+        tail = samples[len(samples) - len(times):]
+        gl_bytes = [sum(k["bytes"] for k in s["gl"].values()) for s in tail]
+        return {
+            "seconds": final["t"],
+            "baseline_t": None if base is None else base["t"],
+            "final": final,
+            "rss_mb_per_min": slope_per_minute(times, [s["rss_mb"] for s in tail]),
+            "gl_bytes_per_min": slope_per_minute(times, gl_bytes),
+            "leaks": {
+                "growing_sites": [s for s in sites if s["growth"]],
+                "unknown_deletes": self.unknown_deletes,
+                "python_growth": {name: g for name, g in python_growth.items() if g},
+            },
+            "live_gl_objects": sites,
+            "samples": samples,
+        }
+
+    def draw_overlay(self, hud, x=440, y=10):
+        if not self.overlay:
+            return
+        now = time.perf_counter()
+        if now - self.overlay_time >= PROFILER_OVERLAY_INTERVAL:
+            self.overlay_time = now
+            self.overlay_lines = self._overlay_text()
+        hud.rect(x - 4, y - 4, x + 620, y + 20*len(self.overlay_lines) + 4, (0.0, 0.0, 0.0, 0.6))
+        for i, line in enumerate(self.overlay_lines):
+            hud.text(line, x, y + 20*i)
+
+    def _overlay_text(self):
+        snap = self.snapshot()
+        rss = snap["rss_mb"]
+        lines = ["rss %s MB" % ("?" if rss is None else "%.1f" % rss)]
+        for kind, total in snap["gl"].items():
+            lines.append("gl %-8s %5d %9.1f KB" % (kind, total["count"], total["bytes"] / 1024.0))
+        for name, metrics in snap["python"].items():
+            lines.append("%s: %s" % (name, "  ".join("%s %s" % (k, fmt_metric(v)) for k, v in metrics.items())))
+        return lines
+
+    def export(self):
+        if self.path is None:
+            return
+        result = self.report()
+        with open(self.path, "w") as f:
+            json.dump(result, f, indent=2)
+        if result["baseline_t"] is None:
+            print("Resources: no trend, the run ended before the %.0fs warm-up baseline; %d unknown delete(s)" % (
+                RESOURCE_WARMUP, result["leaks"]["unknown_deletes"]))
+            return
+        rss = result["rss_mb_per_min"]
+        gl = result["gl_bytes_per_min"]
+        print("Resources: rss %s MB/min, gl %s KB/min over %.0fs from the baseline sample; %d growing GL site(s), %d unknown delete(s)" % (
+            "?" if rss is None else "%+.3f" % rss, "?" if gl is None else "%+.1f" % (gl / 1024.0),
+            result["seconds"] - result["baseline_t"], len(result["leaks"]["growing_sites"]), result["leaks"]["unknown_deletes"]))
+
+def fmt_metric(value):
+    if isinstance(value, float):
+        return "%.1f" % value
+    if value >= 1 << 20:
+        return "%.1fM" % (value / float(1 << 20))
+    if value >= 1 << 10:
+        return "%.1fK" % (value / float(1 << 10))
+    return str(value)
+
+resource_ledger = ResourceLedger()
@@ -0,0 +1,317 @@
+# shaders.py
+import ctypes
+import numpy as np
+from OpenGL.GL import *
+from resources import resource_ledger
+
+# GLSL 1.20 so the same sources run on old drivers and on Mesa's llvmpipe.
+# Attribute locations are bound before linking so one VAO layout fits every program.
+# A mat4 attribute takes four consecutive locations.
+ATTRIB_LOCATIONS = {"a_position": 0, "a_color": 1, "a_part": 2, "a_center": 2, "a_texcoord": 2,
+                    "i_model": 3, "i_part_model": 7, "i_tint": 11}
+
+TERRAIN_VERTEX = """
+#version 120
+uniform mat4 u_view_proj;
+attribute vec3 a_position;
+attribute vec3 a_color;
+varying vec3 v_color;
+varying vec3 v_world;
+void main() {
+    v_color = a_color;
+    v_world = a_position;
+    gl_Position = u_view_proj * vec4(a_position, 1.0);
+}
+"""
+
+# Block outlines come from the face itself: every face lies on the unit block grid,
+# so the in-face coordinates are the fractional parts of the two axes that vary
+# across it (the constant axis is the one with the smallest screen derivative).
+# Each face darkens half a pixel along its border; two neighbouring faces make
+# the one-pixel line the old GL_LINES edge geometry drew.
+TERRAIN_FRAGMENT = """
+#version 120
+uniform float u_outline;
+varying vec3 v_color;
+varying vec3 v_world;
+void main() {
+    vec3 color = v_color;
+    if (u_outline > 0.5) {
+        vec3 w = fwidth(v_world);
+        vec3 f = fract(v_world);
+        vec3 d = min(f, 1.0 - f) / max(w, vec3(1e-6));
+        float edge;
+        if (w.x <= w.y && w.x <= w.z) {
+            edge = min(d.y, d.z);
+        } else if (w.y <= w.z) {
+            edge = min(d.x, d.z);
+        } else {
+            edge = min(d.x, d.y);
+        }
+        color *= clamp(edge * 2.0 - 0.5, 0.0, 1.0);
+    }
+    gl_FragColor = vec4(color, 1.0);
+}
+"""
+
+# Instanced models: each instance carries its model matrix, a second matrix for the
+# vertices tagged as the articulated part (the dog's pistol), and a tint that
+# multiplies the baked vertex colors.
+INSTANCED_VERTEX = """
+#version 120
+uniform mat4 u_view_proj;
+attribute vec3 a_position;
+attribute vec3 a_color;
+attribute float a_part;
+attribute mat4 i_model;
+attribute mat4 i_part_model;
+attribute vec4 i_tint;
+varying vec4 v_color;
+void main() {
+    mat4 model = i_model;
+    if (a_part > 0.5) {
+        model = i_part_model;
+    }
+    v_color = vec4(a_color, 1.0) * i_tint;
+    gl_Position = u_view_proj * model * vec4(a_position, 1.0);
+}
+"""
+
+INSTANCED_FRAGMENT = """
+#version 120
+varying vec4 v_color;
+void main() {
+    gl_FragColor = v_color;
+}
+"""
+
+# Clouds drift with wind and wrap around the cached window so none leave it;
+# a cloud whose centre is out of range is discarded as a whole.
+CLOUD_VERTEX = """
+#version 120
+uniform mat4 u_view_proj;
+uniform vec2 u_wind_offset;
+uniform vec2 u_origin;
+uniform float u_span;
+uniform vec3 u_eye;
+uniform float u_radius;
+attribute vec3 a_position;
+attribute vec2 a_center;
+varying float v_visible;
+void main() {
+    vec2 center = u_origin + mod(a_center - u_origin + u_wind_offset, u_span);
+    vec2 shift = center - a_center;
+    v_visible = distance(center, u_eye.xz) < u_radius ? 1.0 : 0.0;
+    gl_Position = u_view_proj * vec4(a_position + vec3(shift.x, 0.0, shift.y), 1.0);
+}
+"""
+
+CLOUD_FRAGMENT = """
+#version 120
+uniform vec4 u_color;
+varying float v_visible;
+void main() {
+    if (v_visible < 0.5) {
+        discard;
+    }
+    gl_FragColor = u_color;
+}
+"""
+
+LINES_VERTEX = """
+#version 120
+uniform mat4 u_view_proj;
+attribute vec3 a_position;
+void main() {
+    gl_Position = u_view_proj * vec4(a_position, 1.0);
+}
+"""
+
+LINES_FRAGMENT = """
+#version 120
+uniform vec4 u_color;
+void main() {
+    gl_FragColor = u_color;
+}
+"""
+
+PARTICLE_VERTEX = """
+#version 120
+uniform mat4 u_view_proj;
+uniform vec3 u_eye;
+attribute vec3 a_position;
+attribute vec4 a_color;
+varying vec4 v_color;
+void main() {
+    v_color = a_color;
+    gl_PointSize = max(1.0, 50.0 / (distance(a_position, u_eye) + 1.0));
+    gl_Position = u_view_proj * vec4(a_position, 1.0);
+}
+"""
+
+PARTICLE_FRAGMENT = """
+#version 120
+varying vec4 v_color;
+void main() {
+    gl_FragColor = v_color;
+}
+"""
+
+TEXT_VERTEX = """
+#version 120
+uniform mat4 u_projection;
+attribute vec2 a_position;
+attribute vec2 a_texcoord;
+attribute vec4 a_color;
+varying vec2 v_texcoord;
+varying vec4 v_color;
+void main() {
+    v_texcoord = a_texcoord;
+    v_color = a_color;
+    gl_Position = u_projection * vec4(a_position, 0.0, 1.0);
+}
+"""
+
+TEXT_FRAGMENT = """
+#version 120
+uniform sampler2D u_atlas;
+varying vec2 v_texcoord;
+varying vec4 v_color;
+void main() {
+    gl_FragColor = v_color * texture2D(u_atlas, v_texcoord);
+}
+"""
+
+PROGRAM_SOURCES = {
+    "terrain": (TERRAIN_VERTEX, TERRAIN_FRAGMENT),
+    "instanced": (INSTANCED_VERTEX, INSTANCED_FRAGMENT),
+    "lines": (LINES_VERTEX, LINES_FRAGMENT),
+    "clouds": (CLOUD_VERTEX, CLOUD_FRAGMENT),
+    "particles": (PARTICLE_VERTEX, PARTICLE_FRAGMENT),
+    "text": (TEXT_VERTEX, TEXT_FRAGMENT),
+}
+
+def compile_shader(source, shader_type):
+    shader = glCreateShader(shader_type)
+    glShaderSource(shader, source)
+    glCompileShader(shader)
+    if not glGetShaderiv(shader, GL_COMPILE_STATUS):
+        log = glGetShaderInfoLog(shader)
+        glDeleteShader(shader)
+        raise RuntimeError("Shader compile failed: %s" % (log.decode() if isinstance(log, bytes) else log))
+    return shader
+
+class ShaderProgram:
+    def __init__(self, vertex_source, fragment_source):
+        vs = compile_shader(vertex_source, GL_VERTEX_SHADER)
+        fs = compile_shader(fragment_source, GL_FRAGMENT_SHADER)
+        self.program = glCreateProgram()
+        resource_ledger.gl_created("program", self.program, depth=3)
+        glAttachShader(self.program, vs)
+        glAttachShader(self.program, fs)
+        for name, location in ATTRIB_LOCATIONS.items():
+            glBindAttribLocation(self.program, location, name)
+        glLinkProgram(self.program)
+        glDeleteShader(vs)
+        glDeleteShader(fs)
+        if not glGetProgramiv(self.program, GL_LINK_STATUS):
+            log = glGetProgramInfoLog(self.program)
+            raise RuntimeError("Program link failed: %s" % (log.decode() if isinstance(log, bytes) else log))
+        self.uniforms = {}
+
+    def use(self):
+        glUseProgram(self.program)
+
+    def location(self, name):
+        loc = self.uniforms.get(name)
+        if loc is None:
+            loc = glGetUniformLocation(self.program, name)
+            self.uniforms[name] = loc
+        return loc
+
+    def set_matrix(self, name, m):
+        # Matrices are row-major NumPy arrays; let GL transpose them
+        glUniformMatrix4fv(self.location(name), 1, GL_TRUE, np.ascontiguousarray(m, dtype=np.float32))
+
+    def set_int(self, name, value):
+        glUniform1i(self.location(name), value)
+
+    def set_float(self, name, value):
+        glUniform1f(self.location(name), value)
+
+    def set_vec2(self, name, x, y):
+        glUniform2f(self.location(name), x, y)
+
+    def set_vec3(self, name, x, y, z):
+        glUniform3f(self.location(name), x, y, z)
+
+    def set_vec4(self, name, x, y, z, w):
+        glUniform4f(self.location(name), x, y, z, w)
+
+_programs = {}
+
+def get_program(name):
+    prog = _programs.get(name)
+    if prog is None:
+        prog = ShaderProgram(*PROGRAM_SOURCES[name])
+        _programs[name] = prog
+    return prog
+
+class VertexFormat:
+    def __init__(self, attributes):
+        # attributes: [(location, component_count)], all GL_FLOAT and tightly packed
+        self.attributes = []
+        offset = 0
+        for location, size in attributes:
+            self.attributes.append((location, size, offset))
+            offset += size * 4
+        self.stride = offset
+        self.floats = offset // 4
+
+POSITION_COLOR = VertexFormat([(0, 3), (1, 3)])
+POSITION_RGBA = VertexFormat([(0, 3), (1, 4)])
+POSITION2_UV_RGBA = VertexFormat([(0, 2), (2, 2), (1, 4)])
+POSITION_COLOR_PART = VertexFormat([(0, 3), (1, 3), (2, 1)])
+INSTANCE_TRANSFORM = VertexFormat([(3, 4), (4, 4), (5, 4), (6, 4), (7, 4), (8, 4), (9, 4), (10, 4), (11, 4)])
+
+def create_vao(buffer, fmt, instance_buffer=None, instance_fmt=None):
+    vao = glGenVertexArrays(1)
+    resource_ledger.gl_created("vao", vao, depth=2)
+    glBindVertexArray(vao)
+    glBindBuffer(GL_ARRAY_BUFFER, buffer)
+    for location, size, offset in fmt.attributes:
+        glEnableVertexAttribArray(location)
+        glVertexAttribPointer(location, size, GL_FLOAT, GL_FALSE, fmt.stride, ctypes.c_void_p(offset))
+    if instance_buffer is not None:
+        glBindBuffer(GL_ARRAY_BUFFER, instance_buffer)
+        for location, size, offset in instance_fmt.attributes:
+            glEnableVertexAttribArray(location)
+            glVertexAttribPointer(location, size, GL_FLOAT, GL_FALSE, instance_fmt.stride, ctypes.c_void_p(offset))
+            glVertexAttribDivisor(location, 1)
+    glBindVertexArray(0)
+    glBindBuffer(GL_ARRAY_BUFFER, 0)
+    return vao
+
+class StreamBuffer:
+    # Per-frame geometry (particles, HUD): re-specified every draw, orphaning the old storage
+    def __init__(self, fmt):
+        self.fmt = fmt
+        self.buffer = None
+        self.vao = None
+
+    def draw(self, mode, data):
+        data = np.ascontiguousarray(data, dtype=np.float32)
+        count = data.size // self.fmt.floats
+        if count == 0:
+            return
+        if self.buffer is None:
+            self.buffer = glGenBuffers(1)
+            resource_ledger.gl_created("buffer", self.buffer, depth=2)
+            self.vao = create_vao(self.buffer, self.fmt)
+        glBindBuffer(GL_ARRAY_BUFFER, self.buffer)
+        glBufferData(GL_ARRAY_BUFFER, data.nbytes, data, GL_STREAM_DRAW)
+        resource_ledger.gl_resized("buffer", self.buffer, data.nbytes)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        glBindVertexArray(self.vao)
+        glDrawArrays(mode, 0, count)
+        glBindVertexArray(0)
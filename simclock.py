@@ -0,0 +1,29 @@
+# simclock.py
+import time
+
+class SimClock:
+    # Game-time source for cooldowns and AI timers. Normal play reads the wall clock;
+    # recorded and replayed sessions step it by whole fixed ticks so both runs see the
+    # same times.
+    def __init__(self):
+        self.fixed = False
+        self.start = 0.0
+        self.tick_seconds = 0.0
+        self.ticks = 0
+
+    def start_fixed(self, tick_seconds, start=1000.0):
+        # start is well past every cooldown, like the wall clock the timers expect
+        self.fixed = True
+        self.start = start
+        self.tick_seconds = tick_seconds
+        self.ticks = 0
+
+    def advance(self):
+        self.ticks += 1
+
+    def now(self):
+        if self.fixed:
+            return self.start + self.ticks * self.tick_seconds
+        return time.time()
+
+sim_clock = SimClock()
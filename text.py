@@ -0,0 +1,100 @@
+# text.py
+import pygame
+import numpy as np
+from OpenGL.GL import *
+from resources import resource_ledger
+
+ATLAS_SIZE = 512
+GLYPH_PADDING = 1
+WHITE_BLOCK = 4  # solid texels at the atlas origin so untextured shapes can share the text program
+PRELOADED_GLYPHS = "".join(chr(c) for c in range(32, 127))
+
+class GlyphAtlas:
+    # Every glyph of one font rasterized once into a shared texture, packed in shelves
+    def __init__(self, font, size=ATLAS_SIZE):
+        self.font = font
+        self.size = size
+        self.line_height = font.get_height()
+        self.glyphs = {}  # char: (u0, v0, u1, v1, w, h)
+        self.texture = None
+        self.shelf_x = WHITE_BLOCK + GLYPH_PADDING
+        self.shelf_y = 0
+        self.shelf_h = WHITE_BLOCK
+        self.white_uv = (WHITE_BLOCK / 2.0 / size, WHITE_BLOCK / 2.0 / size)
+        self.pending = PRELOADED_GLYPHS
+
+    def ensure_texture(self):
+        if self.texture is not None:
+            return
+        self.texture = glGenTextures(1)
+        glBindTexture(GL_TEXTURE_2D, self.texture)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
+        pixels = np.zeros((self.size, self.size, 4), dtype=np.uint8)
+        pixels[:WHITE_BLOCK, :WHITE_BLOCK] = 255
+        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, self.size, self.size, 0, GL_RGBA, GL_UNSIGNED_BYTE, pixels)
+        resource_ledger.gl_created("texture", self.texture, pixels.nbytes)
+        glBindTexture(GL_TEXTURE_2D, 0)
+        pending, self.pending = self.pending, ""
+        for ch in pending:
+            self._add_glyph(ch)
+
+    def _add_glyph(self, ch):
+        surface = self.font.render(ch, True, (255,255,255,255))
+        w, h = surface.get_size()
+        if self.shelf_x + w + GLYPH_PADDING > self.size:
+            self.shelf_x = 0
+            self.shelf_y += self.shelf_h + GLYPH_PADDING
+            self.shelf_h = 0
+        if self.shelf_y + h > self.size:
+            # Atlas full; the glyph renders as blank space of the right width
+            self.glyphs[ch] = (0.0, 0.0, 0.0, 0.0, w, h)
+            return self.glyphs[ch]
+        x, y = self.shelf_x, self.shelf_y
+        if w > 0 and h > 0:
+            glBindTexture(GL_TEXTURE_2D, self.texture)
+            glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+            glTexSubImage2D(GL_TEXTURE_2D, 0, x, y, w, h, GL_RGBA, GL_UNSIGNED_BYTE,
+                            pygame.image.tostring(surface, "RGBA", False))
+            glBindTexture(GL_TEXTURE_2D, 0)
+        self.shelf_x += w + GLYPH_PADDING
+        self.shelf_h = max(self.shelf_h, h)
+        s = float(self.size)
+        self.glyphs[ch] = (x/s, y/s, (x+w)/s, (y+h)/s, w, h)
+        return self.glyphs[ch]
+
+    def glyph(self, ch):
+        g = self.glyphs.get(ch)
+        if g is None:
+            self.ensure_texture()
+            g = self.glyphs.get(ch) or self._add_glyph(ch)
+        return g
+
+    def layout(self, text, x, y, color, out):
+        # Appends two triangles per glyph: (x, y, u, v, r, g, b, a), y grows downward
+        self.ensure_texture()
+        r, g, b, a = color
+        pen = x
+        for ch in text:
+            if ch == "\n":
+                pen = x
+                y += self.line_height
+                continue
+            u0, v0, u1, v1, w, h = self.glyph(ch)
+            if u1 > u0:
+                x0, y0, x1, y1 = pen, y, pen + w, y + h
+                out.extend((x0,y0,u0,v0,r,g,b,a, x1,y0,u1,v0,r,g,b,a, x1,y1,u1,v1,r,g,b,a,
+                            x0,y0,u0,v0,r,g,b,a, x1,y1,u1,v1,r,g,b,a, x0,y1,u0,v1,r,g,b,a))
+            pen += w
+        return pen - x
+
+_atlases = {}
+
+def get_atlas(font):
+    atlas = _atlases.get(font)
+    if atlas is None:
+        atlas = GlyphAtlas(font)
+        _atlases[font] = atlas
+    return atlas
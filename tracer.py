@@ -0,0 +1,106 @@
+# tracer.py
+import json, os, threading, time
+from config import TRACE_BUFFER_EVENTS
+
+class ThreadRing:
+    # Fixed-size event ring written only by its own thread, so recording takes no lock
+    def __init__(self, size):
+        self.events = [None] * size
+        self.next = 0
+        self.tid = threading.get_native_id()
+        self.name = threading.current_thread().name
+
+    def push(self, event):
+        self.events[self.next % len(self.events)] = event
+        self.next += 1
+
+    def ordered(self):
+        size = len(self.events)
+        if self.next <= size:
+            return self.events[:self.next]
+        start = self.next % size
+        return self.events[start:] + self.events[:start]
+
+class Tracer:
+    # Opt-in spans and counters, written as a Chrome trace-event file (chrome://tracing,
+    # ui.perfetto.dev). Each thread keeps the newest TRACE_BUFFER_EVENTS events.
+    # Timestamps are perf_counter seconds; calls return at once while disabled.
+    def __init__(self, size=TRACE_BUFFER_EVENTS):
+        self.size = size
+        self.enabled = False
+        self.path = None
+        self.local = threading.local()
+        self.rings = []
+        self.enqueued = {}   # task: time it entered generation_queue
+        self.async_ids = 0
+
+    def start(self, path):
+        self.path = path
+        self.enabled = True
+
+    def _ring(self):
+        ring = getattr(self.local, "ring", None)
+        if ring is None:
+            ring = ThreadRing(self.size)
+            self.local.ring = ring
+            self.rings.append(ring)
+        return ring
+
+    def now(self):
+        return time.perf_counter()
+
+    def complete(self, name, start, args=None):
+        # A span from start (a now() value) to the present on the calling thread
+        if not self.enabled:
+            return
+        end = time.perf_counter()
+        self._ring().push(("X", name, start, end - start, args))
+
+    def counter(self, name, value):
+        if not self.enabled:
+            return
+        self._ring().push(("C", name, time.perf_counter(), 0.0, {name: value}))
+
+    def enqueue(self, task):
+        if self.enabled:
+            self.enqueued[task] = time.perf_counter()
+
+    def dequeue(self, task):
+        # Queue wait is drawn as an async span, it overlaps the worker's own spans
+        if not self.enabled:
+            return
+        queued = self.enqueued.pop(task, None)
+        if queued is None:
+            return
+        self.async_ids += 1
+        ring = self._ring()
+        ring.push(("b", "queue_wait", queued, 0.0, {"id": self.async_ids, "task": "%s %d,%d" % task}))
+        ring.push(("e", "queue_wait", time.perf_counter(), 0.0, {"id": self.async_ids}))
+
+    def export(self):
+        if self.path is None:
+            return
+        pid = os.getpid()
+        events = []
+        for ring in list(self.rings):
+            events.append({"ph": "M", "name": "thread_name", "pid": pid, "tid": ring.tid,
+                           "args": {"name": ring.name}})
+            for ph, name, ts, dur, args in ring.ordered():
+                event = {"ph": ph, "name": name, "pid": pid, "tid": ring.tid, "ts": ts * 1e6}
+                if ph == "X":
+                    event["dur"] = dur * 1e6
+                    if args:
+                        event["args"] = args
+                elif ph == "C":
+                    event["args"] = args
+                else:
+                    event["cat"] = "queue"
+                    args = dict(args)
+                    event["id"] = args.pop("id")
+                    if args:
+                        event["args"] = args
+                events.append(event)
+        with open(self.path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+tracer = Tracer()
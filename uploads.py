@@ -0,0 +1,111 @@
+# uploads.py
+import time
+from collections import deque
+from config import UPLOAD_BUDGET_MS, UPLOAD_LOADING_BUDGET_MS, UPLOAD_COMBAT_BUDGET_MS
+
+OP_KINDS = ("upload", "remesh", "unload", "lod")
+
+class CostModel:
+    # ms = overhead + per-kvertex cost, fitted by least squares over recent operations
+    # with older ones decaying away
+    def __init__(self, op_overhead_ms, ms_per_kvertex, decay=0.9):
+        self.op_overhead_ms = op_overhead_ms
+        self.ms_per_kvertex = ms_per_kvertex
+        self.decay = decay
+        self.w = self.sx = self.sy = self.sxx = self.sxy = 0.0
+
+    def predict_ms(self, vertices):
+        return self.op_overhead_ms + self.ms_per_kvertex * vertices / 1000.0
+
+    def add(self, vertices, ms):
+        x = vertices / 1000.0
+        d = self.decay
+        self.w = self.w*d + 1.0
+        self.sx = self.sx*d + x
+        self.sy = self.sy*d + ms
+        self.sxx = self.sxx*d + x*x
+        self.sxy = self.sxy*d + x*ms
+        mean_x = self.sx / self.w
+        mean_y = self.sy / self.w
+        var = self.sxx / self.w - mean_x*mean_x
+        # With no spread in size yet (or ever, for unloads) only the overhead is learned
+        if var > 1e-6:
+            self.ms_per_kvertex = max(0.0, (self.sxy / self.w - mean_x*mean_y) / var)
+        self.op_overhead_ms = max(0.0, mean_y - self.ms_per_kvertex * mean_x)
+
+class UploadScheduler:
+    def __init__(self):
+        self.ready = deque()          # generated chunks pulled off the worker queue, not yet uploaded
+        self.ready_lod = deque()      # distant LOD-only meshes waiting for upload
+        self.loading = False
+        self.combat = False
+        self.costs = {kind: CostModel(0.2, 0.0 if kind == "unload" else 0.5) for kind in OP_KINDS}
+        self.spent_ms = 0.0
+        self.ops_this_frame = 0
+        self.last_frame_ops = 0
+        self.last_frame_ms = 0.0
+        self.uploads_this_frame = 0   # generated chunks integrated this frame
+        self.queue_ops_this_frame = 0  # chunk_update_queue entries handled this frame
+        self.lod_ops_this_frame = 0   # distant LOD meshes uploaded this frame
+        self.forced = None            # (uploads, queue_ops) a replay imposes instead of the budget
+        self.requested_at = {}        # (cx,cz): when generation was queued
+        self.cancelled = set()        # chunks unloaded while their generation was still in flight
+        self.load_latency_ms = deque(maxlen=4096)  # queued-to-uploaded time of recent chunks
+
+    def set_mode(self, loading, combat):
+        self.loading = loading
+        self.combat = combat
+
+    def budget_ms(self):
+        if self.loading:
+            return UPLOAD_LOADING_BUDGET_MS
+        if self.combat:
+            return UPLOAD_COMBAT_BUDGET_MS
+        return UPLOAD_BUDGET_MS
+
+    def begin_frame(self):
+        self.last_frame_ops = self.ops_this_frame
+        self.last_frame_ms = self.spent_ms
+        self.spent_ms = 0.0
+        self.ops_this_frame = 0
+        self.uploads_this_frame = 0
+        self.queue_ops_this_frame = 0
+        self.lod_ops_this_frame = 0
+
+    def can_afford(self, kind, vertices):
+        # Each loop in process_chunk_updates lets its first operation through by itself
+        return self.spent_ms + self.costs[kind].predict_ms(vertices) <= self.budget_ms()
+
+    def record(self, kind, vertices, ms):
+        self.spent_ms += ms
+        self.ops_this_frame += 1
+        self.costs[kind].add(vertices, ms)
+
+    def request(self, key):
+        self.cancelled.discard(key)
+        self.requested_at.setdefault(key, time.perf_counter())
+
+    def cancel(self, key):
+        if self.requested_at.pop(key, None) is not None:
+            self.cancelled.add(key)
+
+    def uploaded(self, key):
+        start = self.requested_at.pop(key, None)
+        if start is not None:
+            self.load_latency_ms.append((time.perf_counter() - start) * 1000.0)
+
+    def stats(self):
+        stats = {
+            "budget_ms": self.budget_ms(),
+            "last_frame_ms": self.last_frame_ms,
+            "last_frame_ops": self.last_frame_ops,
+            "ready": len(self.ready),
+            "ready_lod": len(self.ready_lod),
+        }
+        for kind, model in self.costs.items():
+            stats[kind + "_overhead_ms"] = model.op_overhead_ms
+            if kind != "unload":
+                stats[kind + "_ms_per_kvertex"] = model.ms_per_kvertex
+        return stats
+
+upload_scheduler = UploadScheduler()
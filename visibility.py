@@ -0,0 +1,120 @@
+# visibility.py
+import math
+from config import LOS_REFRESH_INTERVAL, LOS_POSITION_TOLERANCE, chunk_coords_from_world
+from simclock import sim_clock
+
+def line_block_intersect_3d(x1,y1,z1,x2,y2,z2,world):
+    steps = int(max(abs(x2-x1), abs(y2-y1), abs(z2-z1))*2)
+    if steps < 1:
+        steps = 1
+    dx = (x2-x1)/steps
+    dy = (y2-y1)/steps
+    dz = (z2-z1)/steps
+    for i in range(steps+1):
+        cx = x1+dx*i
+        cy = y1+dy*i
+        cz = z1+dz*i
+        bx = int(math.floor(cx))
+        by = int(math.floor(cy))
+        bz = int(math.floor(cz))
+        if (bx,by,bz) in world and not (i==steps):
+            return True
+    return None
+
+def chunks_crossed(x1, z1, x2, z2):
+    # Conservative: every chunk in the ray's xz bounding rectangle
+    cx1, cz1 = chunk_coords_from_world(min(x1,x2), min(z1,z2))
+    cx2, cz2 = chunk_coords_from_world(max(x1,x2), max(z1,z2))
+    return [(cx,cz) for cx in range(cx1, cx2+1) for cz in range(cz1, cz2+1)]
+
+class LineOfSightCache:
+    # One result per enemy, reused while both ends of the ray stay within
+    # LOS_POSITION_TOLERANCE of where it was cast and the refresh interval hasn't passed
+    def __init__(self, refresh_interval=LOS_REFRESH_INTERVAL, tolerance=LOS_POSITION_TOLERANCE):
+        self.refresh_interval = refresh_interval
+        self.tolerance = tolerance
+        self.entries = {}        # id(enemy): (visible, (x1,y1,z1,x2,y2,z2), time, chunks)
+        self.keys_by_chunk = {}  # (cx,cz): set of entry keys whose ray crosses that chunk
+        self.hits = 0
+        self.misses = 0
+        self.rays_cast = 0
+        self.rays_per_second = 0.0
+        self._window_start = None  # set by the first ray, on whichever clock is running
+        self._window_rays = 0
+
+    def has_line_of_sight(self, enemy, x1, y1, z1, x2, y2, z2, world):
+        now = sim_clock.now()
+        key = id(enemy)
+        entry = self.entries.get(key)
+        if entry is not None:
+            visible, ray, stamp, chunks = entry
+            tol = self.tolerance
+            if now - stamp < self.refresh_interval and all(abs(a - b) <= tol for a, b in zip(ray, (x1, y1, z1, x2, y2, z2))):
+                self.hits += 1
+                return visible
+            self._drop(key)
+
+        self.misses += 1
+        self._count_ray(now)
+        visible = line_block_intersect_3d(x1, y1, z1, x2, y2, z2, world) is None
+        chunks = chunks_crossed(x1, z1, x2, z2)
+        self.entries[key] = (visible, (x1, y1, z1, x2, y2, z2), now, chunks)
+        for c in chunks:
+            self.keys_by_chunk.setdefault(c, set()).add(key)
+        return visible
+
+    def _count_ray(self, now):
+        self.rays_cast += 1
+        self._window_rays += 1
+        if self._window_start is None:
+            self._window_start = now
+        elapsed = now - self._window_start
+        if elapsed >= 1.0:
+            self.rays_per_second = self._window_rays / elapsed
+            self._window_start = now
+            self._window_rays = 0
+            self._prune(now)
+
+    def _prune(self, now):
+        for key, entry in list(self.entries.items()):
+            if now - entry[2] >= self.refresh_interval:
+                self._drop(key)
+
+    def _drop(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        for c in entry[3]:
+            keys = self.keys_by_chunk.get(c)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.keys_by_chunk[c]
+
+    def invalidate_chunk(self, cx, cz):
+        for key in list(self.keys_by_chunk.get((cx, cz), ())):
+            self._drop(key)
+
+    def invalidate_chunks(self, chunks):
+        for (cx, cz) in chunks:
+            self.invalidate_chunk(cx, cz)
+
+    def forget(self, enemy):
+        self._drop(id(enemy))
+
+    def clear(self):
+        self.entries.clear()
+        self.keys_by_chunk.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            "rays_cast": self.rays_cast,
+            "rays_per_second": self.rays_per_second,
+        }
+
+los_cache = LineOfSightCache()
@@ -1,10 +1,22 @@
 # world.py
-import math
-from config import CHUNK_SIZE, GROUND_LEVEL, chunk_update_queue, LOADS_PER_FRAME, all_pickups, all_enemies, chunk_coords_from_world
+import math, time, queue
+from config import CHUNK_SIZE, GROUND_LEVEL, chunk_update_queue, all_pickups, all_enemies, chunk_coords_from_world
 from OpenGL.GL import *
-from chunk_worker import generated_chunks_queue
-from render import create_vbo_from_vertex_data, build_chunk_vertex_data
+from chunk_worker import generated_chunks_queue, generated_lod_queue
+from render import build_chunk_vertex_data, build_chunk_lod_vertex_data, chunk_bounds_from_data
+from chunk_arena import chunk_arena
 import bulletmarks
+from visibility import los_cache, line_block_intersect_3d
+from pathfinding import walk_grid, flow_field
+from director import director
+from uploads import upload_scheduler
+from profiler import profiler
+from tracer import tracer
+from lod import store_lod_mesh, receive_lod_chunk
+from occlusion import section_graph
+from config import SECTION_HEIGHT
+
+chunk_bounds = {}  # (cx,cz): (min_x, min_y, min_z, max_x, max_y, max_z), kept alongside chunk_vbos
 
 def create_initial_world():
     return {}
@@ -17,31 +29,21 @@ def unload_chunk_now(cx, cz, world, chunk_vbos):
         if base_x <= bx < base_x + CHUNK_SIZE and base_z <= bz < base_z + CHUNK_SIZE:
             to_remove.append((bx,by,bz))
     for coords in to_remove:
-        bulletmarks.remove_bullet_marks_for_block(coords)
         del world[coords]
+    bulletmarks.drop_chunk_bullet_marks(cx, cz)
 
-    new_pickups = []
-    for p in all_pickups:
-        pcx, pcz = p.chunk_coords
-        if pcx == cx and pcz == cz:
-            pass
-        else:
-            new_pickups.append(p)
-    all_pickups[:] = new_pickups
-
-    new_enemies = []
-    for e in all_enemies:
-        ecx, ecz = e.chunk_coords
-        if ecx == cx and ecz == cz:
-            pass
-        else:
-            new_enemies.append(e)
-    all_enemies[:] = new_enemies
+    all_pickups.unload_chunk(cx, cz)
+    for e in all_enemies.unload_chunk(cx, cz):
+        los_cache.forget(e)
+    director.drop_chunk(cx, cz)
+    los_cache.invalidate_chunk(cx, cz)
+    if walk_grid.remove_chunk(cx, cz):
+        flow_field.mark_dirty(cx, cz)
+    section_graph.remove_chunk(cx, cz)
 
     if (cx, cz) in chunk_vbos:
-        vbo_id, face_count, edge_count = chunk_vbos[(cx, cz)]
-        glDeleteBuffers(1, [vbo_id])
-        del chunk_vbos[(cx, cz)]
+        chunk_arena.release((cx, cz))
+        chunk_bounds.pop((cx, cz), None)
 
 def remove_block(bx, by, bz, world, chunk_vbos):
     if (bx,by,bz) in world:
@@ -49,28 +51,48 @@ def remove_block(bx, by, bz, world, chunk_vbos):
         del world[(bx,by,bz)]
         cx, cz = chunk_coords_from_world(bx, bz)
         chunk_update_queue.append(("load", cx, cz))
+        los_cache.invalidate_chunk(cx, cz)
+        section_graph.mark_dirty(cx, cz, by // SECTION_HEIGHT)
 
 def process_chunk_updates(world, chunk_vbos, generated_chunks_queue):
-    processed = 0
-    while not generated_chunks_queue.empty() and processed < LOADS_PER_FRAME:
-        cx, cz, chunk_data, (face_data, edge_data), pickups, enemies = generated_chunks_queue.get_nowait()
-        unload_chunk_now(cx, cz, world, chunk_vbos)
-        world.update(chunk_data)
-        for p in pickups:
-            all_pickups.append(p)
-        for e in enemies:
-            all_enemies.append(e)
-        vbo_id, face_count, edge_count = create_vbo_from_vertex_data(face_data, edge_data)
-        chunk_vbos[(cx, cz)] = (vbo_id, face_count, edge_count)
-        processed += 1
+    upload_scheduler.begin_frame()
+    ready = upload_scheduler.ready
+    while True:
+        try:
+            ready.append(generated_chunks_queue.get_nowait())
+        except queue.Empty:
+            break
 
-    updates_count = 0
+    # A replay redoes exactly the recorded number of uploads and queue operations,
+    # waiting for the worker if it is behind, instead of spending a time budget
+    forced = upload_scheduler.forced
+    if forced is not None:
+        while len(ready) < forced[0]:
+            try:
+                ready.append(generated_chunks_queue.get(timeout=30.0))
+            except queue.Empty:
+                raise RuntimeError("replay desync: the chunk worker did not produce a recorded chunk")
+
+    # Block edits, explosion remeshes and unloads go first and always get one operation,
+    # so streaming new chunks in can't starve them
     new_queue = []
-    while updates_count < LOADS_PER_FRAME and chunk_update_queue:
-        action, cx, cz = chunk_update_queue.pop(0)
+    while chunk_update_queue:
+        action, cx, cz = chunk_update_queue[0]
+        vertices = 0
+        kind = "unload" if action == "unload" else "remesh"
+        if action == "load" and (cx, cz) in chunk_vbos:
+            vertices = chunk_vbos[(cx, cz)][1]
+        if forced is not None:
+            if upload_scheduler.queue_ops_this_frame >= forced[1]:
+                break
+        elif upload_scheduler.queue_ops_this_frame and not upload_scheduler.can_afford(kind, vertices):
+            break
+        chunk_update_queue.pop(0)
+        upload_scheduler.queue_ops_this_frame += 1
+        start = time.perf_counter()
         if action == "unload":
             unload_chunk_now(cx, cz, world, chunk_vbos)
-            updates_count += 1
+            upload_scheduler.cancel((cx, cz))
         elif action == "load":
             base_x = cx * CHUNK_SIZE
             base_z = cz * CHUNK_SIZE
@@ -78,20 +100,79 @@ def process_chunk_updates(world, chunk_vbos, generated_chunks_queue):
             for (bx, by, bz), val in world.items():
                 if base_x <= bx < base_x+CHUNK_SIZE and base_z <= bz < base_z+CHUNK_SIZE:
                     chunk_data[(bx,by,bz)] = val
-            face_data, edge_data = build_chunk_vertex_data(chunk_data, cx, cz)
-            if (cx, cz) in chunk_vbos:
-                vbo_id_old, fc_old, ec_old = chunk_vbos[(cx, cz)]
-                glDeleteBuffers(1, [vbo_id_old])
-                del chunk_vbos[(cx, cz)]
-            vbo_id, face_count, edge_count = create_vbo_from_vertex_data(face_data, edge_data)
-            chunk_vbos[(cx, cz)] = (vbo_id, face_count, edge_count)
-            updates_count += 1
+            face_data, sections = build_chunk_vertex_data(chunk_data, cx, cz)
+            if walk_grid.update_chunk(cx, cz, chunk_data):
+                flow_field.mark_dirty(cx, cz)
+            section_graph.refresh_chunk(cx, cz, chunk_data)
+            chunk_arena.store((cx, cz), face_data, sections)
+            chunk_bounds[(cx, cz)] = chunk_bounds_from_data(chunk_data, cx, cz)
+            store_lod_mesh(cx, cz, build_chunk_lod_vertex_data(chunk_data, cx, cz), chunk_bounds[(cx, cz)])
+            vertices = len(face_data) // 6
         else:
             new_queue.append((action, cx, cz))
+            continue
+        elapsed = (time.perf_counter() - start) * 1000.0
+        upload_scheduler.record(kind, vertices, elapsed)
+        profiler.add("remesh", elapsed)
+        tracer.complete("remesh", start)
 
     if new_queue:
         chunk_update_queue[0:0] = new_queue
 
+    while ready:
+        face_data, sections = ready[0][3]
+        vertices = len(face_data) // 6
+        if forced is not None:
+            if upload_scheduler.uploads_this_frame >= forced[0]:
+                break
+        elif upload_scheduler.uploads_this_frame and not upload_scheduler.can_afford("upload", vertices):
+            break
+        cx, cz, chunk_data, (face_data, sections), lod_data, section_masks, pickups, enemies = ready.popleft()
+        upload_scheduler.uploads_this_frame += 1
+        if (cx, cz) in upload_scheduler.cancelled:
+            # Left the render distance before it arrived
+            upload_scheduler.cancelled.discard((cx, cz))
+            continue
+        start = time.perf_counter()
+        # Clearing out a stale copy scans the whole world, so it is costed as an unload
+        unload_chunk_now(cx, cz, world, chunk_vbos)
+        unloaded = time.perf_counter()
+        upload_scheduler.record("unload", 0, (unloaded - start) * 1000.0)
+        world.update(chunk_data)
+        if walk_grid.update_chunk(cx, cz, chunk_data):
+            flow_field.mark_dirty(cx, cz)
+        for p in pickups:
+            all_pickups.add(p)
+        director.offer(enemies)
+        chunk_arena.store((cx, cz), face_data, sections)
+        chunk_bounds[(cx, cz)] = chunk_bounds_from_data(chunk_data, cx, cz)
+        store_lod_mesh(cx, cz, lod_data, chunk_bounds[(cx, cz)])
+        section_graph.set_chunk(cx, cz, section_masks)
+        elapsed = (time.perf_counter() - start) * 1000.0
+        upload_scheduler.record("upload", vertices, (time.perf_counter() - unloaded) * 1000.0)
+        upload_scheduler.uploaded((cx, cz))
+        profiler.add("upload", elapsed)
+        tracer.complete("upload", start)
+
+    ready_lod = upload_scheduler.ready_lod
+    while True:
+        try:
+            ready_lod.append(generated_lod_queue.get_nowait())
+        except queue.Empty:
+            break
+    while ready_lod:
+        vertices = len(ready_lod[0][2]) // 6
+        if upload_scheduler.lod_ops_this_frame and not upload_scheduler.can_afford("lod", vertices):
+            break
+        cx, cz, lod_data, bounds = ready_lod.popleft()
+        upload_scheduler.lod_ops_this_frame += 1
+        start = time.perf_counter()
+        receive_lod_chunk(cx, cz, lod_data, bounds)
+        elapsed = (time.perf_counter() - start) * 1000.0
+        upload_scheduler.record("lod", vertices, elapsed)
+        profiler.add("upload", elapsed)
+        tracer.complete("upload", start)
+
 def update_loaded_chunks(px, pz, world, loaded_chunks, chunk_vbos):
     from config import RENDER_DISTANCE
     pcx, pcz = chunk_coords_from_world(px, pz)
@@ -113,21 +194,3 @@ def all_initial_chunks_loaded(loaded_chunks, chunk_vbos):
         if cpos not in chunk_vbos:
             return False
     return True
-
-def line_block_intersect_3d(x1,y1,z1,x2,y2,z2,world):
-    steps = int(max(abs(x2-x1), abs(y2-y1), abs(z2-z1))*2)
-    if steps < 1:
-        steps = 1
-    dx = (x2-x1)/steps
-    dy = (y2-y1)/steps
-    dz = (z2-z1)/steps
-    for i in range(steps+1):
-        cx = x1+dx*i
-        cy = y1+dy*i
-        cz = z1+dz*i
-        bx = int(math.floor(cx))
-        by = int(math.floor(cy))
-        bz = int(math.floor(cz))
-        if (bx,by,bz) in world and not (i==steps):
-            return True
-    return None